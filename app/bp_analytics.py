@@ -0,0 +1,203 @@
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class BPAnalyticsService:
+    """Vectorized trend analytics over a user's blood pressure readings."""
+
+    # Hour ranges (local time) used for morning vs evening comparisons
+    MORNING_HOURS = (4, 12)
+    EVENING_HOURS = (16, 24)
+
+    # Readings below these are counted as low rather than in range
+    LOW_SYSTOLIC = 90
+    LOW_DIASTOLIC = 60
+
+    @staticmethod
+    def load_readings(
+        user_id: int,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        db: Session
+    ) -> Dict[str, np.ndarray]:
+        """
+        Load a user's readings in a time range as columnar NumPy arrays, oldest first.
+
+        Returns "time" as datetime64[s] and "systolic", "diastolic" and "pulse"
+        as float64, with NaN for a missing pulse.
+        """
+        reading = models.BloodPressure
+        query = db.query(
+            reading.reading_time, reading.systolic, reading.diastolic, reading.pulse
+        ).filter(
+            reading.user_id == user_id,
+            reading.reading_time.isnot(None),
+            reading.systolic.isnot(None),
+            reading.diastolic.isnot(None)
+        )
+        if from_date is not None:
+            query = query.filter(reading.reading_time >= from_date)
+        if to_date is not None:
+            query = query.filter(reading.reading_time <= to_date)
+
+        rows = query.order_by(reading.reading_time).all()
+        count = len(rows)
+        return {
+            "time": np.array([row[0] for row in rows], dtype="datetime64[s]"),
+            "systolic": np.fromiter((row[1] for row in rows), dtype=np.float64, count=count),
+            "diastolic": np.fromiter((row[2] for row in rows), dtype=np.float64, count=count),
+            "pulse": np.fromiter((np.nan if row[3] is None else row[3] for row in rows), dtype=np.float64, count=count),
+        }
+
+    @staticmethod
+    def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+        """
+        Trailing mean over the last `window` readings, ignoring NaNs.
+
+        The first window-1 positions average over the readings available so far.
+        """
+        count = len(values)
+        valid = ~np.isnan(values)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(valid)))
+
+        end = np.arange(1, count + 1)
+        start = np.maximum(0, end - window)
+        window_sums = sums[end] - sums[start]
+        window_counts = counts[end] - counts[start]
+        return np.divide(
+            window_sums, window_counts,
+            out=np.full(count, np.nan), where=window_counts > 0
+        )
+
+    @staticmethod
+    def linear_slope(days: np.ndarray, values: np.ndarray) -> Optional[float]:
+        """Least-squares slope of values against time in days (units per day)."""
+        valid = ~np.isnan(values)
+        x = days[valid]
+        y = values[valid]
+        if len(x) < 2:
+            return None
+        x_centered = x - x.mean()
+        denominator = np.dot(x_centered, x_centered)
+        if denominator == 0:
+            return None
+        return float(np.dot(x_centered, y - y.mean()) / denominator)
+
+    @staticmethod
+    def _rounded(value, digits: int = 1) -> Optional[float]:
+        """Convert a NumPy scalar to a rounded float, mapping NaN to None."""
+        if value is None or np.isnan(value):
+            return None
+        return round(float(value), digits)
+
+    @staticmethod
+    def _summary(values: np.ndarray, days: np.ndarray, rolling: np.ndarray) -> Dict:
+        """Mean, spread, variability and trend of one measurement."""
+        valid = values[~np.isnan(values)]
+        if len(valid) == 0:
+            return {"mean": None, "std": None, "cv_percent": None, "min": None, "max": None,
+                    "slope_per_day": None, "rolling_mean_latest": None}
+
+        mean = valid.mean()
+        std = valid.std(ddof=1) if len(valid) > 1 else 0.0
+        slope = BPAnalyticsService.linear_slope(days, values)
+        return {
+            "mean": BPAnalyticsService._rounded(mean),
+            "std": BPAnalyticsService._rounded(std, 2),
+            "cv_percent": BPAnalyticsService._rounded(std / mean * 100, 2) if mean else None,
+            "min": BPAnalyticsService._rounded(valid.min()),
+            "max": BPAnalyticsService._rounded(valid.max()),
+            "slope_per_day": None if slope is None else round(slope, 3),
+            "rolling_mean_latest": BPAnalyticsService._rounded(rolling[-1])
+        }
+
+    @staticmethod
+    def compute_trends(
+        readings: Dict[str, np.ndarray],
+        window: int = 7,
+        target_systolic: int = 130,
+        target_diastolic: int = 80,
+        utc_offset_minutes: int = 0,
+        include_series: bool = False
+    ) -> Dict:
+        """
+        Compute trend analytics from columnar readings (see load_readings).
+
+        - Rolling means over the last `window` readings
+        - Linear trend slope (mmHg or bpm per day), standard deviation and
+          coefficient of variation
+        - Morning vs evening means and their difference
+        - Percentage of readings in, above and below the target range
+        """
+        times = readings["time"]
+        count = len(times)
+        if count == 0:
+            return {
+                "reading_count": 0,
+                "message": "No readings found for this user"
+            }
+
+        days = (times - times[0]) / np.timedelta64(1, "D")
+        rolling = {
+            name: BPAnalyticsService.rolling_mean(readings[name], window)
+            for name in ("systolic", "diastolic", "pulse")
+        }
+
+        # Hour of day in the user's local time
+        local = times + np.timedelta64(utc_offset_minutes, "m")
+        hours = (local - local.astype("datetime64[D]")) / np.timedelta64(1, "h")
+        morning = (hours >= BPAnalyticsService.MORNING_HOURS[0]) & (hours < BPAnalyticsService.MORNING_HOURS[1])
+        evening = (hours >= BPAnalyticsService.EVENING_HOURS[0]) & (hours < BPAnalyticsService.EVENING_HOURS[1])
+
+        morning_evening = {
+            "morning_readings": int(morning.sum()),
+            "evening_readings": int(evening.sum())
+        }
+        for name in ("systolic", "diastolic"):
+            values = readings[name]
+            morning_mean = values[morning].mean() if morning.any() else np.nan
+            evening_mean = values[evening].mean() if evening.any() else np.nan
+            morning_evening[f"morning_{name}"] = BPAnalyticsService._rounded(morning_mean)
+            morning_evening[f"evening_{name}"] = BPAnalyticsService._rounded(evening_mean)
+            morning_evening[f"delta_{name}"] = BPAnalyticsService._rounded(morning_mean - evening_mean)
+
+        systolic = readings["systolic"]
+        diastolic = readings["diastolic"]
+        above = (systolic >= target_systolic) | (diastolic >= target_diastolic)
+        below = ~above & ((systolic < BPAnalyticsService.LOW_SYSTOLIC) | (diastolic < BPAnalyticsService.LOW_DIASTOLIC))
+        in_range = ~above & ~below
+
+        result = {
+            "reading_count": count,
+            "first_reading": times[0].item(),
+            "last_reading": times[-1].item(),
+            "window": window,
+            "systolic": BPAnalyticsService._summary(systolic, days, rolling["systolic"]),
+            "diastolic": BPAnalyticsService._summary(diastolic, days, rolling["diastolic"]),
+            "pulse": BPAnalyticsService._summary(readings["pulse"], days, rolling["pulse"]),
+            "morning_vs_evening": morning_evening,
+            "time_in_range": {
+                "target_systolic": target_systolic,
+                "target_diastolic": target_diastolic,
+                "in_range_percent": round(float(in_range.mean()) * 100, 1),
+                "above_percent": round(float(above.mean()) * 100, 1),
+                "below_percent": round(float(below.mean()) * 100, 1)
+            }
+        }
+
+        if include_series:
+            result["rolling_series"] = [
+                {
+                    "reading_time": time,
+                    "systolic": BPAnalyticsService._rounded(sys_mean),
+                    "diastolic": BPAnalyticsService._rounded(dia_mean)
+                }
+                for time, sys_mean, dia_mean in zip(times.tolist(), rolling["systolic"], rolling["diastolic"])
+            ]
+
+        return result
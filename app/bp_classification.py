@@ -0,0 +1,81 @@
+from typing import NamedTuple, Optional, Union
+import numpy as np
+from sqlalchemy import case, or_
+
+
+class BPCategory(NamedTuple):
+    key: str  # Identifier used by BP check reminders (e.g. "stage_1")
+    code: int  # Value stored in BloodPressure.category, higher is more severe
+    label: str  # Human-readable interpretation shown for readings
+    systolic: Optional[int]  # Systolic threshold
+    diastolic: Optional[int]  # Diastolic threshold
+    strict: bool  # True if the reading must be above the threshold rather than at or above it
+
+
+NORMAL = BPCategory("normal", 0, "Normal Blood Pressure", None, None, False)
+
+# AHA / NHLBI categories, most severe first. A reading belongs to the first
+# category where its systolic OR diastolic value reaches the threshold; the
+# rows above it having failed guarantees e.g. diastolic < 80 for "elevated".
+BP_CATEGORY_TABLE = [
+    BPCategory("hypertensive_crisis", 4, "Hypertensive Crisis (Consult your doctor immediately)", 180, 120, True),
+    BPCategory("stage_2", 3, "Hypertension Stage 2", 140, 90, False),
+    BPCategory("stage_1", 2, "Hypertension Stage 1", 130, 80, False),
+    BPCategory("elevated", 1, "Elevated Blood Pressure", 120, None, False),
+]
+
+CATEGORIES_BY_CODE = {category.code: category for category in BP_CATEGORY_TABLE + [NORMAL]}
+CATEGORIES_BY_KEY = {category.key: category for category in BP_CATEGORY_TABLE + [NORMAL]}
+
+
+def _reaches(value, threshold: Optional[int], strict: bool):
+    """Threshold test that works for scalars, NumPy arrays and SQL columns."""
+    if threshold is None:
+        return None
+    return value > threshold if strict else value >= threshold
+
+
+def classify_codes(systolic, diastolic) -> Union[int, np.ndarray]:
+    """
+    Classify readings into category codes.
+
+    Accepts scalars or NumPy arrays (classified element-wise in one
+    vectorized pass) and returns an int or an int8 array respectively.
+    """
+    systolic_values = np.asarray(systolic)
+    diastolic_values = np.asarray(diastolic)
+
+    conditions = []
+    for category in BP_CATEGORY_TABLE:
+        checks = [
+            _reaches(systolic_values, category.systolic, category.strict),
+            _reaches(diastolic_values, category.diastolic, category.strict),
+        ]
+        checks = [check for check in checks if check is not None]
+        conditions.append(np.logical_or.reduce(checks) if len(checks) > 1 else checks[0])
+
+    codes = np.select(conditions, [category.code for category in BP_CATEGORY_TABLE], default=NORMAL.code)
+    codes = codes.astype(np.int8)
+    return int(codes) if codes.ndim == 0 else codes
+
+
+def classify(systolic: int, diastolic: int) -> BPCategory:
+    """Classify a single reading."""
+    return CATEGORIES_BY_CODE[classify_codes(systolic, diastolic)]
+
+
+def sql_category(systolic, diastolic, attribute: str = "label"):
+    """
+    SQL CASE expression classifying rows with the same table.
+
+    attribute selects what the expression yields: "label", "code" or "key".
+    """
+    whens = []
+    for category in BP_CATEGORY_TABLE:
+        checks = [
+            _reaches(systolic, category.systolic, category.strict),
+            _reaches(diastolic, category.diastolic, category.strict),
+        ]
+        whens.append((or_(*[check for check in checks if check is not None]), getattr(category, attribute)))
+    return case(*whens, else_=getattr(NORMAL, attribute))
+
@@ -3,6 +3,12 @@ from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 
 from . import models, schemas
+from .bp_classification import classify
+from .dosing_schedule import DosingRule, expand_schedule
+from .recurring_reminders import RecurringReminderService
+
+# Dose label of BP check rules; BP checks have no dosage
+BP_CHECK = "BP check"
 
 
 class BPReminderService:
@@ -16,16 +22,7 @@ class BPReminderService:
         Returns:
             str: BP category (normal, elevated, stage_1, stage_2, hypertensive_crisis)
         """
-        if systolic >= 180 or diastolic >= 120:
-            return "hypertensive_crisis"
-        elif systolic >= 140 or diastolic >= 90:
-            return "stage_2"
-        elif systolic >= 130 or diastolic >= 80:
-            return "stage_1"
-        elif systolic >= 120 and diastolic < 80:
-            return "elevated"
-        else:
-            return "normal"
+        return classify(systolic, diastolic).key
     
     @staticmethod
     def get_category_info(category: str) -> Dict[str, str]:
@@ -54,6 +51,32 @@ class BPReminderService:
         }
         return category_info.get(category, {"description": "Unknown", "advice": ""})
     
+    @staticmethod
+    def get_schedule_rule(
+        category: str,
+        preferred_morning_time: str = "07:00",
+        preferred_evening_time: str = "19:00"
+    ) -> Optional[DosingRule]:
+        """
+        Recurrence rule for the BP checks of a category, or None when no
+        automatic reminders are scheduled (hypertensive crisis).
+        """
+        if category == "normal":
+            # Every 2 weeks, 4 reminders total
+            return DosingRule(dose=BP_CHECK, interval_hours=14 * 24, total_doses=4)
+        if category == "elevated":
+            # Every 3 days, 6 reminders total
+            return DosingRule(dose=BP_CHECK, interval_hours=3 * 24, total_doses=6)
+        if category == "stage_1":
+            # Daily for 1 week
+            return DosingRule(dose=BP_CHECK, times_of_day=[preferred_morning_time], total_doses=7)
+        if category == "stage_2":
+            # Twice daily (morning + evening) for 1 week
+            return DosingRule(
+                dose=BP_CHECK, times_of_day=[preferred_morning_time, preferred_evening_time], total_doses=14
+            )
+        return None
+
     @staticmethod
     def generate_reminder_schedule(
         user_id: int,
@@ -74,10 +97,10 @@ class BPReminderService:
             first_check_time: When the first reading was taken (defaults to now)
             preferred_morning_time: User's preferred morning time (HH:MM)
             preferred_evening_time: User's preferred evening time (HH:MM)
-            db: Database session for saving reminders
+            db: Database session for saving the schedule as a recurring reminder
             
         Returns:
-            Dict with category, reminders, and advice
+            Dict with category, reminders, advice and the saved series_id
         """
         category = BPReminderService.classify_bp(systolic, diastolic)
         category_info = BPReminderService.get_category_info(category)
@@ -85,54 +108,8 @@ class BPReminderService:
         if first_check_time is None:
             first_check_time = datetime.now()
         
-        # Parse preferred times
-        morning_hour, morning_min = map(int, preferred_morning_time.split(':'))
-        evening_hour, evening_min = map(int, preferred_evening_time.split(':'))
-        
-        reminder_times = []
-        
-        if category == "normal":
-            # Every 2 weeks, 4 reminders total
-            interval_days = 14
-            count = 4
-            for i in range(count):
-                reminder_time = first_check_time + timedelta(days=i * interval_days)
-                reminder_times.append(reminder_time)
-                
-        elif category == "elevated":
-            # Every 3 days, 6 reminders total
-            interval_days = 3
-            count = 6
-            for i in range(count):
-                reminder_time = first_check_time + timedelta(days=i * interval_days)
-                reminder_times.append(reminder_time)
-                
-        elif category == "stage_1":
-            # Daily for 1 week
-            count = 7
-            for i in range(count):
-                reminder_time = first_check_time.replace(
-                    hour=morning_hour, minute=morning_min, second=0, microsecond=0
-                ) + timedelta(days=i)
-                reminder_times.append(reminder_time)
-                
-        elif category == "stage_2":
-            # Twice daily (morning + evening) for 1 week
-            count = 7
-            for i in range(count):
-                # Morning reminder
-                morning_time = first_check_time.replace(
-                    hour=morning_hour, minute=morning_min, second=0, microsecond=0
-                ) + timedelta(days=i)
-                reminder_times.append(morning_time)
-                
-                # Evening reminder
-                evening_time = first_check_time.replace(
-                    hour=evening_hour, minute=evening_min, second=0, microsecond=0
-                ) + timedelta(days=i)
-                reminder_times.append(evening_time)
-                
-        elif category == "hypertensive_crisis":
+        rule = BPReminderService.get_schedule_rule(category, preferred_morning_time, preferred_evening_time)
+        if rule is None:
             # No automatic reminders - immediate medical attention needed
             return {
                 "category": category,
@@ -141,32 +118,32 @@ class BPReminderService:
                 "total_reminders": 0,
                 "reminders": []
             }
-        
-        # Sort reminder times
-        reminder_times.sort()
-        
+
+        # Clock-time schedules start with the preferred times of the first check's day
+        start = first_check_time
+        if rule.times_of_day:
+            start = first_check_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        notes = f"BP check reminder - {category_info['description']}"
+
         # Create reminder objects
         reminders = []
+        series_id = None
         if db:
-            # Save to database
-            for reminder_time in reminder_times:
-                db_reminder = models.BPCheckReminder(
-                    user_id=user_id,
-                    reminder_datetime=reminder_time,
-                    bp_category=category,
-                    notes=f"BP check reminder - {category_info['description']}"
-                )
-                db.add(db_reminder)
-                reminders.append(db_reminder)
-            
+            # Save as one recurring reminder; occurrences are expanded when queried
+            series = RecurringReminderService.create_series(
+                db, user_id, "bp_check", rule, start, bp_category=category, notes=notes
+            )
             db.commit()
-            
-            # Refresh all reminders
-            for reminder in reminders:
-                db.refresh(reminder)
+            db.refresh(series)
+            series_id = series.id
+
+            reminders = [
+                RecurringReminderService.occurrence(series, reminder_time)
+                for reminder_time, _ in expand_schedule(series.rule, series.start_datetime)
+            ]
         else:
             # Just create schema objects for preview
-            for i, reminder_time in enumerate(reminder_times):
+            for i, (reminder_time, _) in enumerate(expand_schedule(rule, start)):
                 reminder = schemas.BPCheckReminder(
                     id=i + 1,  # Temporary ID for preview
                     user_id=user_id,
@@ -174,7 +151,7 @@ class BPReminderService:
                     bp_category=category,
                     is_completed=False,
                     created_at=datetime.now(),
-                    notes=f"BP check reminder - {category_info['description']}"
+                    notes=notes
                 )
                 reminders.append(reminder)
         
@@ -183,12 +160,16 @@ class BPReminderService:
             "category_description": category_info["description"],
             "advice": category_info["advice"],
             "total_reminders": len(reminders),
+            "series_id": series_id,
             "reminders": reminders
         }
     
     @staticmethod
-    def get_upcoming_bp_reminders(user_id: int, hours: int = 24, db: Session = None) -> List[models.BPCheckReminder]:
-        """Get upcoming BP check reminders for a user within specified hours."""
+    def get_upcoming_bp_reminders(user_id: int, hours: int = 24, db: Session = None) -> List:
+        """
+        Get upcoming BP check reminders for a user within specified hours,
+        including the pending occurrences of recurring BP check schedules.
+        """
         if not db:
             return []
             
@@ -201,8 +182,11 @@ class BPReminderService:
             models.BPCheckReminder.reminder_datetime >= now,
             models.BPCheckReminder.reminder_datetime <= future_time
         ).order_by(models.BPCheckReminder.reminder_datetime).all()
+        occurrences = RecurringReminderService.get_occurrences(
+            db, user_id, "bp_check", now, future_time, include_done=False
+        )
         
-        return reminders
+        return sorted(reminders + occurrences, key=lambda reminder: reminder.reminder_datetime)
     
     @staticmethod
     def mark_bp_reminder_completed(reminder_id: int, db: Session) -> Optional[models.BPCheckReminder]:
@@ -0,0 +1,481 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import BigInteger, Date, case, cast, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .bp_classification import CATEGORIES_BY_KEY, sql_category
+
+
+# Aggregate fields stored on BPUserStats
+SUM_FIELDS = ["sum_systolic", "sum_diastolic", "sum_pulse", "sumsq_systolic", "sumsq_diastolic", "sumsq_pulse"]
+MIN_MAX_FIELDS = ["min_systolic", "max_systolic", "min_diastolic", "max_diastolic", "min_pulse", "max_pulse"]
+CATEGORY_FIELDS = ["normal_count", "elevated_count", "stage1_count", "stage2_count", "crisis_count"]
+CATEGORY_FIELD_BY_CODE = {
+    CATEGORIES_BY_KEY["normal"].code: "normal_count",
+    CATEGORIES_BY_KEY["elevated"].code: "elevated_count",
+    CATEGORIES_BY_KEY["stage_1"].code: "stage1_count",
+    CATEGORIES_BY_KEY["stage_2"].code: "stage2_count",
+    CATEGORIES_BY_KEY["hypertensive_crisis"].code: "crisis_count",
+}
+STATS_FIELDS = ["reading_count"] + SUM_FIELDS + MIN_MAX_FIELDS + CATEGORY_FIELDS
+
+# Aggregate fields stored on BPDailyRollup
+ROLLUP_FIELDS = ["reading_count", "sum_systolic", "sum_diastolic", "sum_pulse"] + MIN_MAX_FIELDS
+
+
+class BPStatsService:
+    """Service for computing and maintaining blood pressure reading statistics."""
+
+    @staticmethod
+    def category_field(category: Optional[int]) -> Optional[str]:
+        """Map a category code to its BPUserStats counter column."""
+        if category is None:
+            return None
+        return CATEGORY_FIELD_BY_CODE.get(category)
+
+    @staticmethod
+    def compute_stats_by_user(db: Session, user_id: Optional[int] = None) -> Dict[int, Dict]:
+        """
+        Aggregate readings per user with a single grouped SQL query.
+
+        Returns a dict of user_id -> aggregates keyed like the BPUserStats
+        columns. Restrict to one user with user_id.
+        """
+        reading = models.BloodPressure
+
+        def sum_of(column):
+            return func.sum(cast(column, BigInteger))
+
+        def sum_of_squares(column):
+            return func.sum(cast(column, BigInteger) * cast(column, BigInteger))
+
+        query = db.query(
+            reading.user_id,
+            func.count(reading.id),
+            sum_of(reading.systolic),
+            sum_of(reading.diastolic),
+            sum_of(reading.pulse),
+            sum_of_squares(reading.systolic),
+            sum_of_squares(reading.diastolic),
+            sum_of_squares(reading.pulse),
+            func.min(reading.systolic),
+            func.max(reading.systolic),
+            func.min(reading.diastolic),
+            func.max(reading.diastolic),
+            func.min(reading.pulse),
+            func.max(reading.pulse),
+        )
+        # Category counters come from the (user_id, category) index
+        counts = db.query(reading.user_id, reading.category, func.count(reading.id))
+        if user_id is not None:
+            query = query.filter(reading.user_id == user_id)
+            counts = counts.filter(reading.user_id == user_id)
+
+        results = {}
+        for row in query.group_by(reading.user_id):
+            aggregates = dict(zip(STATS_FIELDS, row[1:]))
+            for field in SUM_FIELDS:
+                aggregates[field] = int(aggregates[field] or 0)
+            aggregates.update({field: 0 for field in CATEGORY_FIELDS})
+            results[row[0]] = aggregates
+
+        for row_user_id, category, count in counts.group_by(reading.user_id, reading.category):
+            field = BPStatsService.category_field(category)
+            if field and row_user_id in results:
+                results[row_user_id][field] = count
+        return results
+
+    @staticmethod
+    def compute_user_stats(user_id: int, db: Session) -> Optional[Dict]:
+        """
+        Aggregate one user's readings with a single SQL query.
+
+        Returns the raw aggregates, or None if the user has no readings.
+        """
+        return BPStatsService.compute_stats_by_user(db, user_id).get(user_id)
+
+    @staticmethod
+    def day_expression(db: Session):
+        """SQL expression truncating a reading's time to its (UTC) calendar day."""
+        reading_time = models.BloodPressure.reading_time
+        if db.get_bind().dialect.name == "sqlite":
+            return func.date(reading_time)
+        return cast(reading_time, Date)
+
+    @staticmethod
+    def compute_daily_rollups(
+        db: Session,
+        user_id: Optional[int] = None,
+        day: Optional[date] = None
+    ) -> Dict[Tuple[int, date], Dict]:
+        """
+        Aggregate readings per user per day with a single grouped SQL query.
+
+        Returns a dict of (user_id, day) -> aggregates keyed like the
+        BPDailyRollup columns. Restrict to one user and/or one day.
+        """
+        reading = models.BloodPressure
+        day_column = BPStatsService.day_expression(db)
+
+        query = db.query(
+            reading.user_id,
+            day_column,
+            func.count(reading.id),
+            func.sum(reading.systolic),
+            func.sum(reading.diastolic),
+            func.sum(reading.pulse),
+            func.min(reading.systolic),
+            func.max(reading.systolic),
+            func.min(reading.diastolic),
+            func.max(reading.diastolic),
+            func.min(reading.pulse),
+            func.max(reading.pulse),
+        ).filter(reading.reading_time.isnot(None))
+        if user_id is not None:
+            query = query.filter(reading.user_id == user_id)
+        if day is not None:
+            start = datetime.combine(day, datetime.min.time())
+            query = query.filter(reading.reading_time >= start, reading.reading_time < start + timedelta(days=1))
+
+        results = {}
+        for row in query.group_by(reading.user_id, day_column):
+            row_day = date.fromisoformat(row[1]) if isinstance(row[1], str) else row[1]
+            aggregates = dict(zip(ROLLUP_FIELDS, row[2:]))
+            for field in ["sum_systolic", "sum_diastolic", "sum_pulse"]:
+                aggregates[field] = int(aggregates[field] or 0)
+            results[(row[0], row_day)] = aggregates
+        return results
+
+    @staticmethod
+    def get_user_stats(user_id: int, db: Session) -> Optional[Dict]:
+        """
+        Get a user's aggregates from the bp_user_stats summary row.
+
+        Falls back to aggregating the readings table for users whose summary
+        row has not been created yet. Never writes.
+        """
+        stats = db.get(models.BPUserStats, user_id)
+        if stats is None:
+            return BPStatsService.compute_user_stats(user_id, db)
+        if not stats.reading_count:
+            return None
+        return {field: getattr(stats, field) for field in STATS_FIELDS}
+
+    @staticmethod
+    def _readings_delta(readings: List) -> Dict:
+        """Aggregate a batch of new readings in Python."""
+        delta = {field: 0 for field in ["reading_count"] + SUM_FIELDS + CATEGORY_FIELDS}
+        delta.update({field: None for field in MIN_MAX_FIELDS})
+
+        for reading in readings:
+            delta["reading_count"] += 1
+            for name in ("systolic", "diastolic", "pulse"):
+                value = getattr(reading, name)
+                if value is None:
+                    continue
+                delta[f"sum_{name}"] += value
+                delta[f"sumsq_{name}"] += value * value
+                if delta[f"min_{name}"] is None or value < delta[f"min_{name}"]:
+                    delta[f"min_{name}"] = value
+                if delta[f"max_{name}"] is None or value > delta[f"max_{name}"]:
+                    delta[f"max_{name}"] = value
+
+            category = BPStatsService.category_field(reading.category)
+            if category:
+                delta[category] += 1
+
+        return delta
+
+    @staticmethod
+    def _apply_delta(model, conditions: List, delta: Dict, fields: List[str], db: Session) -> int:
+        """Add a delta to an existing aggregate row. Returns the number of rows updated."""
+        values = {}
+        for field in fields:
+            column = getattr(model, field)
+            value = delta[field]
+            if field in MIN_MAX_FIELDS:
+                if value is None:
+                    continue
+                beyond = column > value if field.startswith("min_") else column < value
+                values[column] = case((or_(column.is_(None), beyond), value), else_=column)
+            else:
+                values[column] = column + value
+
+        return db.query(model).filter(*conditions).update(values, synchronize_session=False)
+
+    @staticmethod
+    def _upsert_aggregates(model, conditions: List, delta: Dict, fields: List[str], compute, keys: Dict, db: Session) -> None:
+        """
+        Add a delta to an aggregate row, creating the row if it does not exist.
+
+        A missing row is created from compute(), a full aggregate over the
+        readings already flushed in this transaction, so history that predates
+        the aggregate tables is picked up without a separate backfill.
+        """
+        if BPStatsService._apply_delta(model, conditions, delta, fields, db):
+            return
+
+        aggregates = compute()
+        try:
+            with db.begin_nested():
+                db.add(model(**keys, **{field: aggregates[field] for field in fields}))
+        except IntegrityError:
+            # A concurrent writer created the row first
+            BPStatsService._apply_delta(model, conditions, delta, fields, db)
+
+    @staticmethod
+    def record_readings(user_id: int, readings: Iterable, db: Session) -> None:
+        """
+        Fold newly added readings into the user's summary row and daily rollups.
+
+        Must be called in the same transaction as the readings are added
+        (model instances or the row dicts of a bulk insert), before the commit.
+        """
+        readings = [SimpleNamespace(**r) if isinstance(r, dict) else r for r in readings]
+        if not readings:
+            return
+
+        db.flush()
+
+        stats = models.BPUserStats
+        BPStatsService._upsert_aggregates(
+            stats, [stats.user_id == user_id],
+            BPStatsService._readings_delta(readings), STATS_FIELDS,
+            lambda: BPStatsService.compute_user_stats(user_id, db),
+            {"user_id": user_id}, db
+        )
+
+        by_day = defaultdict(list)
+        for reading in readings:
+            if reading.reading_time is not None:
+                by_day[reading.reading_time.date()].append(reading)
+
+        rollup = models.BPDailyRollup
+        for day, day_readings in sorted(by_day.items()):
+            BPStatsService._upsert_aggregates(
+                rollup, [rollup.user_id == user_id, rollup.day == day],
+                BPStatsService._readings_delta(day_readings), ROLLUP_FIELDS,
+                lambda day=day: BPStatsService.compute_daily_rollups(db, user_id, day)[(user_id, day)],
+                {"user_id": user_id, "day": day}, db
+            )
+
+    @staticmethod
+    def rebuild_all(db: Session) -> int:
+        """
+        Recompute every user's summary row from the readings table.
+
+        Returns the number of summary rows written. The caller commits.
+        """
+        db.query(models.BPUserStats).delete(synchronize_session=False)
+        rows = [
+            {"user_id": user_id, **aggregates}
+            for user_id, aggregates in BPStatsService.compute_stats_by_user(db).items()
+        ]
+        if rows:
+            db.execute(insert(models.BPUserStats), rows)
+        return len(rows)
+
+    @staticmethod
+    def reclassify_readings(db: Session, batch_size: int = 5000, only_missing: bool = False) -> int:
+        """
+        Rewrite the stored category of every reading with the current thresholds.
+
+        Runs one set-based UPDATE per id range of batch_size rows, committing
+        after each batch so locks stay short on large tables. Only rows whose
+        category changes, or that still carry a legacy interpretation string,
+        are written. Returns the number of rows updated.
+        """
+        reading = models.BloodPressure
+        code = sql_category(reading.systolic, reading.diastolic, "code")
+
+        low = db.query(func.min(reading.id)).scalar()
+        high = db.query(func.max(reading.id)).scalar()
+        if low is None:
+            return 0
+
+        updated = 0
+        for start in range(low, high + 1, batch_size):
+            statement = update(reading).where(
+                reading.id >= start,
+                reading.id < start + batch_size,
+                reading.systolic.isnot(None),
+                reading.diastolic.isnot(None)
+            )
+            if only_missing:
+                statement = statement.where(reading.category.is_(None))
+            else:
+                statement = statement.where(or_(
+                    reading.category.is_(None),
+                    reading.category != code,
+                    reading.interpretation_text.isnot(None)
+                ))
+
+            # The legacy label is dropped; it is derived from the category from now on
+            result = db.execute(
+                statement.values(category=code, interpretation_text=None).execution_options(synchronize_session=False)
+            )
+            db.commit()
+            updated += result.rowcount
+        return updated
+
+    @staticmethod
+    def verify_all(db: Session) -> List[Tuple[int, str, object, object]]:
+        """
+        Compare every summary row against a fresh aggregate of the readings.
+
+        Returns a list of (user_id, field, stored, actual) mismatches.
+        """
+        actual = BPStatsService.compute_stats_by_user(db)
+        stored = {
+            stats.user_id: {field: getattr(stats, field) for field in STATS_FIELDS}
+            for stats in db.query(models.BPUserStats)
+        }
+
+        mismatches = []
+        for user_id in sorted(set(actual) | set(stored)):
+            expected = actual.get(user_id)
+            found = stored.get(user_id)
+            if found is None:
+                mismatches.append((user_id, "row", None, "missing"))
+                continue
+            if expected is None:
+                if found["reading_count"]:
+                    mismatches.append((user_id, "reading_count", found["reading_count"], 0))
+                continue
+            for field in STATS_FIELDS:
+                if found[field] != expected[field]:
+                    mismatches.append((user_id, field, found[field], expected[field]))
+        return mismatches
+
+    @staticmethod
+    def rebuild_daily_rollups(db: Session) -> int:
+        """
+        Recompute every daily rollup row from the readings table.
+
+        Returns the number of rollup rows written. The caller commits.
+        """
+        db.query(models.BPDailyRollup).delete(synchronize_session=False)
+        rows = [
+            {"user_id": user_id, "day": day, **aggregates}
+            for (user_id, day), aggregates in BPStatsService.compute_daily_rollups(db).items()
+        ]
+        if rows:
+            db.execute(insert(models.BPDailyRollup), rows)
+        return len(rows)
+
+    @staticmethod
+    def verify_daily_rollups(db: Session) -> List[Tuple[Tuple[int, date], str, object, object]]:
+        """
+        Compare every daily rollup row against a fresh aggregate of the readings.
+
+        Returns a list of ((user_id, day), field, stored, actual) mismatches.
+        """
+        actual = BPStatsService.compute_daily_rollups(db)
+        stored = {
+            (rollup.user_id, rollup.day): {field: getattr(rollup, field) for field in ROLLUP_FIELDS}
+            for rollup in db.query(models.BPDailyRollup)
+        }
+
+        mismatches = []
+        for key in sorted(set(actual) | set(stored)):
+            expected = actual.get(key)
+            found = stored.get(key)
+            if found is None:
+                mismatches.append((key, "row", None, "missing"))
+            elif expected is None:
+                mismatches.append((key, "row", "present", None))
+            else:
+                for field in ROLLUP_FIELDS:
+                    if found[field] != expected[field]:
+                        mismatches.append((key, field, found[field], expected[field]))
+        return mismatches
+
+    @staticmethod
+    def get_series(
+        user_id: int,
+        bucket: str,
+        from_date: Optional[date],
+        to_date: Optional[date],
+        db: Session
+    ) -> List[Dict]:
+        """
+        Downsample a user's readings into day, week or month buckets.
+
+        Reads only the bp_daily_rollup rows in range, so the work and the
+        payload are bounded by the number of days rather than readings.
+        """
+        rollup = models.BPDailyRollup
+        query = db.query(rollup).filter(rollup.user_id == user_id)
+        if from_date is not None:
+            query = query.filter(rollup.day >= from_date)
+        if to_date is not None:
+            query = query.filter(rollup.day <= to_date)
+
+        buckets = {}
+        for row in query.order_by(rollup.day):
+            if bucket == "week":
+                start = row.day - timedelta(days=row.day.weekday())
+            elif bucket == "month":
+                start = row.day.replace(day=1)
+            else:
+                start = row.day
+
+            totals = buckets.get(start)
+            if totals is None:
+                buckets[start] = {field: getattr(row, field) for field in ROLLUP_FIELDS}
+                continue
+            for field in ["reading_count", "sum_systolic", "sum_diastolic", "sum_pulse"]:
+                totals[field] += getattr(row, field)
+            for field in MIN_MAX_FIELDS:
+                value = getattr(row, field)
+                if value is None:
+                    continue
+                if totals[field] is None or (value < totals[field] if field.startswith("min_") else value > totals[field]):
+                    totals[field] = value
+
+        series = []
+        for start, totals in buckets.items():
+            count = totals["reading_count"]
+            point = {"bucket_start": start, "count": count}
+            for name in ("systolic", "diastolic", "pulse"):
+                point[name] = {
+                    "mean": round(totals[f"sum_{name}"] / count, 1) if count else None,
+                    "min": totals[f"min_{name}"],
+                    "max": totals[f"max_{name}"]
+                }
+            series.append(point)
+        return series
+
+    @staticmethod
+    def format_stats(aggregates: Optional[Dict]) -> Dict:
+        """Build the /bp/readings/stats response from raw aggregates."""
+        if not aggregates or not aggregates["reading_count"]:
+            return {
+                "total_readings": 0,
+                "message": "No readings found for this user"
+            }
+
+        total = aggregates["reading_count"]
+        return {
+            "total_readings": total,
+            "averages": {
+                "systolic": round(aggregates["sum_systolic"] / total, 1),
+                "diastolic": round(aggregates["sum_diastolic"] / total, 1),
+                "pulse": round(aggregates["sum_pulse"] / total, 1)
+            },
+            "ranges": {
+                "systolic": {"min": aggregates["min_systolic"] or 0, "max": aggregates["max_systolic"] or 0},
+                "diastolic": {"min": aggregates["min_diastolic"] or 0, "max": aggregates["max_diastolic"] or 0}
+            },
+            "categories": {
+                "normal": aggregates["normal_count"],
+                "elevated": aggregates["elevated_count"],
+                "hypertension_stage1": aggregates["stage1_count"],
+                "hypertension_stage2": aggregates["stage2_count"],
+                "hypertensive_crisis": aggregates["crisis_count"]
+            }
+        }
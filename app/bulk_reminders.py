@@ -0,0 +1,113 @@
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Set
+from sqlalchemy import String, delete, func, literal_column, update
+from sqlalchemy.orm import Session
+
+from . import schemas
+from .recurring_reminders import SERIES_KINDS, RecurringReminderService
+from .reminder_timeline import TIMELINE_SOURCES, TimelineSource
+
+# Bulk actions and the status they give the occurrences of recurring reminders
+BULK_ACTIONS = {"complete": "done", "delete": "skipped", "reschedule": "snoozed"}
+
+
+class BulkReminderChange(NamedTuple):
+    counts: Dict[str, int]  # Reminder rows changed per type
+    occurrences: Dict[str, int]  # Series occurrences changed per kind
+    reminder_ids: Dict[str, List[int]]  # IDs of the changed rows per type
+    series_ids: Set[int]  # Series with changed occurrences
+
+
+class BulkReminderService:
+    """
+    Service for changing many reminders at once.
+
+    Each reminder table is changed by one set-based UPDATE or DELETE, with
+    RETURNING (OUTPUT on SQL Server) reporting the affected ids, and all
+    tables in one transaction. Without ids, the occurrences of recurring
+    reminders in the selection are changed too: completed ones are stored
+    as done, deleted ones as skipped and rescheduled ones as snoozed.
+    """
+
+    @staticmethod
+    def shifted(db: Session, column, minutes: int):
+        """SQL expression for a datetime column moved by a number of minutes."""
+        if db.get_bind().dialect.name == "sqlite":
+            # Keeps the fractional seconds of SQLAlchemy's stored format
+            return (
+                func.strftime("%Y-%m-%d %H:%M:%S", column, f"{minutes:+d} minutes", type_=String)
+                + func.substr(column, 20)
+            )
+        return func.dateadd(literal_column("minute"), minutes, column)
+
+    @staticmethod
+    def _conditions(source: TimelineSource, selection: schemas.BulkReminderSelection, pending_only: bool) -> List:
+        """WHERE conditions selecting one table's rows."""
+        model = source.model
+        due_at = getattr(model, source.due_at)
+
+        conditions = [model.user_id == selection.user_id]
+        if selection.ids is not None:
+            conditions.append(model.id.in_(selection.ids))
+        if selection.start is not None:
+            conditions.append(due_at >= selection.start)
+        if selection.end is not None:
+            conditions.append(due_at <= selection.end)
+        if pending_only:
+            conditions.append(getattr(model, source.done) == False)
+        return conditions
+
+    @staticmethod
+    def apply(
+        db: Session,
+        selection: schemas.BulkReminderSelection,
+        action: str,
+        shift_minutes: Optional[int] = None
+    ) -> BulkReminderChange:
+        """
+        Complete, delete or reschedule (by shift_minutes) the selected reminders
+        and commit. Completing and rescheduling only change pending reminders;
+        deleting also removes taken/completed ones.
+        """
+        occurrence_status = BULK_ACTIONS[action]
+        pending_only = action != "delete"
+
+        counts, reminder_ids = {}, {}
+        for source in TIMELINE_SOURCES:
+            if selection.type not in (None, source.type):
+                continue
+            model = source.model
+
+            if action == "delete":
+                statement = delete(model)
+            elif action == "complete":
+                statement = update(model).values({source.done: True})
+            else:
+                due_at = getattr(model, source.due_at)
+                statement = update(model).values({source.due_at: BulkReminderService.shifted(db, due_at, shift_minutes)})
+
+            ids = db.execute(
+                statement
+                .where(*BulkReminderService._conditions(source, selection, pending_only))
+                .returning(model.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            counts[source.type] = len(ids)
+            reminder_ids[source.type] = ids
+
+        occurrence_counts, series_ids = {}, set()
+        if selection.ids is None:
+            shift = timedelta(minutes=shift_minutes) if shift_minutes is not None else None
+            for kind in SERIES_KINDS:
+                if selection.type not in (None, kind):
+                    continue
+                occurrences = RecurringReminderService.get_occurrences(
+                    db, selection.user_id, kind, selection.start, selection.end, include_done=not pending_only
+                )
+                occurrence_counts[kind] = RecurringReminderService.set_occurrences_status(
+                    db, occurrences, occurrence_status, shift
+                )
+                series_ids.update(occurrence.series_id for occurrence in occurrences)
+
+        db.commit()
+        return BulkReminderChange(counts, occurrence_counts, reminder_ids, series_ids)
@@ -0,0 +1,91 @@
+import os
+import asyncio
+from io import BytesIO
+from typing import List
+import pypdfium2 as pdfium
+from PIL import Image
+
+from .ocr import get_batch_executor
+
+# Resolution PDF pages are rendered at; the image encoder scales them down
+# to the prescription tile budget afterwards
+OCR_PDF_RENDER_DPI = int(os.getenv("OCR_PDF_RENDER_DPI", "150"))
+OCR_MAX_DOCUMENT_PAGES = int(os.getenv("OCR_MAX_DOCUMENT_PAGES", "20"))
+
+PDF_MAGIC = b"%PDF-"
+PDF_POINTS_PER_INCH = 72
+PAGE_JPEG_QUALITY = 90
+
+# Multi-frame formats whose extra frames are not pages (MPO: camera previews
+# and stereo/depth images embedded in JPEG photos)
+SINGLE_PAGE_FORMATS = {"MPO"}
+
+
+def is_pdf(data: bytes) -> bool:
+    """True if the upload is a PDF document (checked by content, not content type)."""
+    return data.lstrip()[:len(PDF_MAGIC)] == PDF_MAGIC
+
+
+def count_pages(data: bytes) -> int:
+    """Pages in a PDF or frames in a multi-frame image (TIFF, GIF); 1 for other images."""
+    if is_pdf(data):
+        pdf = pdfium.PdfDocument(data)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    try:
+        img = Image.open(BytesIO(data))
+    except OSError:
+        # Not an image PIL can read; left to the OCR step to report
+        return 1
+    if img.format in SINGLE_PAGE_FORMATS:
+        return 1
+    return getattr(img, "n_frames", 1)
+
+
+def render_page(data: bytes, index: int, dpi: int = OCR_PDF_RENDER_DPI) -> bytes:
+    """
+    Rasterize one page of a PDF, or extract one frame of a multi-frame image,
+    as a JPEG. Runs in the process pool; PDFium is not thread-safe.
+    """
+    if is_pdf(data):
+        pdf = pdfium.PdfDocument(data)
+        try:
+            img = pdf[index].render(scale=dpi / PDF_POINTS_PER_INCH).to_pil()
+        finally:
+            pdf.close()
+    else:
+        img = Image.open(BytesIO(data))
+        img.seek(index)
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=PAGE_JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+async def split_pages(data: bytes, max_pages: int = OCR_MAX_DOCUMENT_PAGES) -> List[bytes]:
+    """
+    Split an uploaded document into page images for OCR.
+
+    Single images are returned unchanged. Pages of PDFs and multi-frame
+    images are rendered in parallel in the OCR process pool. Raises
+    ValueError for documents with more than max_pages pages.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_batch_executor()
+
+    # Counting image frames is cheap; opening a PDF is kept out of this process
+    pages = await loop.run_in_executor(executor if is_pdf(data) else None, count_pages, data)
+    if pages > max_pages:
+        raise ValueError(f"Documents can have at most {max_pages} pages, this one has {pages}")
+    if pages == 1 and not is_pdf(data):
+        return [data]
+
+    return list(await asyncio.gather(*(
+        loop.run_in_executor(executor, render_page, data, index)
+        for index in range(pages)
+    )))
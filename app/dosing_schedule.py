@@ -0,0 +1,122 @@
+import os
+import math
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+# Length of the schedule for open-ended prescriptions ("one tablet daily")
+PRESCRIPTION_DEFAULT_COURSE_DAYS = int(os.getenv("PRESCRIPTION_DEFAULT_COURSE_DAYS", "30"))
+
+# Upper bound on the doses generated for one prescription
+MAX_SCHEDULE_DOSES = 1000
+
+
+class DosingRule(BaseModel):
+    """
+    Compact description of when a medication is taken, as read from a prescription.
+    expand_schedule turns it into dose datetimes.
+    """
+    dose: str = Field(description="Amount taken at each dose, e.g. \"1 tablet\"")
+    times_per_day: int = Field(1, ge=1, le=24, description="Doses per day when no interval or clock times are given")
+    interval_hours: Optional[float] = Field(None, gt=0, description="Hours between doses for \"every N hours\" instructions")
+    times_of_day: List[str] = Field(default_factory=list, description="Clock times (HH:MM, 24h) of the daily doses, if stated")
+    duration_days: Optional[int] = Field(None, ge=1, description="Length of the course in days, if stated")
+    total_doses: Optional[int] = Field(None, ge=1, description="Total number of doses, if stated or implied by the pack size")
+    first_dose_offset_hours: float = Field(0, ge=0, description="Hours from now until the first dose; 0 means immediately")
+    first_dose_time: Optional[str] = Field(None, description="Clock time (HH:MM, 24h) of the first dose, if stated")
+    dose_offsets_hours: List[float] = Field(
+        default_factory=list,
+        description="For irregular patterns only: hours of each dose after the first one, starting with 0"
+    )
+
+
+def _parse_clock(value: str) -> Tuple[int, int]:
+    """Parse an HH:MM clock time."""
+    hour, minute = map(int, value.split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid clock time: {value}")
+    return hour, minute
+
+
+def _first_dose(rule: DosingRule, start: datetime) -> datetime:
+    """Time of the first dose for a course starting at start."""
+    start = start.replace(second=0, microsecond=0)
+    if rule.first_dose_time:
+        hour, minute = _parse_clock(rule.first_dose_time)
+        first = start.replace(hour=hour, minute=minute)
+        # A clock time already past today is the first dose tomorrow
+        return first if first >= start else first + timedelta(days=1)
+    return start + timedelta(hours=rule.first_dose_offset_hours)
+
+
+def dose_count(rule: DosingRule) -> int:
+    """
+    Number of doses in the course: total_doses when stated, otherwise the
+    doses per day over duration_days (PRESCRIPTION_DEFAULT_COURSE_DAYS when
+    the prescription is open-ended).
+    """
+    if rule.total_doses:
+        count = rule.total_doses
+    elif rule.dose_offsets_hours:
+        count = len(rule.dose_offsets_hours)
+    else:
+        days = rule.duration_days or PRESCRIPTION_DEFAULT_COURSE_DAYS
+        if rule.interval_hours:
+            count = math.ceil(days * 24 / rule.interval_hours)
+        else:
+            count = days * (len(rule.times_of_day) or rule.times_per_day)
+    return min(count, MAX_SCHEDULE_DOSES)
+
+
+def _dose_times(rule: DosingRule, first: datetime) -> Iterator[datetime]:
+    """Dose times from the first dose on, without an end; callers take dose_count of them."""
+    if rule.dose_offsets_hours:
+        for offset in sorted(rule.dose_offsets_hours):
+            yield first + timedelta(hours=offset)
+        return
+
+    if rule.times_of_day and not rule.interval_hours:
+        clock = sorted(_parse_clock(value) for value in rule.times_of_day)
+        day = first.replace(hour=0, minute=0)
+        while True:
+            for hour, minute in clock:
+                dose_time = day.replace(hour=hour, minute=minute)
+                if dose_time >= first:
+                    yield dose_time
+            day += timedelta(days=1)
+
+    interval = timedelta(hours=rule.interval_hours or 24 / rule.times_per_day)
+    dose_time = first
+    while True:
+        yield dose_time
+        dose_time += interval
+
+
+def expand_schedule(
+    rule: DosingRule,
+    start: datetime,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None
+) -> Iterator[Tuple[datetime, str]]:
+    """
+    Generate the (datetime, dosage) doses of a course starting at start.
+
+    Doses are produced lazily in time order, so a window (doses at or after
+    window_start and before window_end) is expanded without building the
+    whole course. The result only depends on the rule and start.
+    """
+    first = _first_dose(rule, start)
+    for dose_time in islice(_dose_times(rule, first), dose_count(rule)):
+        if window_end is not None and dose_time >= window_end:
+            return
+        if window_start is None or dose_time >= window_start:
+            yield dose_time, rule.dose
+
+
+def build_schedule(rule: DosingRule, start: datetime) -> List[Dict[str, str]]:
+    """The full course as schedule items ({"datetime": ISO 8601, "dosage": ...})."""
+    return [
+        {"datetime": dose_time.isoformat(), "dosage": dosage}
+        for dose_time, dosage in expand_schedule(rule, start)
+    ]
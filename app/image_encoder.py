@@ -0,0 +1,174 @@
+import os
+import base64
+import math
+from io import BytesIO
+from typing import NamedTuple, Optional, Tuple
+from PIL import Image, ImageOps
+
+from .lcd_crop import ANALYSIS_SIDE, detect_display
+
+# Vision model image pricing: images are fitted within 2048x2048, then scaled so
+# the short side is at most 768px and billed per 512px tile plus a base cost.
+# Low detail images are billed at the base cost only and seen at 512x512.
+TILE_SIZE = 512
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+MAX_SIDE = 2048
+MAX_SHORT_SIDE = 768
+LOW_DETAIL_SIDE = 512
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class EncoderSettings(NamedTuple):
+    detail: str = "high"  # "high" or "low", also sent to the API
+    max_tiles: int = 4  # Upper bound on billed 512px tiles in high detail
+    jpeg_quality: int = 85
+    auto_crop: bool = False  # Crop to the detected display (BP monitor photos)
+    min_crop_confidence: float = 0.5  # Below this the full frame is sent
+    crop_max_tiles: int = 1  # Tile budget for a cropped display, which needs far fewer pixels
+
+
+class EncodedImage(NamedTuple):
+    base64: str
+    width: int
+    height: int
+    size_bytes: int  # Size of the JPEG before base64 encoding
+    tokens: int  # Estimated prompt tokens for the image
+    crop_box: Optional[Tuple[int, int, int, int]] = None  # Region kept by auto-crop, in original pixels
+
+
+def settings_from_env(prefix: str, defaults: EncoderSettings) -> EncoderSettings:
+    """
+    Read <prefix>_DETAIL, <prefix>_MAX_TILES, <prefix>_JPEG_QUALITY, <prefix>_AUTO_CROP,
+    <prefix>_MIN_CROP_CONFIDENCE and <prefix>_CROP_MAX_TILES, falling back to defaults.
+    """
+    auto_crop = os.getenv(f"{prefix}_AUTO_CROP")
+    return EncoderSettings(
+        detail=os.getenv(f"{prefix}_DETAIL", defaults.detail),
+        max_tiles=int(os.getenv(f"{prefix}_MAX_TILES", defaults.max_tiles)),
+        jpeg_quality=int(os.getenv(f"{prefix}_JPEG_QUALITY", defaults.jpeg_quality)),
+        auto_crop=defaults.auto_crop if auto_crop is None else auto_crop.lower() in ("1", "true", "yes"),
+        min_crop_confidence=float(os.getenv(f"{prefix}_MIN_CROP_CONFIDENCE", defaults.min_crop_confidence)),
+        crop_max_tiles=int(os.getenv(f"{prefix}_CROP_MAX_TILES", defaults.crop_max_tiles)),
+    )
+
+
+def _fit(width: int, height: int, max_long: int, max_short: int) -> Tuple[int, int]:
+    """Scale down (never up) so the long and short sides are within the limits."""
+    scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def estimate_tokens(width: int, height: int, detail: str = "high") -> int:
+    """Prompt tokens the vision model charges for an image of this size."""
+    if detail == "low":
+        return BASE_TOKENS
+    width, height = _fit(width, height, MAX_SIDE, MAX_SHORT_SIDE)
+    return BASE_TOKENS + TILE_TOKENS * math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+def target_size(width: int, height: int, settings: EncoderSettings) -> Tuple[int, int]:
+    """
+    Largest size the model will actually use that stays within the tile budget.
+
+    Anything bigger than the model's own downscaled size only adds bytes, so
+    that is the starting point; if it needs more than max_tiles tiles, the
+    image is shrunk to the best tile grid (e.g. 2x2 or 1x3) that fits.
+    """
+    if settings.detail == "low":
+        return _fit(width, height, LOW_DETAIL_SIDE, LOW_DETAIL_SIDE)
+
+    width, height = _fit(width, height, MAX_SIDE, MAX_SHORT_SIDE)
+    best = 0.0
+    for columns in range(1, settings.max_tiles + 1):
+        rows = settings.max_tiles // columns
+        best = max(best, min(1.0, columns * TILE_SIZE / width, rows * TILE_SIZE / height))
+    return max(1, math.floor(width * best)), max(1, math.floor(height * best))
+
+
+def _detect_crop(image_data: bytes, width: int, height: int, settings: EncoderSettings) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Run display detection on a cheap low-resolution decode.
+
+    Returns the crop box in full-size (oriented) pixels, or None to keep the
+    full frame when detection is not confident enough.
+    """
+    preview = Image.open(BytesIO(image_data))
+    preview.draft("L", (ANALYSIS_SIDE, ANALYSIS_SIDE))
+    preview = ImageOps.exif_transpose(preview)
+
+    detection = detect_display(preview)
+    if detection is None or detection.confidence < settings.min_crop_confidence:
+        return None
+
+    scale = width / preview.width
+    left, top, right, bottom = detection.box
+    return (
+        round(left * scale),
+        round(top * scale),
+        min(width, round(right * scale)),
+        min(height, round(bottom * scale)),
+    )
+
+
+def encode_image(image_data: bytes, settings: EncoderSettings = EncoderSettings()) -> EncodedImage:
+    """
+    Decode, orient, resize and JPEG-encode an image for a vision request.
+
+    JPEGs are decoded at reduced resolution with Image.draft when the target is
+    much smaller than the photo, which avoids a full-size decode of large
+    camera images. EXIF orientation is applied so the model sees the display
+    upright. With auto_crop, the image is cropped to the detected display
+    when detection is confident enough and sized within crop_max_tiles.
+    """
+    img = Image.open(BytesIO(image_data))
+
+    orientation = img.getexif().get(0x0112, 1)
+    transposed = orientation in TRANSPOSED_ORIENTATIONS
+    width, height = img.size
+    if transposed:
+        width, height = height, width
+
+    crop_box = None
+    if settings.auto_crop:
+        crop_box = _detect_crop(image_data, width, height, settings)
+    if crop_box:
+        region_width, region_height = crop_box[2] - crop_box[0], crop_box[3] - crop_box[1]
+        target_width, target_height = target_size(
+            region_width, region_height, settings._replace(max_tiles=settings.crop_max_tiles)
+        )
+    else:
+        region_width, region_height = width, height
+        target_width, target_height = target_size(width, height, settings)
+
+    # draft() picks the smallest JPEG scale (1/2, 1/4, 1/8) that keeps the
+    # image at least this large, i.e. the region still reaches its target size
+    scale = target_width / region_width
+    draft_size = (math.ceil(width * scale), math.ceil(height * scale))
+    img.draft("RGB", draft_size[::-1] if transposed else draft_size)
+
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    if crop_box:
+        decoded_scale = img.width / width
+        img = img.crop(tuple(round(value * decoded_scale) for value in crop_box))
+
+    if img.size != (target_width, target_height):
+        img = img.resize((target_width, target_height), Image.LANCZOS)
+
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=settings.jpeg_quality, optimize=True)
+    data = buffer.getvalue()
+
+    return EncodedImage(
+        base64=base64.b64encode(data).decode("utf-8"),
+        width=target_width,
+        height=target_height,
+        size_bytes=len(data),
+        tokens=estimate_tokens(target_width, target_height, settings.detail),
+        crop_box=crop_box,
+    )
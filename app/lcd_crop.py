@@ -0,0 +1,116 @@
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+# Long side of the grayscale copy the detector works on
+ANALYSIS_SIDE = 320
+
+# Gradient magnitude (0-255 gray levels) below which a pixel is never an edge
+MIN_EDGE_STRENGTH = 12.0
+
+# Share of the edge mass left outside the region on each side of each axis
+EDGE_MASS_TAIL = 0.04
+
+# Inside/outside edge density ratio that counts as full confidence
+FULL_CONFIDENCE_RATIO = 4.0
+
+# Crops covering less than this share of the frame are treated as spurious,
+# more than this share are not worth cropping
+MIN_AREA_FRACTION = 0.02
+MAX_AREA_FRACTION = 0.85
+
+# Margin added around the detected region, as a share of its size
+PADDING = 0.1
+
+
+class CropResult(NamedTuple):
+    box: Tuple[int, int, int, int]  # (left, top, right, bottom) in image pixels
+    confidence: float  # 0-1
+
+
+def _mass_interval(profile: np.ndarray) -> Tuple[int, int]:
+    """
+    Interval [start, end) of a projection profile holding all but
+    EDGE_MASS_TAIL of its mass at either end.
+    """
+    cumulative = np.cumsum(profile)
+    total = cumulative[-1]
+    start = int(np.searchsorted(cumulative, total * EDGE_MASS_TAIL, side="right"))
+    end = int(np.searchsorted(cumulative, total * (1 - EDGE_MASS_TAIL), side="left")) + 1
+    return start, max(end, start + 1)
+
+
+def find_display_region(gray: np.ndarray) -> Optional[CropResult]:
+    """
+    Locate the high-contrast display region of a grayscale image.
+
+    Edges are found from the gradient magnitude and projected onto the rows
+    and columns; the region is where the bulk of the edge mass lies in each
+    direction.
+    Confidence compares the edge density inside the region with the rest of
+    the frame. Returns None if there are no edges or the region covers too
+    little or too much of the frame.
+    """
+    height, width = gray.shape
+    if height < 8 or width < 8:
+        return None
+
+    gray = gray.astype(np.float32)
+    edges = np.abs(np.diff(gray, axis=1))[:-1, :] + np.abs(np.diff(gray, axis=0))[:, :-1]
+    threshold = max(float(np.percentile(edges, 90)), MIN_EDGE_STRENGTH)
+    mask = edges > threshold
+    total = int(mask.sum())
+    if total == 0:
+        return None
+
+    top, bottom = _mass_interval(mask.sum(axis=1))
+    left, right = _mass_interval(mask.sum(axis=0))
+
+    area = (bottom - top) * (right - left)
+    area_fraction = area / mask.size
+    if not MIN_AREA_FRACTION <= area_fraction <= MAX_AREA_FRACTION:
+        return None
+
+    inside = int(mask[top:bottom, left:right].sum())
+    inside_density = inside / area
+    outside_density = (total - inside) / max(1, mask.size - area)
+    ratio = inside_density / max(outside_density, 1e-6)
+    confidence = float(np.clip((ratio - 1) / (FULL_CONFIDENCE_RATIO - 1), 0.0, 1.0))
+
+    pad_x = int((right - left) * PADDING)
+    pad_y = int((bottom - top) * PADDING)
+    box = (
+        max(0, left - pad_x),
+        max(0, top - pad_y),
+        min(width, right + 1 + pad_x),
+        min(height, bottom + 1 + pad_y),
+    )
+    return CropResult(box, confidence)
+
+
+def detect_display(img: Image.Image) -> Optional[CropResult]:
+    """
+    Find the display region of a PIL image, in that image's pixel coordinates.
+
+    Works on a small grayscale copy, so it costs a few milliseconds even for
+    large photos.
+    """
+    scale = min(1.0, ANALYSIS_SIDE / max(img.size))
+    small = img.convert("L")
+    if scale < 1.0:
+        small = small.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BILINEAR)
+
+    result = find_display_region(np.asarray(small))
+    if result is None:
+        return None
+
+    left, top, right, bottom = result.box
+    return CropResult(
+        (
+            int(left / scale),
+            int(top / scale),
+            min(img.width, int(np.ceil(right / scale))),
+            min(img.height, int(np.ceil(bottom / scale))),
+        ),
+        result.confidence,
+    )
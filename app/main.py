@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -15,20 +16,39 @@ try:
     # Try relative imports first (when run as module)
     from . import models
     from .database import engine
-    from .routers import users, blood_pressure, health_advisor, knowledge_agent, reminders
+    from .ocr import shutdown_batch_executor
+    from .ocr_jobs import ocr_job_queue
+    from .reminder_dispatcher import REMINDER_DISPATCH_ENABLED, reminder_dispatcher
+    from .routers import users, blood_pressure, health_advisor, knowledge_agent, reminders, ocr_jobs
 except ImportError:
     # Fall back to absolute imports (when run directly)
     from app import models
     from app.database import engine
-    from app.routers import users, blood_pressure, health_advisor, knowledge_agent, reminders
+    from app.ocr import shutdown_batch_executor
+    from app.ocr_jobs import ocr_job_queue
+    from app.reminder_dispatcher import REMINDER_DISPATCH_ENABLED, reminder_dispatcher
+    from app.routers import users, blood_pressure, health_advisor, knowledge_agent, reminders, ocr_jobs
 
 # Create tables
 models.Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background OCR workers; unfinished jobs from a previous run are requeued
+    await ocr_job_queue.start()
+    # Sends reminders to the configured sinks as they come due
+    if REMINDER_DISPATCH_ENABLED:
+        await reminder_dispatcher.start()
+    yield
+    await reminder_dispatcher.stop()
+    await ocr_job_queue.stop()
+    shutdown_batch_executor()
+
 app = FastAPI(
     title="CardioMed AI API",
     description="An API for managing blood pressure readings",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -47,6 +67,7 @@ app.include_router(blood_pressure.router)
 app.include_router(health_advisor.router)
 app.include_router(knowledge_agent.router)
 app.include_router(reminders.router)
+app.include_router(ocr_jobs.router)
 
 @app.get("/")
 def read_root():
@@ -56,6 +77,8 @@ def read_root():
             "users": "/users/",
             "blood_pressure_readings": "/bp/readings/",
             "upload_bp_image": "/bp/upload/",
+            "upload_bp_images_batch": "/bp/upload/batch",
+            "ocr_job": "/ocr/jobs/{id}",
             "health_advisor": "/health-advisor/advice",
             "health_advisor_status": "/health-advisor/status",
             "knowledge_agent": "/knowledge-agent/ask",
@@ -63,6 +86,13 @@ def read_root():
             "medication_reminders": "/reminders/",
             "upload_prescription": "/reminders/upload-prescription",
             "upcoming_reminders": "/reminders/upcoming/",
+            "reminder_timeline": "/reminders/timeline/{user_id}",
+            "reminder_stream": "/reminders/stream/{user_id}",
+            "reminder_series": "/reminders/series/{series_id}",
+            "reminder_occurrences": "/reminders/series/{series_id}/occurrences",
+            "bulk_complete_reminders": "/reminders/bulk/complete",
+            "bulk_delete_reminders": "/reminders/bulk/delete",
+            "bulk_reschedule_reminders": "/reminders/bulk/reschedule",
             "bp_reminder_schedule": "/reminders/bp-schedule",
             "bp_reminders": "/reminders/bp-reminders/",
             "upcoming_bp_reminders": "/reminders/bp-upcoming/",
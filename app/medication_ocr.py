@@ -1,14 +1,16 @@
 import os
-import base64
+import asyncio
 import json
 from typing import Dict, List
-from PIL import Image
-from io import BytesIO
 import logging
 from dotenv import load_dotenv
 from openai import AzureOpenAI
 from pydantic import BaseModel, Field
-from datetime import datetime, timezone
+from datetime import datetime
+
+from .dosing_schedule import DosingRule, build_schedule
+from .image_encoder import EncoderSettings, encode_image, settings_from_env
+from .ocr_cache import OCRResultCache
 
 # Load environment variables
 load_dotenv()
@@ -23,21 +25,55 @@ AZURE_ENDPOINT = os.getenv("AZURE_ENDPOINT")
 AZURE_API_VERSION = os.getenv("AZURE_API_VERSION")
 AZURE_DEPLOYMENT = os.getenv("AZURE_DEPLOYMENT_2")
 
-# Define the Pydantic models for structured output
-class MedicationScheduleItem(BaseModel):
-    """Individual medication dose schedule item."""
-    datetime: str = Field(description="Exact date and time for the dose in ISO 8601 format")
-    dosage: str = Field(description="Amount to be taken at that time")
+# How long an extracted prescription is reused for the same image. The dosing
+# rule is cached and the schedule is expanded from the current time on each use.
+OCR_PRESCRIPTION_CACHE_TTL_SECONDS = int(os.getenv("OCR_PRESCRIPTION_CACHE_TTL_SECONDS", "86400"))
+
+# Pages of a multi-page prescription sent to the vision model at the same time
+OCR_PRESCRIPTION_PAGE_CONCURRENCY = int(os.getenv("OCR_PRESCRIPTION_PAGE_CONCURRENCY", "4"))
 
+# Image encoding for the vision call; labels have small print, so allow more tiles
+OCR_PRESCRIPTION_IMAGE_SETTINGS = settings_from_env("OCR_PRESCRIPTION_IMAGE", EncoderSettings(detail="high", max_tiles=6, jpeg_quality=85))
+
+# Define the Pydantic models for structured output
 class MedicationPrescription(BaseModel):
     """
     Structured model for medication prescription details extracted from images.
     """
     name: str = Field(description="The name of the medication")
     dosage: str = Field(description="The composition or strength of the medication")
-    schedule: List[MedicationScheduleItem] = Field(description="List of scheduled doses with datetime and dosage")
+    rule: DosingRule = Field(description="When and how much to take; the dose datetimes are computed from it")
     interpretation: str = Field(description="Explanation of what was observed in the image and how the prescription information was interpreted")
 
+def merge_prescriptions(prescriptions: List[Dict]) -> List[Dict]:
+    """
+    Combine the medications extracted from the pages of one document.
+
+    Pages where nothing was found are dropped. A medication that appears on
+    several pages (e.g. a continued medication table) is listed once, using
+    the first page that gave it a schedule, with the interpretations joined.
+    """
+    merged: Dict[str, Dict] = {}
+    for page, prescription in enumerate(prescriptions, start=1):
+        if not prescription.get("name") and not prescription.get("schedule"):
+            continue
+
+        key = prescription.get("name", "").strip().lower() or f"page {page}"
+        interpretation = prescription.get("interpretation", "")
+        if len(prescriptions) > 1 and interpretation:
+            interpretation = f"Page {page}: {interpretation}"
+
+        existing = merged.get(key)
+        if existing is None:
+            merged[key] = {**prescription, "interpretation": interpretation}
+            continue
+        if not existing.get("schedule") and prescription.get("schedule"):
+            merged[key] = {**prescription, "interpretation": existing["interpretation"]}
+        if interpretation:
+            merged[key]["interpretation"] = "\n".join(filter(None, [merged[key]["interpretation"], interpretation]))
+
+    return list(merged.values())
+
 class MedicationOCRProcessor:
     def __init__(self):
         """Initialize the OCR processor for medication prescriptions."""
@@ -67,31 +103,22 @@ class MedicationOCRProcessor:
             logger.error(f"Failed to initialize Azure OpenAI client: {e}")
             self.client = None
 
+        # Results for images seen before, so retries don't repeat the vision call
+        self.cache = OCRResultCache("prescription", OCR_PRESCRIPTION_CACHE_TTL_SECONDS)
+        self.image_settings = OCR_PRESCRIPTION_IMAGE_SETTINGS
+
     def _prepare_image(self, image_data: bytes) -> str:
         """
         Prepare the image for OCR processing.
-        Resize and convert to base64 if needed.
+        Orient, resize and re-encode it within the token budget and return it as base64.
         """
         try:
-            # Open image and resize if necessary
-            img = Image.open(BytesIO(image_data))
-
-            # Resize if the image is too large
-            if max(img.size) > 1024:
-                img.thumbnail((1024, 1024))
-
-            # Convert to RGB if it's not already
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            # Convert back to bytes
-            buffer = BytesIO()
-            img.save(buffer, format="JPEG")
-            buffer.seek(0)
-
-            # Convert to base64
-            encoded_image = base64.b64encode(buffer.read()).decode('utf-8')
-            return encoded_image
+            encoded = encode_image(image_data, self.image_settings)
+            logger.info(
+                f"Prepared {encoded.width}x{encoded.height} image: "
+                f"{encoded.size_bytes} bytes, ~{encoded.tokens} prompt tokens"
+            )
+            return encoded.base64
 
         except Exception as e:
             logger.error(f"Error preparing image: {e}")
@@ -101,21 +128,62 @@ class MedicationOCRProcessor:
         """
         Process image data and extract medication prescription details using Azure OpenAI API.
         Returns a dictionary with medication name, dosage, and schedule.
+
+        The model returns a dosing rule rather than dose datetimes; the
+        schedule is expanded locally from the current time, so its size does
+        not affect the model's output tokens.
+        """
+        prescription = self.cache.get(image_data)
+        if prescription is None:
+            prescription = self._extract_prescription_uncached(image_data)
+            if prescription.get("name"):
+                self.cache.put(image_data, prescription)
+        return self._with_schedule(prescription)
+
+    async def extract_prescriptions(self, pages: List[bytes]) -> List[Dict]:
         """
+        Extract the medications from the page images of one document.
+
+        Pages are sent to the vision model concurrently, at most
+        OCR_PRESCRIPTION_PAGE_CONCURRENCY at a time, and the results are
+        merged with merge_prescriptions.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(OCR_PRESCRIPTION_PAGE_CONCURRENCY)
+
+        async def extract(page: bytes) -> Dict:
+            async with semaphore:
+                return await loop.run_in_executor(None, self.extract_prescription, page)
+
+        return merge_prescriptions(await asyncio.gather(*(extract(page) for page in pages)))
+
+    def _with_schedule(self, prescription: Dict) -> Dict:
+        """Add the schedule expanded from the prescription's dosing rule."""
+        rule = prescription.get("rule")
+        if rule is None:
+            # Nothing extracted, or cached before dosing rules were used
+            return {**prescription, "schedule": prescription.get("schedule", [])}
+
+        try:
+            schedule = build_schedule(DosingRule.model_validate(rule), datetime.utcnow())
+        except ValueError as e:
+            logger.error(f"Invalid dosing rule {rule}: {e}")
+            schedule = []
+        return {**prescription, "schedule": schedule}
+
+    def _extract_prescription_uncached(self, image_data: bytes) -> Dict:
+        """Run the vision call for extract_prescription."""
         # Check if client is initialized
         if self.client is None:
             logger.error("Azure OpenAI client is not initialized. Cannot process image.")
-            return {"name": "", "dosage": "", "schedule": [], "interpretation": ""}
+            return {"name": "", "dosage": "", "rule": None, "interpretation": ""}
 
         try:
             # Prepare the image
             base64_image = self._prepare_image(image_data)
 
-            # Get current datetime for the prompt
-            current_datetime = datetime.now(timezone.utc).isoformat()
-
             # Create the system prompt
-            system_prompt = f"""You are a medical assistant AI. Your task is to extract structured prescription details from the given medication instruction text or transcription (e.g., from a photo of a box or doctor's note).
+            system_prompt = """You are a medical assistant AI. Your task is to extract structured prescription details from the given medication instruction text or transcription (e.g., from a photo of a box or doctor's note).
 
 IMPORTANT: Look carefully for ALL prescription details including:
 - Medication name and strength
@@ -132,33 +200,37 @@ name: The name of the medication (e.g., "Lonart DS")
 
 dosage: The composition or strength of the medication (e.g., "80mg artemether + 480mg lumefantrine", or "1 tablet")
 
-schedule: A list of ALL doses based on the complete treatment, each with:
+rule: The dosing rule. Do NOT list the individual doses or compute dates; the schedule is calculated from this rule. Fields:
+
+dose: Amount to be taken at each dose (e.g., "1 tablet")
 
-datetime: Exact date and time for the dose, in ISO 8601 format (e.g., "2025-07-01T08:00:00")
+times_per_day: Number of doses per day (e.g., 2 for "twice daily")
 
-dosage: Amount to be taken at that time (e.g., "1 tablet")
+interval_hours: Hours between doses for instructions like "every 8 hours", otherwise null
 
-interpretation: Explain what you observed in the image and how you interpreted the prescription information. Specifically mention: what text/numbers you could see, the total quantity if visible, the frequency instructions, duration, and explain your reasoning for the complete schedule. This helps users understand how you processed the image and verify if your understanding matches what's actually shown.
+times_of_day: Clock times of the daily doses in 24h HH:MM format if stated (e.g., ["08:00", "20:00"]), otherwise []
 
-🔹 Assume the current date and time is: {current_datetime}. When calculating schedules:
-   - For relative timing (e.g., "take immediately, then after 8 hours"), use this datetime to calculate
-   - For specific times, understand day progression: early morning times (like 4 AM) typically indicate the next day
-   - Calculate proper date transitions when times cross midnight
+duration_days: Length of the course in days if stated, otherwise null
 
-🔹 CRITICAL: Generate the COMPLETE schedule for the entire treatment duration. If you see "5 tablets" and "twice daily for 3 days", create exactly 6 scheduled doses over 3 days.
+total_doses: Total number of doses if stated or implied by the package quantity, otherwise null
+
+first_dose_offset_hours: Hours from now until the first dose (0 for "take immediately" or when not stated)
+
+first_dose_time: Clock time of the first dose in 24h HH:MM format if stated, otherwise null
+
+dose_offsets_hours: ONLY for irregular patterns: the hours of each dose after the first dose, starting with 0, otherwise []
+
+interpretation: Explain what you observed in the image and how you interpreted the prescription information. Specifically mention: what text/numbers you could see, the total quantity if visible, the frequency instructions, duration, and explain your reasoning for the dosing rule. This helps users understand how you processed the image and verify if your understanding matches what's actually shown.
+
+🔹 CRITICAL: The rule must describe the COMPLETE treatment. If you see "5 tablets" and "twice daily for 3 days", use times_per_day 2, duration_days 3 and total_doses 6.
 
 🔹 TIMING INSTRUCTIONS: Pay close attention to specific timing patterns:
-   - Look for exact times mentioned and understand the day progression
-   - When you see a sequence like "8 PM, 4 AM, 8 PM, 8 AM, 8 PM" - this typically means:
-     * Day 1: 8 PM
-     * Day 2: 4 AM, then 8 PM (same day)
-     * Day 3: 8 AM, then 8 PM (same day)
-   - Some medications have irregular intervals (not evenly spaced)
-   - If specific times are given, use those EXACTLY and calculate proper day transitions
-   - Only use even spacing (e.g., every 12 hours) if no specific times are mentioned
-   - Pay attention to natural day boundaries - times like 4 AM usually start a new day
-
-🔹 For the interpretation, describe what you saw in the image including total quantity, frequency, duration, specific timing instructions if any, and how you calculated the complete schedule.
+   - When you see a sequence like "8 PM, 4 AM, 8 PM, 8 AM, 8 PM", the doses are not evenly spaced: use first_dose_time "20:00" and dose_offsets_hours [0, 8, 24, 36, 48]
+   - Times like 4 AM after an evening dose are on the next day; count the hours across midnight
+   - If specific daily times are given, use times_of_day
+   - Only use interval_hours or times_per_day alone if no specific times are mentioned
+
+🔹 For the interpretation, describe what you saw in the image including total quantity, frequency, duration, specific timing instructions if any, and how you chose the dosing rule.
 
 Return only the JSON structure."""
 
@@ -178,7 +250,8 @@ Return only the JSON structure."""
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:image/jpeg;base64,{base64_image}",
+                                "detail": self.image_settings.detail
                             }
                         }
                     ]
@@ -202,7 +275,7 @@ Return only the JSON structure."""
                     return {
                         "name": prescription.name,
                         "dosage": prescription.dosage,
-                        "schedule": [{"datetime": item.datetime, "dosage": item.dosage} for item in prescription.schedule],
+                        "rule": prescription.rule.model_dump(),
                         "interpretation": prescription.interpretation
                     }
 
@@ -215,7 +288,7 @@ Return only the JSON structure."""
 
         except Exception as e:
             logger.error(f"Error processing medication image: {e}")
-            return {"name": "", "dosage": "", "schedule": [], "interpretation": ""}
+            return {"name": "", "dosage": "", "rule": None, "interpretation": ""}
 
     def _supports_structured_output(self) -> bool:
         """
@@ -254,21 +327,27 @@ Return only the JSON structure."""
                     prescription_data = json.loads(json_match.group(0))
                 else:
                     logger.error(f"Could not extract JSON from response: {content}")
-                    return {"name": "", "dosage": "", "schedule": []}
+                    return {"name": "", "dosage": "", "rule": None}
 
             # Validate and return the prescription data
             name = prescription_data.get("name", "")
             dosage = prescription_data.get("dosage", "")
-            schedule = prescription_data.get("schedule", [])
+            rule = prescription_data.get("rule")
             interpretation = prescription_data.get("interpretation", "")
 
+            try:
+                rule = DosingRule.model_validate(rule).model_dump() if rule else None
+            except ValueError as e:
+                logger.error(f"Model returned an invalid dosing rule {rule}: {e}")
+                rule = None
+
             return {
                 "name": name,
                 "dosage": dosage,
-                "schedule": schedule,
+                "rule": rule,
                 "interpretation": interpretation
             }
 
         except Exception as e:
             logger.error(f"Error in legacy medication OCR processing: {e}")
-            return {"name": "", "dosage": "", "schedule": [], "interpretation": ""}
+            return {"name": "", "dosage": "", "rule": None, "interpretation": ""}
@@ -1,8 +1,11 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, ForeignKey, Index, Integer, BigInteger, SmallInteger, String, Float, Date, DateTime, Text, Boolean, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 import datetime
+import json
 
 from .database import Base
+from .bp_classification import CATEGORIES_BY_CODE
+from .dosing_schedule import DosingRule
 
 class User(Base):
     __tablename__ = "users"
@@ -36,10 +39,25 @@ class BloodPressure(Base):
     pulse = Column(Integer)
     reading_time = Column(DateTime, default=datetime.datetime.utcnow)
     notes = Column(Text, nullable=True)
-    interpretation = Column(String(500), nullable=True)
+    interpretation_text = Column("interpretation", String(500), nullable=True)  # Legacy free-text label, no longer written
+    category = Column(SmallInteger, nullable=True)  # BP category code, see bp_classification
 
     user = relationship("User", back_populates="blood_pressure_readings")
 
+    __table_args__ = (
+        # Supports keyset pagination of a user's history
+        Index("ix_blood_pressure_readings_user_reading_time_id", "user_id", "reading_time", "id"),
+        # Supports category counts and category-filtered history
+        Index("ix_blood_pressure_readings_user_category_reading_time_id", "user_id", "category", "reading_time", "id"),
+    )
+
+    @property
+    def interpretation(self):
+        """Human-readable label, derived from the category code."""
+        if self.category is None:
+            return self.interpretation_text
+        return CATEGORIES_BY_CODE[self.category].label
+
 
 class MedicationReminder(Base):
     __tablename__ = "medication_reminders"
@@ -56,6 +74,13 @@ class MedicationReminder(Base):
 
     user = relationship("User", back_populates="medication_reminders")
 
+    # Supports keyset pagination of a user's history, and the due-reminder
+    # sweep across all users
+    __table_args__ = (
+        Index("ix_medication_reminders_user_schedule_datetime_id", "user_id", "schedule_datetime", "id"),
+        Index("ix_medication_reminders_schedule_datetime_id", "schedule_datetime", "id"),
+    )
+
 
 class BPCheckReminder(Base):
     __tablename__ = "bp_check_reminders"
@@ -70,6 +95,13 @@ class BPCheckReminder(Base):
 
     user = relationship("User", back_populates="bp_check_reminders")
 
+    # Supports keyset pagination of a user's history, and the due-reminder
+    # sweep across all users
+    __table_args__ = (
+        Index("ix_bp_check_reminders_user_reminder_datetime_id", "user_id", "reminder_datetime", "id"),
+        Index("ix_bp_check_reminders_reminder_datetime_id", "reminder_datetime", "id"),
+    )
+
 
 class DoctorAppointmentReminder(Base):
     __tablename__ = "doctor_appointment_reminders"
@@ -86,6 +118,13 @@ class DoctorAppointmentReminder(Base):
 
     user = relationship("User", back_populates="doctor_appointment_reminders")
 
+    # Supports keyset pagination of a user's history, and the due-reminder
+    # sweep across all users
+    __table_args__ = (
+        Index("ix_doctor_appointment_reminders_user_appointment_datetime_id", "user_id", "appointment_datetime", "id"),
+        Index("ix_doctor_appointment_reminders_appointment_datetime_id", "appointment_datetime", "id"),
+    )
+
 
 class WorkoutReminder(Base):
     __tablename__ = "workout_reminders"
@@ -100,4 +139,186 @@ class WorkoutReminder(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     notes = Column(Text, nullable=True)  # Additional notes
 
-    user = relationship("User", back_populates="workout_reminders")
\ No newline at end of file
+    user = relationship("User", back_populates="workout_reminders")
+
+    # Supports keyset pagination of a user's history, and the due-reminder
+    # sweep across all users
+    __table_args__ = (
+        Index("ix_workout_reminders_user_workout_datetime_id", "user_id", "workout_datetime", "id"),
+        Index("ix_workout_reminders_workout_datetime_id", "workout_datetime", "id"),
+    )
+
+class BPUserStats(Base):
+    __tablename__ = "bp_user_stats"
+
+    # Running aggregates of a user's readings, maintained on every write
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    reading_count = Column(Integer, nullable=False, default=0)
+    sum_systolic = Column(BigInteger, nullable=False, default=0)
+    sum_diastolic = Column(BigInteger, nullable=False, default=0)
+    sum_pulse = Column(BigInteger, nullable=False, default=0)
+    sumsq_systolic = Column(BigInteger, nullable=False, default=0)  # Sum of squares, for variance
+    sumsq_diastolic = Column(BigInteger, nullable=False, default=0)
+    sumsq_pulse = Column(BigInteger, nullable=False, default=0)
+    min_systolic = Column(Integer, nullable=True)
+    max_systolic = Column(Integer, nullable=True)
+    min_diastolic = Column(Integer, nullable=True)
+    max_diastolic = Column(Integer, nullable=True)
+    min_pulse = Column(Integer, nullable=True)
+    max_pulse = Column(Integer, nullable=True)
+    normal_count = Column(Integer, nullable=False, default=0)
+    elevated_count = Column(Integer, nullable=False, default=0)
+    stage1_count = Column(Integer, nullable=False, default=0)
+    stage2_count = Column(Integer, nullable=False, default=0)
+    crisis_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+
+class BPDailyRollup(Base):
+    __tablename__ = "bp_daily_rollup"
+
+    # Per-day aggregates of a user's readings, maintained on every write
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC calendar day of reading_time
+    reading_count = Column(Integer, nullable=False, default=0)
+    sum_systolic = Column(BigInteger, nullable=False, default=0)
+    sum_diastolic = Column(BigInteger, nullable=False, default=0)
+    sum_pulse = Column(BigInteger, nullable=False, default=0)
+    min_systolic = Column(Integer, nullable=True)
+    max_systolic = Column(Integer, nullable=True)
+    min_diastolic = Column(Integer, nullable=True)
+    max_diastolic = Column(Integer, nullable=True)
+    min_pulse = Column(Integer, nullable=True)
+    max_pulse = Column(Integer, nullable=True)
+
+
+class OCRJob(Base):
+    __tablename__ = "ocr_jobs"
+
+    # OCR work accepted with 202 and run by the background worker pool
+    id = Column(String(32), primary_key=True)  # Random hex token, also the public job ID
+    kind = Column(String(20), nullable=False)  # "bp_upload" or "prescription"
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    notes = Column(Text, nullable=True)
+    image = Column(LargeBinary, nullable=True)  # Uploaded image, cleared once the job finishes
+    callback_url = Column(String(500), nullable=True)  # Webhook notified on completion
+    result_json = Column("result", Text, nullable=True)
+    error = Column(String(500), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_by = Column(String(100), nullable=True)  # Worker process running the job
+    lease_expires_at = Column(DateTime, nullable=True)  # Renewed while running; the job is requeued once it passes
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Supports picking up unfinished jobs at startup
+        Index("ix_ocr_jobs_status_created_at", "status", "created_at"),
+        # Supports finding running jobs whose lease expired
+        Index("ix_ocr_jobs_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+    @property
+    def result(self):
+        """Job output (the saved reading or the prescription extraction), parsed from JSON."""
+        return json.loads(self.result_json) if self.result_json else None
+
+
+class OCRPreview(Base):
+    __tablename__ = "ocr_previews"
+
+    # OCR extraction waiting for the user's approval, shared by all worker
+    # processes so the save request may land on any of them
+    token = Column(String(64), primary_key=True)  # Random URL-safe token returned to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    payload = Column(Text, nullable=False)  # Extracted values and notes, as JSON
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Supports deleting expired previews
+        Index("ix_ocr_previews_expires_at", "expires_at"),
+    )
+
+
+class ReminderSeries(Base):
+    __tablename__ = "reminder_series"
+
+    # A recurring medication or BP check reminder stored as a rule; its
+    # occurrences are expanded when queried instead of stored one per row
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)  # "medication" or "bp_check"
+    name = Column(String(100), nullable=True)  # Medication name
+    dosage = Column(String(100), nullable=True)  # Medication dosage description
+    bp_category = Column(String(20), nullable=True)  # BP category the check schedule was generated for
+    rule_json = Column("rule", Text, nullable=False)  # DosingRule, expanded from start_datetime
+    start_datetime = Column(DateTime, nullable=False)  # First occurrence
+    end_datetime = Column(DateTime, nullable=False)  # Last occurrence
+    notes = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    occurrences = relationship("ReminderOccurrence", back_populates="series", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Finds a user's series that are still running in a queried window
+        Index("ix_reminder_series_user_kind_end_datetime", "user_id", "kind", "end_datetime"),
+        # The same for the due-reminder sweep across all users
+        Index("ix_reminder_series_kind_end_datetime", "kind", "end_datetime"),
+    )
+
+    @property
+    def rule(self) -> DosingRule:
+        """The recurrence rule, parsed from JSON."""
+        return DosingRule.model_validate_json(self.rule_json)
+
+
+class ReminderOccurrence(Base):
+    __tablename__ = "reminder_occurrences"
+
+    # Exception to one occurrence of a series; occurrences without a row are pending
+    id = Column(Integer, primary_key=True, index=True)
+    series_id = Column(Integer, ForeignKey("reminder_series.id"), nullable=False)
+    occurrence_datetime = Column(DateTime, nullable=False)  # Scheduled time of the occurrence
+    status = Column(String(20), nullable=False)  # "done", "snoozed" or "skipped"
+    snoozed_until = Column(DateTime, nullable=True)  # When a snoozed occurrence is due again
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    series = relationship("ReminderSeries", back_populates="occurrences")
+
+    __table_args__ = (
+        UniqueConstraint("series_id", "occurrence_datetime", name="uq_reminder_occurrences_series_occurrence_datetime"),
+        # Finds occurrences snoozed into a queried window
+        Index("ix_reminder_occurrences_status_snoozed_until", "status", "snoozed_until"),
+    )
+
+
+class ReminderDelivery(Base):
+    __tablename__ = "reminder_deliveries"
+
+    # A due reminder queued for the notification sinks. Dispatchers claim
+    # batches under a lease, so each one is sent by one replica; leases of
+    # dispatchers that die expire and the rows are claimed again
+    id = Column(Integer, primary_key=True, index=True)
+    reminder_key = Column(String(100), nullable=False, unique=True)  # Reminder and due time, e.g. "medication:12:2026-01-01T08:00:00"
+    source_type = Column(String(20), nullable=False)  # Reminder type, or "series" for occurrences
+    source_id = Column(Integer, nullable=False)  # Reminder or series ID
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    due_at = Column(DateTime, nullable=False)
+    payload = Column(Text, nullable=False)  # DueReminder JSON sent to the sinks
+    status = Column(String(20), nullable=False, default="pending")  # pending, claimed, sent
+    claimed_by = Column(String(100), nullable=True)  # Dispatcher holding the lease
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Supports claiming the earliest due deliveries
+        Index("ix_reminder_deliveries_status_due_at", "status", "due_at"),
+        # Supports replacing the pending deliveries of a changed reminder
+        Index("ix_reminder_deliveries_source_type_source_id", "source_type", "source_id"),
+        # Supports relaying recently sent deliveries to the SSE streams of every replica
+        Index("ix_reminder_deliveries_status_sent_at", "status", "sent_at"),
+    )
@@ -1,14 +1,20 @@
 import os
-import base64
+import asyncio
 import json
-from typing import Dict, Tuple
-from PIL import Image
-from io import BytesIO
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
 import logging
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
 from pydantic import BaseModel, Field
 
+from .image_encoder import EncoderSettings, encode_image, settings_from_env
+from .ocr_cache import OCRResultCache
+from .seven_segment import read_display
+
 # Load environment variables
 load_dotenv()
 
@@ -22,6 +28,86 @@ AZURE_ENDPOINT = os.getenv("AZURE_ENDPOINT")
 AZURE_API_VERSION = os.getenv("AZURE_API_VERSION")
 AZURE_DEPLOYMENT = os.getenv("AZURE_DEPLOYMENT")
 
+# How long an extracted reading is reused for the same image
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", "86400"))
+
+# Read seven-segment displays locally first and only call the vision model
+# when the local reading is missing or below this confidence
+OCR_LOCAL_ENGINE = os.getenv("OCR_LOCAL_ENGINE", "true").lower() in ("1", "true", "yes")
+OCR_LOCAL_MIN_CONFIDENCE = float(os.getenv("OCR_LOCAL_MIN_CONFIDENCE", "0.9"))
+
+# Image encoding for the vision call; monitor digits are large, so a few tiles
+# suffice, and the photo is cropped to the display when it can be found
+OCR_IMAGE_SETTINGS = settings_from_env(
+    "OCR_IMAGE", EncoderSettings(detail="high", max_tiles=2, jpeg_quality=85, auto_crop=True)
+)
+
+# Batch uploads: local reading and image encoding run in a process pool of
+# OCR_BATCH_PROCESSES workers, and at most OCR_BATCH_CONCURRENCY vision calls
+# are in flight per batch
+OCR_BATCH_PROCESSES = int(os.getenv("OCR_BATCH_PROCESSES", str(min(4, os.cpu_count() or 1))))
+OCR_BATCH_CONCURRENCY = int(os.getenv("OCR_BATCH_CONCURRENCY", "8"))
+OCR_BATCH_MAX_IMAGES = int(os.getenv("OCR_BATCH_MAX_IMAGES", "50"))
+
+_batch_executor: Optional[ProcessPoolExecutor] = None
+
+def get_batch_executor() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound OCR preparation (batch uploads, document pages), created on first use."""
+    global _batch_executor
+    if _batch_executor is None:
+        # spawn: forking a process that runs an event loop and client threads is unsafe
+        _batch_executor = ProcessPoolExecutor(
+            max_workers=OCR_BATCH_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _batch_executor
+
+def shutdown_batch_executor() -> None:
+    """Stop the batch process pool (at shutdown, or when a worker died); the next batch starts a new one."""
+    global _batch_executor
+    if _batch_executor is not None:
+        _batch_executor.shutdown(wait=False, cancel_futures=True)
+        _batch_executor = None
+
+def _read_display_confidently(image_data: bytes, min_confidence: float) -> Optional[Tuple[int, int, int]]:
+    """
+    Run the local seven-segment reader.
+    Returns (systolic, diastolic, pulse) if it is confident enough, otherwise None.
+    """
+    try:
+        reading = read_display(image_data)
+    except Exception as e:
+        logger.warning(f"Local display reader failed: {e}")
+        return None
+
+    if reading is None:
+        logger.info("Local display reader found no digits, using vision model")
+        return None
+    if reading.confidence < min_confidence:
+        logger.info(f"Local display reading confidence {reading.confidence:.2f} too low, using vision model")
+        return None
+
+    logger.info(f"Read display locally with confidence {reading.confidence:.2f}")
+    return (reading.systolic, reading.diastolic, reading.pulse)
+
+def _prepare_batch_image(
+    image_data: bytes,
+    settings: EncoderSettings,
+    local_min_confidence: Optional[float]
+) -> Tuple[Optional[Tuple[int, int, int]], Optional[str]]:
+    """
+    CPU-bound part of a batch upload, run in the process pool.
+
+    Returns (readings, None) when the display was read locally, or
+    (None, base64 image) for the vision call. A local_min_confidence of
+    None skips the local reader.
+    """
+    if local_min_confidence is not None:
+        local = _read_display_confidently(image_data, local_min_confidence)
+        if local is not None:
+            return local, None
+    return None, encode_image(image_data, settings).base64
+
 # Define the Pydantic model for structured output
 class BloodPressureReading(BaseModel):
     """
@@ -58,52 +144,125 @@ class OCRProcessor:
             logger.warning(f"Missing required environment variables: {', '.join(missing_vars)}")
             logger.warning("OCR functionality may not work correctly. Please check your .env file.")
 
-        # Initialize the Azure OpenAI client
+        # Initialize the Azure OpenAI clients; the async one serves the API endpoints
         try:
             self.client = AzureOpenAI(
                 api_version=AZURE_API_VERSION,
                 azure_endpoint=AZURE_ENDPOINT,
                 api_key=AZURE_API_KEY,
             )
+            self.async_client = AsyncAzureOpenAI(
+                api_version=AZURE_API_VERSION,
+                azure_endpoint=AZURE_ENDPOINT,
+                api_key=AZURE_API_KEY,
+            )
         except Exception as e:
             logger.error(f"Failed to initialize Azure OpenAI client: {e}")
             self.client = None
+            self.async_client = None
+
+        # Results for images seen before, so retries don't repeat the vision call.
+        # Only identical images hit: photos of different readings on the same
+        # monitor are perceptual near-duplicates of each other
+        self.cache = OCRResultCache("bp", OCR_CACHE_TTL_SECONDS, phash_distance=None)
+        self.image_settings = OCR_IMAGE_SETTINGS
+        self.local_engine = OCR_LOCAL_ENGINE
+        self.local_min_confidence = OCR_LOCAL_MIN_CONFIDENCE
+
+    def _read_locally(self, image_data: bytes) -> Optional[Tuple[int, int, int]]:
+        """
+        Try the local seven-segment reader.
+        Returns the readings if it is confident enough, otherwise None.
+        """
+        if not self.local_engine:
+            return None
+
+        local = _read_display_confidently(image_data, self.local_min_confidence)
+        if local is None:
+            return None
+        return self._check_readings(*local)
 
     def _prepare_image(self, image_data: bytes) -> str:
         """
         Prepare the image for OCR processing.
-        Resize and convert to base64 if needed.
+        Orient, resize and re-encode it within the token budget and return it as base64.
         """
         try:
-            # Open image and resize if necessary
-            img = Image.open(BytesIO(image_data))
-
-            # Resize if the image is too large
-            if max(img.size) > 1024:
-                img.thumbnail((1024, 1024))
-
-            # Convert to RGB if it's not already
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            # Convert back to bytes
-            buffer = BytesIO()
-            img.save(buffer, format="JPEG")
-            buffer.seek(0)
-
-            # Convert to base64
-            encoded_image = base64.b64encode(buffer.read()).decode('utf-8')
-            return encoded_image
+            encoded = encode_image(image_data, self.image_settings)
+            logger.info(
+                f"Prepared {encoded.width}x{encoded.height} image: "
+                f"{encoded.size_bytes} bytes, ~{encoded.tokens} prompt tokens"
+                + (f", cropped to {encoded.crop_box}" if encoded.crop_box else "")
+            )
+            return encoded.base64
 
         except Exception as e:
             logger.error(f"Error preparing image: {e}")
             raise
 
+    def _build_messages(self, base64_image: str) -> list:
+        """Create the chat messages asking the model to read the monitor display."""
+        return [
+            {
+                "role": "system",
+                "content": "You are a highly accurate blood pressure reading OCR system. Your task is to analyze images from blood pressure monitors and extract ONLY the following values: systolic (top number), diastolic (bottom number), and pulse rate. Return ONLY these three numbers in a JSON format. If any of these values are missing, do not guess - use 0 instead. Do not include any explanations, just return the JSON."
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "Extract the systolic pressure, diastolic pressure, and pulse readings from this blood pressure monitor image. Only return the numbers in the exact JSON format: {\"systolic\": X, \"diastolic\": Y, \"pulse\": Z}. If any reading is unclear or missing, use 0 for that value."
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "detail": self.image_settings.detail
+                        }
+                    }
+                ]
+            }
+        ]
+
+    def _check_readings(self, systolic: int, diastolic: int, pulse: int) -> Tuple[int, int, int]:
+        """Log implausible values and return the readings unchanged."""
+        # Basic validation
+        if systolic < 70 or systolic > 250:
+            logger.warning(f"Unusual systolic value detected: {systolic}")
+        if diastolic < 40 or diastolic > 150:
+            logger.warning(f"Unusual diastolic value detected: {diastolic}")
+        if pulse < 30 or pulse > 220:
+            logger.warning(f"Unusual pulse value detected: {pulse}")
+
+        return (systolic, diastolic, pulse)
+
     def extract_readings(self, image_data: bytes) -> Tuple[int, int, int]:
         """
-        Process image data and extract blood pressure readings using Azure OpenAI API.
+        Process image data and extract blood pressure readings.
         Returns a tuple of (systolic, diastolic, pulse) values.
+
+        Seven-segment displays are read locally when the local reader is
+        confident; other images go to the Azure OpenAI API.
+
+        Blocks while the image is prepared and the API responds; request
+        handlers should use extract_readings_async instead.
         """
+        cached = self.cache.get(image_data)
+        if cached is not None:
+            return tuple(cached)
+
+        readings = self._extract_readings_uncached(image_data)
+        if any(readings):
+            self.cache.put(image_data, list(readings))
+        return readings
+
+    def _extract_readings_uncached(self, image_data: bytes) -> Tuple[int, int, int]:
+        """Read the display locally, or run the vision call, for extract_readings."""
+        local = self._read_locally(image_data)
+        if local is not None:
+            return local
+
         # Check if client is initialized
         if self.client is None:
             logger.error("Azure OpenAI client is not initialized. Cannot process image.")
@@ -114,27 +273,7 @@ class OCRProcessor:
             base64_image = self._prepare_image(image_data)
 
             # Create the messages for the API call
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a highly accurate blood pressure reading OCR system. Your task is to analyze images from blood pressure monitors and extract ONLY the following values: systolic (top number), diastolic (bottom number), and pulse rate. Return ONLY these three numbers in a JSON format. If any of these values are missing, do not guess - use 0 instead. Do not include any explanations, just return the JSON."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Extract the systolic pressure, diastolic pressure, and pulse readings from this blood pressure monitor image. Only return the numbers in the exact JSON format: {\"systolic\": X, \"diastolic\": Y, \"pulse\": Z}. If any reading is unclear or missing, use 0 for that value."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ]
+            messages = self._build_messages(base64_image)
 
             # Check if the API version supports structured output
             if self._supports_structured_output():
@@ -150,9 +289,7 @@ class OCRProcessor:
 
                     # Extract the structured data
                     reading = completion.choices[0].message.parsed
-                    systolic = reading.systolic
-                    diastolic = reading.diastolic
-                    pulse = reading.pulse
+                    return self._check_readings(reading.systolic, reading.diastolic, reading.pulse)
 
                 except (AttributeError, ImportError) as e:
                     logger.warning(f"Structured output failed, falling back to standard method: {e}")
@@ -161,20 +298,129 @@ class OCRProcessor:
                 # Fall back to legacy method if structured output is not supported
                 return self._extract_readings_legacy(base64_image, messages)
 
-            # Basic validation
-            if systolic < 70 or systolic > 250:
-                logger.warning(f"Unusual systolic value detected: {systolic}")
-            if diastolic < 40 or diastolic > 150:
-                logger.warning(f"Unusual diastolic value detected: {diastolic}")
-            if pulse < 30 or pulse > 220:
-                logger.warning(f"Unusual pulse value detected: {pulse}")
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            return (0, 0, 0)
+
+    async def extract_readings_async(self, image_data: bytes) -> Tuple[int, int, int]:
+        """
+        Non-blocking version of extract_readings for use in async endpoints.
+
+        Image decoding and re-encoding run in the default thread pool executor
+        and the API call is awaited on the async client, so other requests on
+        the event loop keep being served while a reading is processed.
+        """
+        # Cache lookups hash the image and may hit SQLite, so they run in the executor too
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.cache.get, image_data)
+        if cached is not None:
+            return tuple(cached)
+
+        readings = await self._extract_readings_async_uncached(image_data)
+        if any(readings):
+            await loop.run_in_executor(None, self.cache.put, image_data, list(readings))
+        return readings
+
+    async def _extract_readings_async_uncached(self, image_data: bytes) -> Tuple[int, int, int]:
+        """Read the display locally, or run the vision call, for extract_readings_async."""
+        loop = asyncio.get_running_loop()
+        local = await loop.run_in_executor(None, self._read_locally, image_data)
+        if local is not None:
+            return local
+
+        try:
+            # Prepare the image off the event loop (PIL work is CPU-bound)
+            base64_image = await loop.run_in_executor(None, self._prepare_image, image_data)
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            return (0, 0, 0)
+
+        return await self._request_readings_async(base64_image)
+
+    async def _request_readings_async(self, base64_image: str) -> Tuple[int, int, int]:
+        """Send a prepared image to the vision model and parse the readings."""
+        # Check if client is initialized
+        if self.async_client is None:
+            logger.error("Azure OpenAI client is not initialized. Cannot process image.")
+            return (0, 0, 0)
+
+        try:
+            # Create the messages for the API call
+            messages = self._build_messages(base64_image)
+
+            if self._supports_structured_output():
+                logger.info("Using structured output for OCR processing")
+                try:
+                    completion = await self.async_client.beta.chat.completions.parse(
+                        messages=messages,
+                        temperature=0.1,
+                        model=AZURE_DEPLOYMENT,
+                        response_format=BloodPressureReading
+                    )
+                    reading = completion.choices[0].message.parsed
+                    return self._check_readings(reading.systolic, reading.diastolic, reading.pulse)
+
+                except (AttributeError, ImportError) as e:
+                    logger.warning(f"Structured output failed, falling back to standard method: {e}")
 
-            return (systolic, diastolic, pulse)
+            logger.info("Using legacy method for OCR processing")
+            completion = await self.async_client.chat.completions.create(
+                messages=messages,
+                temperature=0.1,
+                max_tokens=100,
+                model=AZURE_DEPLOYMENT,
+                response_format={"type": "json_object"}
+            )
+            return self._parse_readings(completion.choices[0].message.content)
 
         except Exception as e:
             logger.error(f"Error processing image: {e}")
             return (0, 0, 0)
 
+    async def extract_readings_batch(self, images: List[bytes]) -> List[Tuple[int, int, int]]:
+        """
+        Extract readings from many images at once, in input order.
+
+        Cached images are answered directly. The rest are read locally or
+        encoded in the batch process pool, so decoding large photos uses
+        several cores instead of queueing on the thread pool, and their vision
+        calls run concurrently, at most OCR_BATCH_CONCURRENCY at a time.
+        A failed image gives (0, 0, 0) like extract_readings_async.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(OCR_BATCH_CONCURRENCY)
+        local_min_confidence = self.local_min_confidence if self.local_engine else None
+
+        async def extract(image_data: bytes) -> Tuple[int, int, int]:
+            cached = await loop.run_in_executor(None, self.cache.get, image_data)
+            if cached is not None:
+                return tuple(cached)
+
+            try:
+                local, base64_image = await loop.run_in_executor(
+                    get_batch_executor(), _prepare_batch_image,
+                    image_data, self.image_settings, local_min_confidence
+                )
+            except BrokenProcessPool as e:
+                logger.error(f"OCR batch process pool failed: {e}")
+                shutdown_batch_executor()
+                return (0, 0, 0)
+            except Exception as e:
+                logger.error(f"Error preparing image: {e}")
+                return (0, 0, 0)
+
+            if local is not None:
+                readings = self._check_readings(*local)
+            else:
+                async with semaphore:
+                    readings = await self._request_readings_async(base64_image)
+
+            if any(readings):
+                await loop.run_in_executor(None, self.cache.put, image_data, list(readings))
+            return readings
+
+        return list(await asyncio.gather(*(extract(image_data) for image_data in images)))
+
     def _supports_structured_output(self) -> bool:
         """
         Check if the current API version and client support structured output.
@@ -205,29 +451,32 @@ class OCRProcessor:
             )
 
             # Extract the content from the response
-            content = completion.choices[0].message.content
-
-            # Extract JSON
-            try:
-                # Try to parse directly
-                readings = json.loads(content)
-            except json.JSONDecodeError:
-                # If direct parsing fails, try to extract JSON from the text
-                import re
-                json_match = re.search(r'\{.*\}', content)
-                if json_match:
-                    readings = json.loads(json_match.group(0))
-                else:
-                    logger.error(f"Could not extract JSON from response: {content}")
-                    return (0, 0, 0)
-
-            # Extract the readings
-            systolic = int(readings.get("systolic", 0))
-            diastolic = int(readings.get("diastolic", 0))
-            pulse = int(readings.get("pulse", 0))
-
-            return (systolic, diastolic, pulse)
+            return self._parse_readings(completion.choices[0].message.content)
 
         except Exception as e:
             logger.error(f"Error in legacy OCR processing: {e}")
-            return (0, 0, 0)
\ No newline at end of file
+            return (0, 0, 0)
+
+    def _parse_readings(self, content: str) -> Tuple[int, int, int]:
+        """
+        Parse the JSON readings out of a chat completion's text content.
+        """
+        # Extract JSON
+        try:
+            # Try to parse directly
+            readings = json.loads(content)
+        except json.JSONDecodeError:
+            # If direct parsing fails, try to extract JSON from the text
+            json_match = re.search(r'\{.*\}', content)
+            if json_match:
+                readings = json.loads(json_match.group(0))
+            else:
+                logger.error(f"Could not extract JSON from response: {content}")
+                return (0, 0, 0)
+
+        # Extract the readings
+        systolic = int(readings.get("systolic", 0))
+        diastolic = int(readings.get("diastolic", 0))
+        pulse = int(readings.get("pulse", 0))
+
+        return (systolic, diastolic, pulse)
\ No newline at end of file
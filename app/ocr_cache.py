@@ -0,0 +1,217 @@
+import os
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "256"))
+OCR_CACHE_DB = os.getenv("OCR_CACHE_DB")  # Path of the optional on-disk tier, e.g. ./ocr_cache.db
+# Maximum Hamming distance between perceptual hashes for a near-duplicate hit;
+# unset disables near-duplicate matching (only identical images hit). Never
+# used for BP readings, whose photos differ in a few digits only
+OCR_CACHE_PHASH_DISTANCE = os.getenv("OCR_CACHE_PHASH_DISTANCE")
+
+# Registry of caches by namespace, for the stats endpoint
+_caches: Dict[str, "OCRResultCache"] = {}
+
+
+def perceptual_hash(image_data: bytes) -> Optional[int]:
+    """
+    64-bit difference hash (dHash) of an image.
+
+    Visually similar photos (re-encoded, slightly resized) get hashes that
+    differ in only a few bits. Returns None if the image cannot be decoded.
+    """
+    try:
+        img = Image.open(BytesIO(image_data))
+        img.draft("L", (64, 64))  # Let the JPEG decoder downscale while decoding
+        pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+class OCRResultCache:
+    """
+    Content-addressed cache of OCR results.
+
+    Results are keyed by the SHA-256 of the image bytes, so re-sending the same
+    photo (retries, preview followed by upload) skips the vision call. Entries
+    live in an in-memory LRU with a TTL and, if OCR_CACHE_DB is set, in a SQLite
+    file that survives restarts. With OCR_CACHE_PHASH_DISTANCE set, an image
+    whose perceptual hash is that close to a cached one also counts as a hit.
+    Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: int,
+        max_entries: int = OCR_CACHE_MAX_ENTRIES,
+        db_path: Optional[str] = OCR_CACHE_DB,
+        phash_distance: Optional[str] = OCR_CACHE_PHASH_DISTANCE
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.phash_distance = int(phash_distance) if phash_distance not in (None, "") else None
+
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "near_duplicate_hits": 0, "misses": 0, "stores": 0}
+
+        self._db = None
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS ocr_cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        phash TEXT,
+                        value TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                """)
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"OCR cache database unavailable, using memory only: {e}")
+                self._db = None
+
+        _caches[namespace] = self
+
+    @staticmethod
+    def image_key(image_data: bytes) -> str:
+        """Content address of an image."""
+        return hashlib.sha256(image_data).hexdigest()
+
+    def get(self, image_data: bytes) -> Optional[Any]:
+        """Return the cached result for an image, or None on a miss."""
+        key = self.image_key(image_data)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[0]
+
+        value = self._get_from_disk(key, now)
+        if value is not None:
+            with self._lock:
+                self._counters["disk_hits"] += 1
+            return value
+
+        if self.phash_distance is not None:
+            value = self._get_near_duplicate(perceptual_hash(image_data), now)
+            if value is not None:
+                with self._lock:
+                    self._counters["near_duplicate_hits"] += 1
+                return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, image_data: bytes, value: Any) -> None:
+        """Store the OCR result for an image. The value must be JSON-serializable."""
+        key = self.image_key(image_data)
+        phash = perceptual_hash(image_data) if self.phash_distance is not None else None
+        now = time.time()
+
+        with self._lock:
+            self._store_in_memory(key, value, phash, now)
+            self._counters["stores"] += 1
+
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO ocr_cache (namespace, key, phash, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (self.namespace, key, None if phash is None else format(phash, "016x"), json.dumps(value), now)
+                    )
+                    self._db.execute(
+                        "DELETE FROM ocr_cache WHERE namespace = ? AND created_at < ?",
+                        (self.namespace, now - self.ttl_seconds)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to write OCR cache entry: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        """Drop every entry in this namespace (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM ocr_cache WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def _store_in_memory(self, key: str, value: Any, phash: Optional[int], created_at: float) -> None:
+        """Insert into the LRU, evicting the least recently used entry when full. Caller holds the lock."""
+        self._entries[key] = (value, phash, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_from_disk(self, key: str, now: float) -> Optional[Any]:
+        """Look up the SQLite tier and promote a hit into memory."""
+        if self._db is None:
+            return None
+
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT value, phash, created_at FROM ocr_cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to read OCR cache entry: {e}")
+                return None
+
+            if row is None or now - row[2] >= self.ttl_seconds:
+                return None
+
+            value = json.loads(row[0])
+            self._store_in_memory(key, value, None if row[1] is None else int(row[1], 16), row[2])
+            return value
+
+    def _get_near_duplicate(self, phash: Optional[int], now: float) -> Optional[Any]:
+        """Find a fresh in-memory entry whose perceptual hash is within the configured distance."""
+        if phash is None:
+            return None
+
+        with self._lock:
+            for key, (value, entry_phash, created_at) in reversed(self._entries.items()):
+                if entry_phash is None or now - created_at >= self.ttl_seconds:
+                    continue
+                if bin(phash ^ entry_phash).count("1") <= self.phash_distance:
+                    self._entries.move_to_end(key)
+                    return value
+        return None
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Counters of every OCR cache, by namespace."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
@@ -0,0 +1,419 @@
+import os
+import asyncio
+import datetime
+import ipaddress
+import json
+import logging
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Background OCR job configuration
+OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", "4"))
+OCR_JOB_MAX_QUEUED = int(os.getenv("OCR_JOB_MAX_QUEUED", "200"))
+OCR_JOB_MAX_WAIT_SECONDS = int(os.getenv("OCR_JOB_MAX_WAIT_SECONDS", "30"))
+# Running jobs hold a lease, renewed while they run; jobs whose lease expired
+# are assumed lost with their process and queued again
+OCR_JOB_LEASE_SECONDS = int(os.getenv("OCR_JOB_LEASE_SECONDS", "60"))
+# Runs of one job before it is failed (its process died every time)
+OCR_JOB_MAX_ATTEMPTS = 3
+OCR_JOB_WEBHOOK_TIMEOUT_SECONDS = int(os.getenv("OCR_JOB_WEBHOOK_TIMEOUT_SECONDS", "10"))
+OCR_JOB_WEBHOOK_ATTEMPTS = 3
+# Hosts job results may be POSTed to, comma-separated. When unset, any host
+# is accepted whose addresses are all public (no loopback, private or
+# link-local addresses), so results cannot be sent into the internal network
+OCR_JOB_CALLBACK_HOSTS = {
+    host.strip().lower() for host in os.getenv("OCR_JOB_CALLBACK_HOSTS", "").split(",") if host.strip()
+}
+
+# How often a waiter checks the database for jobs run by another process
+POLL_INTERVAL_SECONDS = 0.5
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Runs one job and returns its JSON-serializable result; raising fails the job
+JobHandler = Callable[[models.OCRJob, Session], Awaitable[dict]]
+
+
+def check_callback_url(callback_url: str) -> None:
+    """
+    Raise ValueError unless callback_url is an http(s) URL of an allowed host:
+    one listed in OCR_JOB_CALLBACK_HOSTS, or, without that list, a host that
+    only resolves to public addresses. Resolves the host, so it blocks.
+    """
+    parts = urlsplit(callback_url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+
+    if OCR_JOB_CALLBACK_HOSTS:
+        if host not in OCR_JOB_CALLBACK_HOSTS:
+            raise ValueError("callback_url host is not allowed")
+        return
+
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError, UnicodeError):
+        raise ValueError("callback_url host cannot be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("callback_url must point to a public address")
+
+
+class OCRJobQueue:
+    """
+    Bounded pool of asyncio workers running OCR jobs stored in the ocr_jobs table.
+
+    Jobs are written to the database before they are queued, so they survive
+    a restart: start() requeues unfinished jobs. A job is claimed with a
+    conditional UPDATE, so each one runs once even when several processes
+    share the database. A running job holds a lease of OCR_JOB_LEASE_SECONDS
+    that its worker renews; every process periodically requeues jobs whose
+    lease expired, so jobs of a process that died are run again (up to
+    OCR_JOB_MAX_ATTEMPTS times). Handlers are registered per job kind by the
+    routers that own the OCR processors.
+    """
+
+    def __init__(self, workers: int = OCR_JOB_WORKERS, max_queued: int = OCR_JOB_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        # Identifies this process's leases
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Set the coroutine that runs jobs of this kind."""
+        self._handlers[kind] = handler
+
+    def full(self) -> bool:
+        """True when max_queued jobs are already waiting for a worker."""
+        return self._queue is not None and self._queue.qsize() >= self.max_queued
+
+    async def start(self) -> None:
+        """Start the workers on the running event loop and requeue unfinished jobs."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        for job_id in await self._loop.run_in_executor(None, self._recover):
+            self._queue.put_nowait(job_id)
+        self._tasks.append(asyncio.create_task(self._expire_leases()))
+
+    async def stop(self) -> None:
+        """
+        Cancel the workers and release the jobs they were running, for any
+        process to pick up at its next lease check.
+        """
+        if self._loop is None:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            released = await self._loop.run_in_executor(None, self._release)
+            if released:
+                logger.info(f"Released {released} OCR jobs interrupted by shutdown")
+        except Exception as e:
+            logger.error(f"Interrupted OCR jobs could not be requeued; they are retried when their lease expires: {e}")
+        self._queue = None
+        self._loop = None
+
+    async def submit(
+        self,
+        db: Session,
+        kind: str,
+        user_id: int,
+        image: bytes,
+        notes: Optional[str] = None,
+        callback_url: Optional[str] = None
+    ) -> models.OCRJob:
+        """Store a new job and queue it. Check full() first to keep the queue bounded."""
+        if self._loop is not asyncio.get_running_loop():
+            await self.start()
+
+        job = models.OCRJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            user_id=user_id,
+            status="queued",
+            notes=notes,
+            image=image,
+            callback_url=callback_url
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self._finished[job.id] = asyncio.Event()
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """
+        Return once the job has finished or timeout seconds have passed.
+
+        Jobs queued by this process are awaited directly; others (run by
+        another worker process or recovered at startup) are polled.
+        """
+        event = self._finished.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            status = await loop.run_in_executor(None, self._status, job_id)
+            if status not in ACTIVE_STATUSES:
+                return
+            await asyncio.sleep(min(POLL_INTERVAL_SECONDS, max(0.0, deadline - loop.time())))
+
+    def _status(self, job_id: str) -> Optional[str]:
+        """Current status of a job, read in a fresh session."""
+        db = SessionLocal()
+        try:
+            job = db.query(models.OCRJob.status).filter(models.OCRJob.id == job_id).first()
+            return job.status if job else None
+        finally:
+            db.close()
+
+    def _recover(self) -> List[str]:
+        """Requeue running jobs whose lease expired and return the IDs of all queued jobs, oldest first."""
+        db = SessionLocal()
+        try:
+            reset = len(self._requeue_expired(db))
+            job_ids = [
+                job_id for (job_id,) in db.query(models.OCRJob.id)
+                .filter(models.OCRJob.status == "queued")
+                .order_by(models.OCRJob.created_at)
+            ]
+            if job_ids:
+                logger.info(f"Requeued {len(job_ids)} OCR jobs ({reset} abandoned while running)")
+            return job_ids
+        finally:
+            db.close()
+
+    @staticmethod
+    def _requeue_expired(db: Session) -> List[str]:
+        """
+        Take over jobs nobody is working on, and commit: running jobs whose
+        lease expired are set back to queued, or to failed once they used up
+        their attempts, and jobs released by a process that shut down are
+        taken as they are. Returns the IDs of the jobs to queue here.
+        """
+        now = datetime.datetime.utcnow()
+        job = models.OCRJob
+        # Jobs started before leases were recorded have none
+        lease_expired = or_(job.lease_expires_at.is_(None), job.lease_expires_at < now)
+        abandoned = and_(job.status == "running", lease_expired)
+        released = and_(job.status == "queued", job.lease_expires_at < now)
+
+        db.execute(
+            update(job)
+            .where(abandoned, job.attempts >= OCR_JOB_MAX_ATTEMPTS)
+            .values(status="failed", error="Processing was interrupted too many times",
+                    image=None, finished_at=now, claimed_by=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        job_ids = db.execute(
+            update(job)
+            .where(or_(abandoned, released))
+            .values(status="queued", claimed_by=None, lease_expires_at=None)
+            .returning(job.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.commit()
+        return job_ids
+
+    def _expire(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            return self._requeue_expired(db)
+        finally:
+            db.close()
+
+    async def _expire_leases(self) -> None:
+        """Queue the jobs of dead or stopped processes here, every half lease, until cancelled."""
+        while True:
+            await asyncio.sleep(OCR_JOB_LEASE_SECONDS / 2)
+            try:
+                job_ids = await self._loop.run_in_executor(None, self._expire)
+            except Exception as e:
+                logger.error(f"Expired OCR job leases could not be checked: {e}")
+                continue
+            if job_ids:
+                logger.info(f"Requeued {len(job_ids)} OCR jobs whose lease expired")
+            for job_id in job_ids:
+                self._queue.put_nowait(job_id)
+
+    def _renew(self, job_id: str) -> None:
+        """Extend the lease of a job this process is running."""
+        db = SessionLocal()
+        try:
+            db.query(models.OCRJob).filter(
+                models.OCRJob.id == job_id,
+                models.OCRJob.status == "running",
+                models.OCRJob.claimed_by == self.worker_id
+            ).update({
+                "lease_expires_at": datetime.datetime.utcnow() + datetime.timedelta(seconds=OCR_JOB_LEASE_SECONDS)
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew a running job's lease every third of its length until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(OCR_JOB_LEASE_SECONDS / 3)
+            try:
+                await loop.run_in_executor(None, self._renew, job_id)
+            except Exception as e:
+                logger.warning(f"Lease of OCR job {job_id} could not be renewed: {e}")
+
+    def _release(self) -> int:
+        """
+        Set the jobs this process was running back to queued with an expired
+        lease, for the next lease check of any process. The interrupted run
+        does not count as an attempt. Returns the number of jobs released.
+        """
+        db = SessionLocal()
+        try:
+            released = db.query(models.OCRJob).filter(
+                models.OCRJob.status == "running",
+                models.OCRJob.claimed_by == self.worker_id
+            ).update({
+                "status": "queued",
+                "claimed_by": None,
+                "lease_expires_at": datetime.datetime.utcnow(),
+                "attempts": models.OCRJob.attempts - 1
+            }, synchronize_session=False)
+            db.commit()
+            return released
+        finally:
+            db.close()
+
+    async def _worker(self) -> None:
+        """Run queued jobs one at a time until cancelled."""
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"OCR job {job_id} could not be processed: {e}")
+            finally:
+                # Wake any waiters even if the job was claimed elsewhere or failed to finish
+                event = self._finished.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        """Claim, run and finish one job, then notify its webhook."""
+        db = SessionLocal()
+        try:
+            now = datetime.datetime.utcnow()
+            claimed = db.query(models.OCRJob).filter(
+                models.OCRJob.id == job_id,
+                models.OCRJob.status == "queued"
+            ).update({
+                "status": "running",
+                "started_at": now,
+                "claimed_by": self.worker_id,
+                "lease_expires_at": now + datetime.timedelta(seconds=OCR_JOB_LEASE_SECONDS),
+                "attempts": models.OCRJob.attempts + 1
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                # Already taken by another process, or finished
+                return
+
+            job = db.query(models.OCRJob).filter(models.OCRJob.id == job_id).first()
+            handler = self._handlers.get(job.kind)
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for OCR job kind '{job.kind}'")
+                result = await handler(job, db)
+                outcome = {"status": "succeeded", "result_json": json.dumps(result)}
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"OCR job {job_id} failed: {e}")
+                outcome = {"status": "failed", "error": str(e)[:500]}
+            finally:
+                heartbeat.cancel()
+
+            # Only while the lease is still ours: if it expired, another process runs the job now
+            finished = db.query(models.OCRJob).filter(
+                models.OCRJob.id == job_id,
+                models.OCRJob.status == "running",
+                models.OCRJob.claimed_by == self.worker_id
+            ).update({
+                **outcome,
+                "image": None,
+                "finished_at": datetime.datetime.utcnow(),
+                "claimed_by": None,
+                "lease_expires_at": None
+            }, synchronize_session=False)
+            db.commit()
+            if not finished:
+                logger.warning(f"OCR job {job_id} was taken over after its lease expired; this run's outcome is discarded")
+                return
+
+            db.refresh(job)
+            payload = schemas.OCRJob.model_validate(job).model_dump(mode="json")
+            callback_url = job.callback_url
+        finally:
+            db.close()
+
+        event = self._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+        if callback_url:
+            await self._notify(callback_url, payload)
+
+    async def _notify(self, callback_url: str, payload: dict) -> None:
+        """POST the finished job to its webhook, retrying with backoff."""
+        # Checked again at send time: the host may resolve differently than when the job was submitted
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, check_callback_url, callback_url)
+        except ValueError as e:
+            logger.warning(f"Webhook for OCR job {payload['id']} not sent: {e}")
+            return
+
+        # Redirects are not followed, so an allowed host cannot forward the results elsewhere
+        async with httpx.AsyncClient(timeout=OCR_JOB_WEBHOOK_TIMEOUT_SECONDS, follow_redirects=False) as client:
+            for attempt in range(OCR_JOB_WEBHOOK_ATTEMPTS):
+                try:
+                    response = await client.post(callback_url, json=payload)
+                    response.raise_for_status()
+                    return
+                except httpx.HTTPError as e:
+                    logger.warning(f"Webhook for OCR job {payload['id']} failed (attempt {attempt + 1}): {e}")
+                    if attempt + 1 < OCR_JOB_WEBHOOK_ATTEMPTS:
+                        await asyncio.sleep(2 ** attempt)
+
+
+# Shared by the routers that accept background OCR jobs
+ocr_job_queue = OCRJobQueue()
@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List:
+    """
+    Decode a cursor produced by encode_cursor for the given sort columns.
+
+    Raises a 400 error if the cursor is malformed or does not match the columns.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("cursor does not match sort order")
+
+        values = []
+        for column, value in zip(columns, payload):
+            if value is not None and column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except (ValueError, TypeError, UnicodeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_paginate(
+    query,
+    columns: Sequence,
+    after: Optional[str],
+    limit: int,
+    descending: bool = False,
+    skip: int = 0
+) -> Tuple[List, Optional[str]]:
+    """
+    Fetch one page of a query ordered by columns, starting after a cursor.
+
+    columns must end with a unique column (normally the primary key) so the
+    order is total. With a matching composite index every page is a single
+    index seek, no matter how deep it is.
+
+    skip is the legacy offset and only applies when no cursor is given.
+
+    Returns the page's rows and the cursor for the next page (None on the last page).
+    """
+    if after:
+        values = decode_cursor(after, columns)
+        # Lexicographic "row > cursor": (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ...
+        conditions = []
+        for i, (column, value) in enumerate(zip(columns, values)):
+            beyond = column < value if descending else column > value
+            equal_prefix = [prev == prev_value for prev, prev_value in zip(columns[:i], values[:i])]
+            conditions.append(and_(*equal_prefix, beyond))
+        query = query.filter(or_(*conditions))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    query = query.order_by(*order)
+    if not after and skip:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Expose the next page's cursor to clients in a response header."""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        response.headers["Access-Control-Expose-Headers"] = NEXT_CURSOR_HEADER
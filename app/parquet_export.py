@@ -0,0 +1,165 @@
+import io
+from typing import Dict, Iterator, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, SmallInteger, case
+
+from . import models
+from .bp_classification import CATEGORIES_BY_CODE
+from .database import SessionLocal
+
+
+# Tables that can be exported, with the column their history is ordered by
+EXPORT_TABLES = {
+    "blood_pressure_readings": (models.BloodPressure, "reading_time"),
+    "medication_reminders": (models.MedicationReminder, "schedule_datetime"),
+    "bp_check_reminders": (models.BPCheckReminder, "reminder_datetime"),
+    "doctor_appointment_reminders": (models.DoctorAppointmentReminder, "appointment_datetime"),
+    "workout_reminders": (models.WorkoutReminder, "workout_datetime"),
+}
+
+# Columns exported in place of a table column, as name -> (Arrow type, SQL expression)
+DERIVED_COLUMNS = {
+    "blood_pressure_readings": {
+        # The category label instead of the legacy free-text column, which is
+        # null once a reading has a category; the legacy text is kept until then
+        "interpretation": (
+            pa.dictionary(pa.int8(), pa.string()),
+            case(
+                {code: category.label for code, category in CATEGORIES_BY_CODE.items()},
+                value=models.BloodPressure.category,
+                else_=models.BloodPressure.interpretation_text
+            )
+        ),
+    },
+}
+
+# Rows per Parquet row group; each row group is sent as soon as it is written
+ROW_GROUP_SIZE = 50000
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file object that buffers what the Parquet writer produces until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        # The writer records absolute offsets in the file footer
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetExportService:
+    """Service for exporting tables as typed, compressed, columnar Parquet files."""
+
+    @staticmethod
+    def arrow_type(column) -> pa.DataType:
+        """Map a SQLAlchemy column type to an Arrow type."""
+        column_type = column.type
+        if isinstance(column_type, BigInteger):
+            return pa.int64()
+        if isinstance(column_type, SmallInteger):
+            return pa.int16()
+        if isinstance(column_type, Integer):
+            return pa.int32()
+        if isinstance(column_type, Float):
+            return pa.float64()
+        if isinstance(column_type, Boolean):
+            return pa.bool_()
+        if isinstance(column_type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column_type, Date):
+            return pa.date32()
+        return pa.string()
+
+    @staticmethod
+    def schema_for(table_name: str) -> pa.Schema:
+        """Arrow schema for an exportable table, one field per column."""
+        model, _ = EXPORT_TABLES[table_name]
+        derived = DERIVED_COLUMNS.get(table_name, {})
+        return pa.schema([
+            pa.field(column.name, derived[column.name][0], nullable=True) if column.name in derived
+            else pa.field(column.name, ParquetExportService.arrow_type(column), nullable=column.nullable)
+            for column in model.__table__.columns
+        ])
+
+    @staticmethod
+    def export_columns(table_name: str) -> List:
+        """Columns and SQL expressions selected for an export, in schema order."""
+        model, _ = EXPORT_TABLES[table_name]
+        derived = DERIVED_COLUMNS.get(table_name, {})
+        return [
+            derived[column.name][1].label(column.name) if column.name in derived else column
+            for column in model.__table__.columns
+        ]
+
+    @staticmethod
+    def _record_batch(rows: List, schema: pa.Schema) -> pa.RecordBatch:
+        """Transpose a list of row tuples into a typed Arrow record batch."""
+        arrays = [
+            pa.array([row[i] for row in rows], type=field.type)
+            for i, field in enumerate(schema)
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def iter_export(table_name: str, user_id: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Yield a Parquet file for a table in chunks, one row group at a time.
+
+        Rows are read with a server-side cursor and ordered by user and time.
+        Exports all users unless user_id is given. Uses its own session because
+        the response body is produced after the request may have finished.
+        """
+        model, time_column = EXPORT_TABLES[table_name]
+        schema = ParquetExportService.schema_for(table_name)
+        columns = ParquetExportService.export_columns(table_name)
+
+        db = SessionLocal()
+        sink = _StreamSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        try:
+            query = db.query(*columns)
+            if user_id is not None:
+                query = query.filter(model.user_id == user_id)
+            query = query.order_by(model.user_id, getattr(model, time_column), model.id)
+
+            rows = []
+            for row in query.yield_per(ROW_GROUP_SIZE):
+                rows.append(row)
+                if len(rows) >= ROW_GROUP_SIZE:
+                    writer.write_batch(ParquetExportService._record_batch(rows, schema))
+                    rows = []
+                    yield sink.drain()
+
+            if rows:
+                writer.write_batch(ParquetExportService._record_batch(rows, schema))
+            writer.close()
+            yield sink.drain()
+        finally:
+            db.close()
+
+    @staticmethod
+    def export_headers(table_name: str, user_id: Optional[int], stamp: str) -> Dict[str, str]:
+        """Download headers for a Parquet export."""
+        scope = f"user{user_id}" if user_id is not None else "all_users"
+        return {
+            'Content-Disposition': f'attachment; filename={table_name}_{scope}_{stamp}.parquet',
+            'Access-Control-Expose-Headers': 'Content-Disposition'
+        }
@@ -0,0 +1,58 @@
+import os
+import datetime
+import json
+import secrets
+from typing import Any, Dict, Optional
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Preview token configuration
+OCR_PREVIEW_TTL_SECONDS = int(os.getenv("OCR_PREVIEW_TTL_SECONDS", "900"))
+
+
+class PreviewStore:
+    """
+    Store of OCR previews waiting to be saved, in the ocr_previews table.
+
+    Each preview is kept under a random token for ttl_seconds. Previews live
+    in the database, so the save request may reach any worker process or
+    replica. Tokens are single-use: take() deletes the preview with a
+    conditional DELETE, so concurrent saves of one token cannot both succeed.
+    """
+
+    def __init__(self, ttl_seconds: int = OCR_PREVIEW_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    def put(self, db: Session, data: Dict[str, Any]) -> str:
+        """Store a preview (which must include user_id) and commit. Returns its token."""
+        token = secrets.token_urlsafe(24)
+        now = datetime.datetime.utcnow()
+        db.execute(delete(models.OCRPreview).where(models.OCRPreview.expires_at <= now))
+        db.add(models.OCRPreview(
+            token=token,
+            user_id=data["user_id"],
+            payload=json.dumps(data),
+            expires_at=now + datetime.timedelta(seconds=self.ttl_seconds)
+        ))
+        db.commit()
+        return token
+
+    def get(self, db: Session, token: str) -> Optional[Dict[str, Any]]:
+        """Return a live preview without consuming it, or None."""
+        preview = db.query(models.OCRPreview.payload).filter(
+            models.OCRPreview.token == token,
+            models.OCRPreview.expires_at > datetime.datetime.utcnow()
+        ).first()
+        return json.loads(preview.payload) if preview else None
+
+    def take(self, db: Session, token: str) -> Optional[Dict[str, Any]]:
+        """Delete and return a live preview, and commit. None if it is unknown, expired or already taken."""
+        row = db.execute(
+            delete(models.OCRPreview)
+            .where(models.OCRPreview.token == token, models.OCRPreview.expires_at > datetime.datetime.utcnow())
+            .returning(models.OCRPreview.payload)
+        ).first()
+        db.commit()
+        return json.loads(row.payload) if row else None
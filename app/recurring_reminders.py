@@ -0,0 +1,337 @@
+import heapq
+from datetime import datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+from typing import Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .dosing_schedule import DosingRule, expand_schedule
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+
+# Series kinds and the reminder table each one stands in for
+SERIES_KINDS = ("medication", "bp_check")
+
+# Occurrence statuses stored as exceptions; occurrences without one are pending
+OCCURRENCE_STATUSES = ("done", "snoozed", "skipped")
+
+# Occurrences whose exceptions are looked up per query while paging
+OCCURRENCE_CHUNK_SIZE = 200
+
+# Smallest step past an inclusive window end
+INCLUSIVE = timedelta(microseconds=1)
+
+
+class RecurringReminderService:
+    """
+    Service for reminders stored as a rule (ReminderSeries) instead of one row per occurrence.
+
+    Occurrences are expanded from the rule for the queried window only and
+    returned shaped like MedicationReminder / BPCheckReminder rows, with
+    id None and series_id and occurrence_datetime identifying them. Taken,
+    completed, snoozed and skipped occurrences are the only ones stored.
+    """
+
+    @staticmethod
+    def create_series(
+        db: Session,
+        user_id: int,
+        kind: str,
+        rule: DosingRule,
+        start: datetime,
+        name: Optional[str] = None,
+        dosage: Optional[str] = None,
+        bp_category: Optional[str] = None,
+        notes: Optional[str] = None
+    ) -> models.ReminderSeries:
+        """Add a series starting at start to the session; the caller commits."""
+        occurrences = [occurrence for occurrence, _ in expand_schedule(rule, start)]
+        # Stored relative to the first occurrence, which becomes start_datetime
+        rule = RecurringReminderService.fixed_rule(rule)
+        if not occurrences:
+            raise ValueError("The reminder rule has no occurrences")
+
+        series = models.ReminderSeries(
+            user_id=user_id,
+            kind=kind,
+            name=name,
+            dosage=dosage,
+            bp_category=bp_category,
+            rule_json=rule.model_dump_json(),
+            start_datetime=occurrences[0],
+            end_datetime=occurrences[-1],
+            notes=notes
+        )
+        db.add(series)
+        return series
+
+    @staticmethod
+    def fixed_rule(rule: DosingRule) -> DosingRule:
+        """The rule with its first dose at the series start, so occurrences only depend on start_datetime."""
+        return rule.model_copy(update={"first_dose_offset_hours": 0, "first_dose_time": None})
+
+    @staticmethod
+    def occurrence(series: models.ReminderSeries, occurrence_datetime: datetime,
+                   due_at: Optional[datetime] = None, done: bool = False) -> SimpleNamespace:
+        """One occurrence, with the attributes of the reminder row it stands in for."""
+        due_at = due_at or occurrence_datetime
+        item = SimpleNamespace(
+            id=None,
+            user_id=series.user_id,
+            series_id=series.id,
+            occurrence_datetime=occurrence_datetime,
+            due_at=due_at,
+            sort_key=(due_at, -series.id),
+            notes=series.notes,
+            created_at=series.created_at
+        )
+        if series.kind == "medication":
+            item.name = series.name
+            item.dosage = series.dosage
+            item.schedule_datetime = due_at
+            item.schedule_dosage = series.rule.dose
+            item.is_taken = done
+        else:
+            item.reminder_datetime = due_at
+            item.bp_category = series.bp_category
+            item.is_completed = done
+        return item
+
+    @staticmethod
+    def is_occurrence(series: models.ReminderSeries, occurrence_datetime: datetime) -> bool:
+        """True if the series has an occurrence at exactly this time."""
+        return any(
+            True for _ in expand_schedule(
+                series.rule, series.start_datetime, occurrence_datetime, occurrence_datetime + INCLUSIVE
+            )
+        )
+
+    @staticmethod
+    def count_occurrences(db: Session, user_id: int, kind: str) -> List[Tuple[models.ReminderSeries, int, int]]:
+        """
+        A user's series of one kind, each with its number of occurrences and
+        of occurrences marked done (skipped and snoozed ones are not done).
+        """
+        series_list = db.query(models.ReminderSeries).filter(
+            models.ReminderSeries.user_id == user_id,
+            models.ReminderSeries.kind == kind
+        ).all()
+        done = dict(
+            db.query(models.ReminderOccurrence.series_id, func.count(models.ReminderOccurrence.id)).filter(
+                models.ReminderOccurrence.series_id.in_([series.id for series in series_list]),
+                models.ReminderOccurrence.status == "done"
+            ).group_by(models.ReminderOccurrence.series_id)
+        ) if series_list else {}
+        return [
+            (series, sum(1 for _ in expand_schedule(series.rule, series.start_datetime)), done.get(series.id, 0))
+            for series in series_list
+        ]
+
+    @staticmethod
+    def _slots(series: models.ReminderSeries, start: Optional[datetime],
+               end: Optional[datetime]) -> Iterator[Tuple[Tuple[datetime, int], models.ReminderSeries, datetime, bool]]:
+        """A series' occurrence times in the window, lazily, as (sort key, series, time, moved)."""
+        for occurrence_datetime, _ in expand_schedule(
+            series.rule, series.start_datetime, start, end + INCLUSIVE if end else None
+        ):
+            yield (occurrence_datetime, -series.id), series, occurrence_datetime, False
+
+    @staticmethod
+    def get_occurrences(
+        db: Session,
+        user_id: Optional[int],
+        kind: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        include_done: bool = True,
+        after_key: Optional[Sequence] = None,
+        limit: Optional[int] = None,
+        series_id: Optional[int] = None
+    ) -> List[SimpleNamespace]:
+        """
+        Occurrences of a user's series of one kind (of all users' series with
+        user_id None, or of one series) due between start and end (inclusive,
+        either may be None), ordered by (due time, -series id).
+
+        after_key continues after the sort key of a previous item; limit stops
+        the expansion once enough occurrences were found. Skipped occurrences
+        are left out, snoozed ones are due at their snoozed_until time.
+        """
+        if after_key is not None:
+            after_key = tuple(after_key)
+            start = max(start, after_key[0]) if start else after_key[0]
+
+        def scoped(query):
+            query = query.filter(models.ReminderSeries.kind == kind)
+            if user_id is not None:
+                query = query.filter(models.ReminderSeries.user_id == user_id)
+            if series_id is not None:
+                query = query.filter(models.ReminderSeries.id == series_id)
+            return query
+
+        # Snoozed occurrences leave their slot and come back at snoozed_until,
+        # possibly after the end of their series
+        moved_query = scoped(db.query(models.ReminderOccurrence, models.ReminderSeries).join(models.ReminderSeries)).filter(
+            models.ReminderOccurrence.status == "snoozed"
+        )
+        if start is not None:
+            moved_query = moved_query.filter(models.ReminderOccurrence.snoozed_until >= start)
+        if end is not None:
+            moved_query = moved_query.filter(models.ReminderOccurrence.snoozed_until <= end)
+        moved = [
+            ((exception.snoozed_until, -series.id), series, exception.occurrence_datetime, True)
+            for exception, series in moved_query
+        ]
+        moved.sort(key=lambda slot: slot[0])
+
+        query = scoped(db.query(models.ReminderSeries))
+        if start is not None:
+            query = query.filter(models.ReminderSeries.end_datetime >= start)
+        if end is not None:
+            query = query.filter(models.ReminderSeries.start_datetime <= end)
+        series_list = query.all()
+        if not series_list and not moved:
+            return []
+
+        slots = heapq.merge(
+            *(RecurringReminderService._slots(series, start, end) for series in series_list),
+            moved,
+            key=lambda slot: slot[0]
+        )
+
+        results = []
+        while True:
+            chunk = list(islice(slots, OCCURRENCE_CHUNK_SIZE))
+            if not chunk:
+                return results
+
+            # One range query for the exceptions of the whole chunk
+            chunk_times = [occurrence_datetime for _, _, occurrence_datetime, _ in chunk]
+            exceptions = {
+                (exception.series_id, exception.occurrence_datetime): exception
+                for exception in db.query(models.ReminderOccurrence).filter(
+                    models.ReminderOccurrence.series_id.in_({series.id for _, series, _, _ in chunk}),
+                    models.ReminderOccurrence.occurrence_datetime >= min(chunk_times),
+                    models.ReminderOccurrence.occurrence_datetime <= max(chunk_times)
+                )
+            }
+
+            for key, series, occurrence_datetime, is_moved in chunk:
+                if after_key is not None and key <= after_key:
+                    continue
+                exception = exceptions.get((series.id, occurrence_datetime))
+                status = exception.status if exception else None
+                if status == "skipped" or (status == "snoozed" and not is_moved):
+                    continue
+                if status == "done" and not include_done:
+                    continue
+
+                results.append(RecurringReminderService.occurrence(series, occurrence_datetime, key[0], status == "done"))
+                if limit is not None and len(results) >= limit:
+                    return results
+
+    @staticmethod
+    def set_occurrence_status(
+        db: Session,
+        series: models.ReminderSeries,
+        occurrence_datetime: datetime,
+        status: Optional[str],
+        snoozed_until: Optional[datetime] = None
+    ) -> SimpleNamespace:
+        """
+        Mark one occurrence done, snoozed or skipped, or pending again with
+        status None, and commit. Returns the updated occurrence.
+        """
+        exception = db.query(models.ReminderOccurrence).filter(
+            models.ReminderOccurrence.series_id == series.id,
+            models.ReminderOccurrence.occurrence_datetime == occurrence_datetime
+        ).first()
+
+        if status is None:
+            if exception is not None:
+                db.delete(exception)
+        else:
+            if exception is None:
+                exception = models.ReminderOccurrence(series_id=series.id, occurrence_datetime=occurrence_datetime)
+                db.add(exception)
+            exception.status = status
+            exception.snoozed_until = snoozed_until if status == "snoozed" else None
+        db.commit()
+
+        due_at = snoozed_until if status == "snoozed" else occurrence_datetime
+        return RecurringReminderService.occurrence(series, occurrence_datetime, due_at, status == "done")
+
+    @staticmethod
+    def set_occurrences_status(
+        db: Session,
+        occurrences: List[SimpleNamespace],
+        status: str,
+        shift: Optional[timedelta] = None
+    ) -> int:
+        """
+        Set the status of many occurrences (as returned by get_occurrences)
+        without committing: one DELETE of their previous exceptions per series
+        and one multi-row INSERT. Snoozed occurrences are due shift after
+        their current due time. Returns the number of occurrences changed.
+        """
+        by_series = {}
+        for occurrence in occurrences:
+            by_series.setdefault(occurrence.series_id, []).append(occurrence.occurrence_datetime)
+        for series_id, occurrence_datetimes in by_series.items():
+            for start in range(0, len(occurrence_datetimes), OCCURRENCE_CHUNK_SIZE):
+                db.query(models.ReminderOccurrence).filter(
+                    models.ReminderOccurrence.series_id == series_id,
+                    models.ReminderOccurrence.occurrence_datetime.in_(occurrence_datetimes[start:start + OCCURRENCE_CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+
+        if occurrences:
+            now = datetime.utcnow()
+            db.execute(insert(models.ReminderOccurrence), [
+                {
+                    "series_id": occurrence.series_id,
+                    "occurrence_datetime": occurrence.occurrence_datetime,
+                    "status": status,
+                    "snoozed_until": occurrence.due_at + shift if status == "snoozed" else None,
+                    "updated_at": now,
+                }
+                for occurrence in occurrences
+            ])
+        return len(occurrences)
+
+    @staticmethod
+    def paginate_with_occurrences(
+        db: Session,
+        query,
+        columns: Sequence,
+        user_id: int,
+        kind: str,
+        after: Optional[str],
+        limit: int,
+        skip: int = 0,
+        include_done: bool = True
+    ) -> Tuple[List, Optional[str]]:
+        """
+        keyset_paginate for a reminder list that also contains a series kind.
+
+        Reminder rows are ordered by (datetime, id) and occurrences by
+        (datetime, -series id), so both fit the same two-value cursor.
+        """
+        cursor = decode_cursor(after, columns) if after else None
+        offset = 0 if after else skip
+
+        rows, more_rows = keyset_paginate(query, columns, after, offset + limit)
+        occurrences = RecurringReminderService.get_occurrences(
+            db, user_id, kind, include_done=include_done, after_key=cursor, limit=offset + limit + 1
+        )
+
+        def sort_key(item):
+            return item.sort_key if item.id is None else (getattr(item, columns[0].key), item.id)
+
+        merged = sorted(list(rows) + occurrences, key=sort_key)
+        page = merged[offset:offset + limit]
+
+        next_cursor = None
+        if page and (more_rows or len(merged) > offset + limit):
+            next_cursor = encode_cursor(list(sort_key(page[-1])))
+        return page, next_cursor
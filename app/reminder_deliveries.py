@@ -0,0 +1,214 @@
+import os
+import datetime
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+# Delivery lease configuration
+REMINDER_LEASE_SECONDS = int(os.getenv("REMINDER_LEASE_SECONDS", "120"))
+REMINDER_CLAIM_BATCH = int(os.getenv("REMINDER_CLAIM_BATCH", "100"))
+# Deliveries are kept this long after they were due, so later sweeps do not queue them again
+REMINDER_DELIVERY_RETENTION_HOURS = int(os.getenv("REMINDER_DELIVERY_RETENTION_HOURS", "24"))
+# Claims of one delivery before it is given up (its dispatcher died every time)
+REMINDER_DELIVERY_MAX_ATTEMPTS = 3
+
+# Keys looked up per query, within SQL Server's 2100 parameter limit
+KEY_CHUNK_SIZE = 500
+
+# Lets concurrent claims on SQL Server skip the rows another replica is claiming
+# instead of waiting for them; SQLite serializes writers and ignores the hint
+CLAIM_LOCK_HINT = "WITH (UPDLOCK, READPAST, ROWLOCK)"
+
+
+def delivery_source(reminder: schemas.DueReminder) -> Tuple[str, int]:
+    """The reminder row or series a delivery belongs to, as (source_type, source_id)."""
+    if reminder.id is None:
+        return "series", reminder.series_id
+    return reminder.type, reminder.id
+
+
+def delivery_key(reminder: schemas.DueReminder) -> str:
+    """Unique key of one reminder at one due time; a rescheduled reminder gets a new key."""
+    source_type, source_id = delivery_source(reminder)
+    if reminder.id is None:
+        return f"{source_type}:{source_id}:{reminder.occurrence_datetime.isoformat()}:{reminder.due_at.isoformat()}"
+    return f"{source_type}:{source_id}:{reminder.due_at.isoformat()}"
+
+
+class ReminderDeliveryService:
+    """
+    Queue of due reminders shared by the dispatchers of all replicas.
+
+    Sweeps queue the reminders they load; queuing is idempotent, so every
+    replica can sweep the same window. Dispatchers claim batches of due
+    deliveries with one UPDATE ... RETURNING (OUTPUT on SQL Server) that
+    sets a lease, send them, and ack them. Deliveries whose lease expired
+    without an ack are claimed again by any replica.
+    """
+
+    @staticmethod
+    def _insert_missing(db: Session, reminders: Iterable[schemas.DueReminder]) -> int:
+        """Insert the deliveries not queued yet, without committing."""
+        by_key: Dict[str, schemas.DueReminder] = {delivery_key(reminder): reminder for reminder in reminders}
+        keys = list(by_key)
+
+        rows = []
+        for start in range(0, len(keys), KEY_CHUNK_SIZE):
+            chunk = keys[start:start + KEY_CHUNK_SIZE]
+            existing = {
+                key for (key,) in db.query(models.ReminderDelivery.reminder_key)
+                .filter(models.ReminderDelivery.reminder_key.in_(chunk))
+            }
+            for key in chunk:
+                if key in existing:
+                    continue
+                reminder = by_key[key]
+                source_type, source_id = delivery_source(reminder)
+                rows.append({
+                    "reminder_key": key,
+                    "source_type": source_type,
+                    "source_id": source_id,
+                    "user_id": reminder.user_id,
+                    "due_at": reminder.due_at,
+                    "payload": reminder.model_dump_json(),
+                    "status": "pending",
+                    "attempts": 0,
+                })
+
+        if rows:
+            db.execute(insert(models.ReminderDelivery), rows)
+        return len(rows)
+
+    @staticmethod
+    def enqueue(
+        db: Session,
+        reminders: List[schemas.DueReminder],
+        replace_source: Optional[Tuple[str, int]] = None
+    ) -> int:
+        """
+        Queue reminders for delivery, skipping those already queued, and commit.
+
+        With replace_source, the pending deliveries of that reminder or series
+        are deleted first, in the same transaction (it was changed). Returns
+        the number of deliveries added.
+        """
+        for attempt in range(2):
+            try:
+                if replace_source is not None:
+                    source_type, source_id = replace_source
+                    db.execute(delete(models.ReminderDelivery).where(
+                        models.ReminderDelivery.source_type == source_type,
+                        models.ReminderDelivery.source_id == source_id,
+                        models.ReminderDelivery.status == "pending"
+                    ))
+                added = ReminderDeliveryService._insert_missing(db, reminders)
+                db.commit()
+                return added
+            except IntegrityError:
+                # Another replica queued some of them concurrently; the retry skips those
+                db.rollback()
+                if attempt:
+                    raise
+
+    @staticmethod
+    def claim(
+        db: Session,
+        worker_id: str,
+        now: datetime.datetime,
+        limit: int = REMINDER_CLAIM_BATCH,
+        lease_seconds: int = REMINDER_LEASE_SECONDS
+    ) -> List[Tuple[int, dict]]:
+        """
+        Atomically lease up to limit deliveries due by now to worker_id, earliest
+        first, and commit. Returns (delivery id, DueReminder payload) pairs.
+        """
+        delivery = models.ReminderDelivery
+        claimable = and_(
+            delivery.due_at <= now,
+            delivery.attempts < REMINDER_DELIVERY_MAX_ATTEMPTS,
+            or_(
+                delivery.status == "pending",
+                and_(delivery.status == "claimed", delivery.lease_expires_at < now)
+            )
+        )
+        batch = (
+            select(delivery.id)
+            .where(claimable)
+            .order_by(delivery.due_at)
+            .limit(limit)
+            .with_hint(delivery, CLAIM_LOCK_HINT, "mssql")
+        )
+
+        rows = db.execute(
+            update(delivery)
+            .where(delivery.id.in_(batch), claimable)
+            .values(
+                status="claimed",
+                claimed_by=worker_id,
+                lease_expires_at=now + datetime.timedelta(seconds=lease_seconds),
+                attempts=delivery.attempts + 1
+            )
+            .returning(delivery.id, delivery.payload)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return [(row.id, json.loads(row.payload)) for row in rows]
+
+    @staticmethod
+    def ack(db: Session, worker_id: str, delivery_ids: List[int], now: datetime.datetime) -> int:
+        """
+        Mark claimed deliveries as sent and commit. Deliveries whose lease
+        expired and were claimed by another worker meanwhile are left alone.
+        """
+        if not delivery_ids:
+            return 0
+        acked = db.execute(
+            update(models.ReminderDelivery)
+            .where(
+                models.ReminderDelivery.id.in_(delivery_ids),
+                models.ReminderDelivery.claimed_by == worker_id,
+                models.ReminderDelivery.status == "claimed"
+            )
+            .values(status="sent", sent_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return acked
+
+    @staticmethod
+    def sent_since(
+        db: Session,
+        user_ids: List[int],
+        since: datetime.datetime
+    ) -> List[Tuple[int, datetime.datetime, dict]]:
+        """
+        Deliveries of the given users sent (by any replica) after since, in
+        the order they were sent, as (delivery id, sent_at, DueReminder payload).
+        """
+        rows = []
+        for start in range(0, len(user_ids), KEY_CHUNK_SIZE):
+            rows += db.query(
+                models.ReminderDelivery.id, models.ReminderDelivery.sent_at, models.ReminderDelivery.payload
+            ).filter(
+                models.ReminderDelivery.status == "sent",
+                models.ReminderDelivery.sent_at > since,
+                models.ReminderDelivery.user_id.in_(user_ids[start:start + KEY_CHUNK_SIZE])
+            ).all()
+        rows.sort(key=lambda row: (row.sent_at, row.id))
+        return [(row.id, row.sent_at, json.loads(row.payload)) for row in rows]
+
+    @staticmethod
+    def prune(db: Session, now: datetime.datetime) -> int:
+        """Delete deliveries due longer than the retention period ago, and commit."""
+        cutoff = now - datetime.timedelta(hours=REMINDER_DELIVERY_RETENTION_HOURS)
+        pruned = db.execute(
+            delete(models.ReminderDelivery)
+            .where(models.ReminderDelivery.due_at < cutoff)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return pruned
@@ -0,0 +1,532 @@
+import os
+import asyncio
+import datetime
+import heapq
+import logging
+import smtplib
+import socket
+import uuid
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import httpx
+
+from . import models, schemas
+from .database import SessionLocal
+from .recurring_reminders import RecurringReminderService
+from .reminder_deliveries import REMINDER_DELIVERY_RETENTION_HOURS, ReminderDeliveryService
+from .reminder_timeline import ReminderTimelineService
+
+logger = logging.getLogger(__name__)
+
+# Reminder dispatcher configuration
+REMINDER_DISPATCH_ENABLED = os.getenv("REMINDER_DISPATCH_ENABLED", "true").lower() == "true"
+# How far ahead each sweep loads due reminders; the next sweep runs when half of it has passed
+REMINDER_DISPATCH_HORIZON_SECONDS = int(os.getenv("REMINDER_DISPATCH_HORIZON_SECONDS", "900"))
+REMINDER_DISPATCH_SWEEP_BATCH = int(os.getenv("REMINDER_DISPATCH_SWEEP_BATCH", "1000"))
+# How far back the first sweep looks for reminders that came due while no dispatcher ran. At most
+# the delivery retention, so reminders sent before the restart are still queued and not sent twice
+REMINDER_DISPATCH_GRACE_SECONDS = min(
+    int(os.getenv("REMINDER_DISPATCH_GRACE_SECONDS", "3600")), REMINDER_DELIVERY_RETENTION_HOURS * 3600
+)
+# How often due deliveries queued by other replicas, or abandoned by dead ones, are claimed
+REMINDER_CLAIM_POLL_SECONDS = int(os.getenv("REMINDER_CLAIM_POLL_SECONDS", "30"))
+# Comma-separated sinks that due reminders are sent to: log, webhook, smtp, sse
+REMINDER_DISPATCH_SINKS = os.getenv("REMINDER_DISPATCH_SINKS", "log,sse")
+REMINDER_WEBHOOK_URL = os.getenv("REMINDER_WEBHOOK_URL")
+REMINDER_WEBHOOK_TIMEOUT_SECONDS = int(os.getenv("REMINDER_WEBHOOK_TIMEOUT_SECONDS", "10"))
+REMINDER_WEBHOOK_ATTEMPTS = 3
+# Local SMTP server (e.g. MailHog or `python -m aiosmtpd -n`) standing in for a mail provider
+REMINDER_SMTP_HOST = os.getenv("REMINDER_SMTP_HOST", "localhost")
+REMINDER_SMTP_PORT = int(os.getenv("REMINDER_SMTP_PORT", "1025"))
+REMINDER_SMTP_SENDER = os.getenv("REMINDER_SMTP_SENDER", "reminders@cardiomed.local")
+REMINDER_SMTP_TIMEOUT_SECONDS = 10
+# Due reminders buffered per SSE connection; the oldest are dropped beyond this
+REMINDER_SSE_QUEUE_SIZE = 100
+# How often reminders sent by any replica are relayed to this process's SSE connections
+REMINDER_SSE_POLL_SECONDS = float(os.getenv("REMINDER_SSE_POLL_SECONDS", "2"))
+# Sent deliveries are read again this far back, allowing for clock differences between replicas
+SSE_RELAY_OVERLAP = datetime.timedelta(seconds=10)
+
+# Delay before a failed sweep is retried
+SWEEP_RETRY_SECONDS = 30
+
+# Smallest step past the end of the previous sweep
+INCLUSIVE = datetime.timedelta(microseconds=1)
+
+
+class ReminderSink:
+    """
+    Destination for due reminders. Subclasses implement send().
+
+    A delivery is only acked once every external sink (one that leaves this
+    process) has sent it; in-process sinks never hold back the ack.
+    """
+
+    name = "sink"
+    external = False
+
+    async def send(self, reminder: dict) -> None:
+        """Deliver one due reminder (a DueReminder as JSON-compatible dict)."""
+        raise NotImplementedError
+
+
+class LogSink(ReminderSink):
+    """Writes due reminders to the application log."""
+
+    name = "log"
+
+    async def send(self, reminder: dict) -> None:
+        logger.info(
+            f"Reminder due for user {reminder['user_id']}: {reminder['type']} "
+            f"'{reminder['title']}' at {reminder['due_at']}"
+        )
+
+
+class WebhookSink(ReminderSink):
+    """POSTs due reminders to a URL, retrying with backoff."""
+
+    name = "webhook"
+    external = True
+
+    def __init__(self, url: str):
+        self.url = url
+
+    async def send(self, reminder: dict) -> None:
+        async with httpx.AsyncClient(timeout=REMINDER_WEBHOOK_TIMEOUT_SECONDS) as client:
+            for attempt in range(REMINDER_WEBHOOK_ATTEMPTS):
+                try:
+                    response = await client.post(self.url, json=reminder)
+                    response.raise_for_status()
+                    return
+                except httpx.HTTPError as e:
+                    if attempt + 1 == REMINDER_WEBHOOK_ATTEMPTS:
+                        raise
+                    logger.warning(f"Reminder webhook failed (attempt {attempt + 1}): {e}")
+                    await asyncio.sleep(2 ** attempt)
+
+
+class SMTPSink(ReminderSink):
+    """Emails due reminders to the user's address through an SMTP server."""
+
+    name = "smtp"
+    external = True
+
+    def __init__(self, host: str, port: int, sender: str):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    async def send(self, reminder: dict) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._send, reminder)
+
+    def _send(self, reminder: dict) -> None:
+        """Look up the recipient and send the message (blocking)."""
+        db = SessionLocal()
+        try:
+            user = db.query(models.User.email).filter(models.User.id == reminder["user_id"]).first()
+        finally:
+            db.close()
+        if not user or not user.email:
+            return
+
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = user.email
+        message["Subject"] = f"Reminder: {reminder['title']}"
+        lines = [f"{reminder['title']} is due at {reminder['due_at']}."]
+        if reminder.get("detail"):
+            lines.append(reminder["detail"])
+        if reminder.get("location"):
+            lines.append(f"Location: {reminder['location']}")
+        if reminder.get("notes"):
+            lines.append(reminder["notes"])
+        message.set_content("\n".join(lines))
+
+        with smtplib.SMTP(self.host, self.port, timeout=REMINDER_SMTP_TIMEOUT_SECONDS) as smtp:
+            smtp.send_message(message)
+
+
+class SSESink(ReminderSink):
+    """
+    Pushes due reminders to the open /reminders/stream connections of their user.
+
+    The replica that claims a reminder is usually not the one holding the
+    user's connection, so send() only lets the delivery be acked. The
+    dispatcher of every replica then relays the deliveries acked as sent, by
+    any replica, to its own connections with publish().
+    """
+
+    name = "sse"
+
+    def __init__(self, queue_size: int = REMINDER_SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Queue receiving the user's due reminders; call unsubscribe when the connection closes."""
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscribed_users(self) -> List[int]:
+        """Users with an open connection to this process."""
+        return list(self._subscribers)
+
+    async def send(self, reminder: dict) -> None:
+        """Published to the connections once sent; see ReminderDispatcher._relay."""
+
+    def publish(self, reminder: dict) -> None:
+        """Push a sent reminder to the user's connections in this process."""
+        for queue in self._subscribers.get(reminder["user_id"], ()):
+            if queue.full():
+                # A slow client loses its oldest reminder rather than stalling the dispatcher
+                queue.get_nowait()
+            queue.put_nowait(reminder)
+
+
+# Serves /reminders/stream; only receives reminders when "sse" is a configured sink
+sse_sink = SSESink()
+
+
+def build_sinks(names: str = REMINDER_DISPATCH_SINKS) -> List[ReminderSink]:
+    """The sinks named in a comma-separated list, skipping unknown or unconfigured ones."""
+    sinks = []
+    for name in filter(None, (name.strip() for name in names.split(","))):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "webhook":
+            if not REMINDER_WEBHOOK_URL:
+                logger.warning("Reminder webhook sink skipped: REMINDER_WEBHOOK_URL is not set")
+                continue
+            sinks.append(WebhookSink(REMINDER_WEBHOOK_URL))
+        elif name == "smtp":
+            sinks.append(SMTPSink(REMINDER_SMTP_HOST, REMINDER_SMTP_PORT, REMINDER_SMTP_SENDER))
+        elif name == "sse":
+            sinks.append(sse_sink)
+        else:
+            logger.warning(f"Unknown reminder sink '{name}' skipped")
+    return sinks
+
+
+class ReminderDispatcher:
+    """
+    Sends reminders to the notification sinks when they come due.
+
+    A sweep loads the reminders of all users due before now + horizon, from
+    the four reminder tables and the recurring reminders, in one timeline
+    query on the due-time indexes, and queues them in reminder_deliveries.
+    The first sweep also loads the pending reminders that came due in the
+    grace period before the dispatcher started.
+    Their due times are kept in a min-heap that a single timer task sleeps
+    on; the next sweep runs when half the horizon has passed. Routers report
+    created, updated and deleted reminders with reminder_changed /
+    series_changed, so the queue stays current between sweeps. Due times
+    are UTC, like the timeline.
+
+    Every replica runs a dispatcher. At each due time, and every
+    REMINDER_CLAIM_POLL_SECONDS for deliveries queued or abandoned by other
+    replicas, it claims batches of due deliveries under a lease, sends them
+    and acks them, so each reminder is sent once however many replicas run.
+    With the SSE sink, it also relays the deliveries sent by any replica to
+    the SSE connections of its own process.
+    """
+
+    def __init__(self, sinks: Optional[Iterable[ReminderSink]] = None,
+                 horizon_seconds: int = REMINDER_DISPATCH_HORIZON_SECONDS,
+                 poll_seconds: int = REMINDER_CLAIM_POLL_SECONDS,
+                 grace_seconds: int = REMINDER_DISPATCH_GRACE_SECONDS):
+        self.sinks: List[ReminderSink] = list(sinks) if sinks is not None else []
+        self.horizon = datetime.timedelta(seconds=horizon_seconds)
+        self.poll = datetime.timedelta(seconds=poll_seconds)
+        self.grace = datetime.timedelta(seconds=grace_seconds)
+        # Identifies this dispatcher's leases
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Due times of queued deliveries; duplicates and times of changed
+        # reminders only cause a claim that finds nothing
+        self._heap: List[datetime.datetime] = []
+        self._changes: List[Tuple] = []
+        self._swept_until: Optional[datetime.datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._relay_task: Optional[asyncio.Task] = None
+        self._relay_wakeup: Optional[asyncio.Event] = None
+
+    def add_sink(self, sink: ReminderSink) -> None:
+        """Send due reminders to another sink as well."""
+        self.sinks.append(sink)
+
+    async def start(self) -> None:
+        """Start the timer task on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        if sse_sink in self.sinks:
+            self._relay_wakeup = asyncio.Event()
+            self._relay_task = asyncio.create_task(self._relay())
+
+    async def stop(self) -> None:
+        """
+        Cancel the timer task. Deliveries it had claimed but not acked are
+        sent by another replica, or after a restart, once their lease expires.
+        """
+        tasks = [task for task in (self._task, self._relay_task) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._relay_task = None
+        self._relay_wakeup = None
+        self._loop = None
+        self._heap = []
+        self._changes = []
+        self._swept_until = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def reminder_changed(self, reminder_type: str, reminder_id: int) -> None:
+        """
+        Report a created, updated or deleted row of a reminder table ("medication",
+        "bp_check", "doctor_appointment" or "workout"). Safe to call from any thread.
+        """
+        self._report((reminder_type, reminder_id))
+
+    def series_changed(self, series_id: int) -> None:
+        """Report a created or deleted recurring reminder, or a changed occurrence of one."""
+        self._report(("series", series_id))
+
+    def _report(self, change: Tuple) -> None:
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._queue_change, change)
+
+    def _queue_change(self, change: Tuple) -> None:
+        self._changes.append(change)
+        self._wakeup.set()
+
+    def _push(self, reminders: List[schemas.DueReminder]) -> None:
+        for reminder in reminders:
+            heapq.heappush(self._heap, reminder.due_at)
+
+    async def _run(self) -> None:
+        """Sweep, apply reported changes and deliver due reminders until cancelled."""
+        now = datetime.datetime.utcnow()
+        next_sweep = now
+        next_poll = now
+        while True:
+            self._wakeup.clear()
+            now = datetime.datetime.utcnow()
+
+            if now >= next_sweep:
+                try:
+                    await self._sweep(now)
+                    next_sweep = now + self.horizon / 2
+                except Exception as e:
+                    logger.error(f"Reminder sweep failed: {e}")
+                    next_sweep = now + datetime.timedelta(seconds=SWEEP_RETRY_SECONDS)
+
+            if self._changes and self._swept_until is not None:
+                changes, self._changes = self._changes, []
+                try:
+                    await self._apply(changes)
+                except Exception as e:
+                    logger.error(f"Reminder changes could not be applied: {e}")
+
+            now = datetime.datetime.utcnow()
+            if (self._heap and self._heap[0] <= now) or now >= next_poll:
+                while self._heap and self._heap[0] <= now:
+                    heapq.heappop(self._heap)
+                next_poll = now + self.poll
+                try:
+                    await self._deliver(now)
+                except Exception as e:
+                    logger.error(f"Due reminders could not be claimed: {e}")
+
+            wake_at = min(next_sweep, next_poll, *self._heap[:1])
+            timeout = max(0.0, (wake_at - datetime.datetime.utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sweep(self, now: datetime.datetime) -> None:
+        """
+        Queue the reminders due between the previous sweep and now + horizon.
+
+        The first sweep starts the grace period before now, so reminders that
+        came due while no dispatcher ran are sent late; those already queued
+        or sent by a replica are skipped by the enqueue.
+        """
+        start = self._swept_until + INCLUSIVE if self._swept_until else now - self.grace
+        end = now + self.horizon
+        loop = asyncio.get_running_loop()
+        reminders = await loop.run_in_executor(None, self._load, start, end, now)
+        self._push(reminders)
+        self._swept_until = end
+        logger.debug(f"Reminder sweep queued {len(reminders)} reminders due until {end}")
+
+    @staticmethod
+    def _load(start: datetime.datetime, end: datetime.datetime,
+              now: datetime.datetime) -> List[schemas.DueReminder]:
+        """Queue all users' pending reminders due between start and end, read page by page."""
+        db = SessionLocal()
+        try:
+            ReminderDeliveryService.prune(db, now)
+            reminders = []
+            after = None
+            while True:
+                items, after = ReminderTimelineService.get_timeline(
+                    db, None, start, end, after, REMINDER_DISPATCH_SWEEP_BATCH
+                )
+                page = [schemas.DueReminder.model_validate(item) for item in items]
+                ReminderDeliveryService.enqueue(db, page)
+                reminders += page
+                if not after:
+                    return reminders
+        finally:
+            db.close()
+
+    async def _apply(self, changes: List[Tuple]) -> None:
+        """Replace the queued deliveries of changed reminders with their current state."""
+        changes = list(dict.fromkeys(changes))
+        loop = asyncio.get_running_loop()
+        reminders = await loop.run_in_executor(
+            None, self._load_changes, changes, datetime.datetime.utcnow(), self._swept_until
+        )
+        self._push(reminders)
+
+    @staticmethod
+    def _load_changes(changes: List[Tuple], start: datetime.datetime,
+                      end: datetime.datetime) -> List[schemas.DueReminder]:
+        """Requeue each changed reminder or series with its pending reminders due between start and end."""
+        db = SessionLocal()
+        try:
+            queued = []
+            for source_type, source_id in changes:
+                if source_type != "series":
+                    item = ReminderTimelineService.get_reminder(db, source_type, source_id)
+                    items = [item] if item and not item.completed and start <= item.due_at <= end else []
+                else:
+                    series = db.query(models.ReminderSeries).filter(models.ReminderSeries.id == source_id).first()
+                    items = [] if series is None else [
+                        ReminderTimelineService.occurrence_item(occurrence, series.kind)
+                        for occurrence in RecurringReminderService.get_occurrences(
+                            db, series.user_id, series.kind, start, end, include_done=False, series_id=series.id
+                        )
+                    ]
+                reminders = [schemas.DueReminder.model_validate(item) for item in items]
+                ReminderDeliveryService.enqueue(db, reminders, replace_source=(source_type, source_id))
+                queued += reminders
+            return queued
+        finally:
+            db.close()
+
+    async def _deliver(self, now: datetime.datetime) -> None:
+        """
+        Claim, send and ack batches of due deliveries until none are left.
+
+        Only deliveries that every external sink sent are acked. The others
+        stay claimed until their lease expires and are then claimed again,
+        up to REMINDER_DELIVERY_MAX_ATTEMPTS times, and sent to all sinks
+        again.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            claimed = await loop.run_in_executor(None, self._claim, now)
+            if not claimed:
+                return
+            sent = await asyncio.gather(*(self._send(payload) for _, payload in claimed))
+            await loop.run_in_executor(
+                None, self._ack, [delivery_id for (delivery_id, _), ok in zip(claimed, sent) if ok]
+            )
+            if self._relay_wakeup is not None:
+                self._relay_wakeup.set()
+
+    def _claim(self, now: datetime.datetime) -> List[Tuple[int, dict]]:
+        db = SessionLocal()
+        try:
+            return ReminderDeliveryService.claim(db, self.worker_id, now)
+        finally:
+            db.close()
+
+    def _ack(self, delivery_ids: List[int]) -> None:
+        db = SessionLocal()
+        try:
+            ReminderDeliveryService.ack(db, self.worker_id, delivery_ids, datetime.datetime.utcnow())
+        finally:
+            db.close()
+
+    async def _relay(self) -> None:
+        """Push the reminders sent by any replica to this process's SSE connections until cancelled."""
+        loop = asyncio.get_running_loop()
+        since = datetime.datetime.utcnow()
+        # Deliveries already pushed, by id, until they are older than the overlap
+        relayed: Dict[int, datetime.datetime] = {}
+        while True:
+            self._relay_wakeup.clear()
+            now = datetime.datetime.utcnow()
+            user_ids = sse_sink.subscribed_users()
+            if user_ids:
+                try:
+                    sent = await loop.run_in_executor(None, self._load_sent, user_ids, since - SSE_RELAY_OVERLAP)
+                    for delivery_id, sent_at, reminder in sent:
+                        if delivery_id not in relayed:
+                            relayed[delivery_id] = sent_at
+                            sse_sink.publish(reminder)
+                    since = now
+                except Exception as e:
+                    logger.error(f"Sent reminders could not be relayed to SSE connections: {e}")
+            else:
+                # Nobody to relay to; later connections only get reminders sent from then on
+                since = now
+            relayed = {
+                delivery_id: sent_at for delivery_id, sent_at in relayed.items()
+                if sent_at >= since - SSE_RELAY_OVERLAP
+            }
+
+            try:
+                await asyncio.wait_for(self._relay_wakeup.wait(), REMINDER_SSE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _load_sent(user_ids: List[int], since: datetime.datetime) -> List[Tuple[int, datetime.datetime, dict]]:
+        db = SessionLocal()
+        try:
+            return ReminderDeliveryService.sent_since(db, user_ids, since)
+        finally:
+            db.close()
+
+    async def _send(self, reminder: dict) -> bool:
+        """
+        Deliver one reminder to every sink; a failing sink does not affect the
+        others. Returns True if every external sink delivered it, or, without
+        external sinks, if at least one sink did.
+        """
+        results = await asyncio.gather(*(sink.send(reminder) for sink in self.sinks), return_exceptions=True)
+        for sink, result in zip(self.sinks, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Reminder {reminder['type']} {reminder['id'] or reminder['series_id']} "
+                    f"could not be sent to the {sink.name} sink: {result}"
+                )
+        delivered = [
+            not isinstance(result, Exception) for sink, result in zip(self.sinks, results) if sink.external
+        ]
+        if delivered:
+            return all(delivered)
+        return any(not isinstance(result, Exception) for result in results)
+
+
+# Started from the application lifespan
+reminder_dispatcher = ReminderDispatcher(build_sinks())
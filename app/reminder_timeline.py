@@ -0,0 +1,190 @@
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, NamedTuple, Optional, Tuple
+from sqlalchemy import DateTime, Integer, String, and_, cast, column, literal, null, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from .pagination import decode_cursor, encode_cursor
+from .recurring_reminders import RecurringReminderService
+
+
+class TimelineSource(NamedTuple):
+    type: str  # Tag returned with each item, also the secondary sort key
+    model: type
+    due_at: str  # Datetime column the (user_id, due_at, id) index covers
+    done: str  # Boolean column marking the reminder as taken/completed
+    title: object  # Column or SQL expression for the item title
+    detail: Optional[str]
+    location: Optional[str]
+    duration_minutes: Optional[str]
+
+
+# The four reminder tables, as branches of the timeline UNION ALL
+TIMELINE_SOURCES = [
+    TimelineSource("bp_check", models.BPCheckReminder, "reminder_datetime", "is_completed",
+                   literal("Blood pressure check"), "bp_category", None, None),
+    TimelineSource("doctor_appointment", models.DoctorAppointmentReminder, "appointment_datetime", "is_completed",
+                   models.DoctorAppointmentReminder.doctor_name, "appointment_type", "location", None),
+    TimelineSource("medication", models.MedicationReminder, "schedule_datetime", "is_taken",
+                   models.MedicationReminder.name, "schedule_dosage", None, None),
+    TimelineSource("workout", models.WorkoutReminder, "workout_datetime", "is_completed",
+                   models.WorkoutReminder.workout_type, None, "location", "duration_minutes"),
+]
+
+# Timeline sort key, typed for decoding cursors
+SORT_COLUMNS = [column("due_at", DateTime), column("type", String), column("id", Integer)]
+
+# Reminder series kinds, also the timeline type of their occurrences; these
+# sort by negated series id within their type (before the table's rows)
+TIMELINE_SERIES_KINDS = ("bp_check", "medication")
+
+
+class ReminderTimelineService:
+    """Service for reading a user's reminders of every kind as one time-ordered stream."""
+
+    @staticmethod
+    def _after_cursor(source: TimelineSource, due_at, cursor: List):
+        """
+        Keyset condition "(due_at, type, id) > cursor" for one branch.
+
+        The type is constant within a branch, so the comparison reduces to
+        one on (due_at, id) that the branch's index can seek.
+        """
+        cursor_due_at, cursor_type, cursor_id = cursor
+        if source.type > cursor_type:
+            return due_at >= cursor_due_at
+        if source.type < cursor_type:
+            return due_at > cursor_due_at
+        return or_(due_at > cursor_due_at, and_(due_at == cursor_due_at, source.model.id > cursor_id))
+
+    @staticmethod
+    def _select(source: TimelineSource):
+        """A reminder table's rows as timeline items."""
+        model = source.model
+
+        def optional(name: Optional[str], column_type):
+            return getattr(model, name) if name else cast(null(), column_type)
+
+        return select(
+            literal(source.type).label("type"),
+            model.id.label("id"),
+            model.user_id.label("user_id"),
+            getattr(model, source.due_at).label("due_at"),
+            cast(source.title, String).label("title"),
+            optional(source.detail, String).label("detail"),
+            optional(source.location, String).label("location"),
+            optional(source.duration_minutes, Integer).label("duration_minutes"),
+            getattr(model, source.done).label("completed"),
+            model.notes.label("notes"),
+        )
+
+    @staticmethod
+    def _branch(source: TimelineSource, user_id: Optional[int], start: datetime, end: datetime,
+                include_completed: bool, cursor: Optional[List], limit: int):
+        """One reminder table's rows in the window, at most limit, in timeline order."""
+        model = source.model
+        due_at = getattr(model, source.due_at)
+
+        query = ReminderTimelineService._select(source).where(due_at >= start, due_at <= end)
+        if user_id is not None:
+            query = query.where(model.user_id == user_id)
+        if not include_completed:
+            query = query.where(getattr(model, source.done) == False)
+        if cursor:
+            query = query.where(ReminderTimelineService._after_cursor(source, due_at, cursor))
+
+        # Each branch only needs enough rows to fill the page on its own
+        return select(query.order_by(due_at, model.id).limit(limit).subquery())
+
+    @staticmethod
+    def get_reminder(db: Session, reminder_type: str, reminder_id: int):
+        """One reminder table row as a timeline item, or None if it does not exist."""
+        source = next(source for source in TIMELINE_SOURCES if source.type == reminder_type)
+        return db.execute(
+            ReminderTimelineService._select(source).where(source.model.id == reminder_id)
+        ).first()
+
+    @staticmethod
+    def occurrence_item(occurrence: SimpleNamespace, kind: str) -> SimpleNamespace:
+        """A recurring reminder occurrence as a timeline item."""
+        medication = kind == "medication"
+        return SimpleNamespace(
+            type=kind,
+            id=None,
+            sort_id=occurrence.sort_key[1],
+            user_id=occurrence.user_id,
+            due_at=occurrence.due_at,
+            title=occurrence.name if medication else "Blood pressure check",
+            detail=occurrence.schedule_dosage if medication else occurrence.bp_category,
+            location=None,
+            duration_minutes=None,
+            completed=occurrence.is_taken if medication else occurrence.is_completed,
+            notes=occurrence.notes,
+            series_id=occurrence.series_id,
+            occurrence_datetime=occurrence.occurrence_datetime,
+        )
+
+    @staticmethod
+    def _occurrences(db: Session, kind: str, user_id: Optional[int], start: datetime, end: datetime,
+                     include_completed: bool, cursor: Optional[List], limit: int) -> List[SimpleNamespace]:
+        """One series kind's occurrences in the window, at most limit, as timeline items."""
+        after_key = None
+        if cursor:
+            # Same reduction as _after_cursor, on (due_at, -series id)
+            cursor_due_at, cursor_type, cursor_id = cursor
+            if kind > cursor_type:
+                after_key = (cursor_due_at, float("-inf"))
+            elif kind < cursor_type:
+                after_key = (cursor_due_at, float("inf"))
+            else:
+                after_key = (cursor_due_at, cursor_id)
+
+        return [
+            ReminderTimelineService.occurrence_item(occurrence, kind)
+            for occurrence in RecurringReminderService.get_occurrences(
+                db, user_id, kind, start, end, include_done=include_completed, after_key=after_key, limit=limit
+            )
+        ]
+
+    @staticmethod
+    def get_timeline(
+        db: Session,
+        user_id: Optional[int],
+        start: datetime,
+        end: datetime,
+        after: Optional[str] = None,
+        limit: int = 100,
+        include_completed: bool = False
+    ) -> Tuple[List, Optional[str]]:
+        """
+        Fetch one page of a user's reminders due between start and end, across
+        all four reminder tables and the occurrences of recurring reminders,
+        ordered by due time, type and id. With user_id None the reminders of
+        all users are returned, as read by the reminder dispatcher.
+
+        The tables are read in a single UNION ALL query. Returns the page's
+        items and the cursor for the next page (None on the last page).
+        """
+        cursor = decode_cursor(after, SORT_COLUMNS) if after else None
+        timeline = union_all(*[
+            ReminderTimelineService._branch(source, user_id, start, end, include_completed, cursor, limit + 1)
+            for source in TIMELINE_SOURCES
+        ]).subquery()
+        sort_columns = [timeline.c.due_at, timeline.c.type, timeline.c.id]
+
+        rows = db.execute(select(timeline).order_by(*sort_columns).limit(limit + 1)).all()
+        for kind in TIMELINE_SERIES_KINDS:
+            rows += ReminderTimelineService._occurrences(
+                db, kind, user_id, start, end, include_completed, cursor, limit + 1
+            )
+
+        def sort_key(item):
+            return item.due_at, item.type, item.id if item.id is not None else item.sort_id
+
+        rows = sorted(rows, key=sort_key)[:limit + 1]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(list(sort_key(rows[-1])))
+        return rows, next_cursor
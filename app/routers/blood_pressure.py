@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Response
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import date, datetime
 import base64
-import pandas as pd
-from io import BytesIO
+import csv
+import zlib
+import numpy as np
+from io import StringIO
 
 from .. import models, schemas
-from ..database import get_db
-from ..ocr import OCRProcessor
+from ..database import get_db, SessionLocal
+from ..ocr import OCR_BATCH_MAX_IMAGES, OCRProcessor
+from ..ocr_cache import get_cache_stats
+from ..preview_store import PreviewStore
+from ..ocr_jobs import ocr_job_queue
+from .ocr_jobs import enqueue_ocr_job
+from ..bp_classification import classify, classify_codes, CATEGORIES_BY_CODE, CATEGORIES_BY_KEY
+from ..bp_stats_service import BPStatsService
+from ..bp_analytics import BPAnalyticsService
+from ..parquet_export import ParquetExportService
+from ..pagination import keyset_paginate, set_next_cursor
 
 router = APIRouter(
     prefix="/bp",
@@ -19,6 +32,16 @@ router = APIRouter(
 # Initialize OCR processor
 ocr_processor = OCRProcessor()
 
+# OCR extractions waiting for the user's approval, by preview token
+preview_store = PreviewStore()
+
+# Category filter values for reading history, see bp_classification
+BPCategoryKey = Literal["normal", "elevated", "stage_1", "stage_2", "hypertensive_crisis"]
+
+# Rows fetched per round trip and bytes buffered per chunk when streaming exports
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 def interpret_blood_pressure(systolic: int, diastolic: int) -> str:
     """
     Interpret blood pressure readings based on standardized categories from
@@ -31,20 +54,21 @@ def interpret_blood_pressure(systolic: int, diastolic: int) -> str:
     - Hypertension Stage 2: Systolic ≥ 140 OR Diastolic ≥ 90
     - Hypertensive Crisis: Systolic > 180 OR Diastolic > 120
 
+    Thresholds come from the shared table in bp_classification.
+
     Returns a string with the interpretation.
     """
-    if systolic > 180 or diastolic > 120:
-        return "Hypertensive Crisis (Consult your doctor immediately)"
-    elif systolic >= 140 or diastolic >= 90:
-        return "Hypertension Stage 2"
-    elif (systolic >= 130 and systolic <= 139) or (diastolic >= 80 and diastolic <= 89):
-        return "Hypertension Stage 1"
-    elif (systolic >= 120 and systolic <= 129) and diastolic < 80:
-        return "Elevated Blood Pressure"
-    elif systolic < 120 and diastolic < 80:
-        return "Normal Blood Pressure"
-    else:
-        return "Invalid Reading"
+    return classify(systolic, diastolic).label
+
+def validate_reading_values(systolic: int, diastolic: int, pulse: int) -> Optional[str]:
+    """Check a reading against plausible ranges. Returns an error message, or None if valid."""
+    if systolic < 70 or systolic > 250:
+        return "Invalid systolic reading"
+    if diastolic < 40 or diastolic > 150:
+        return "Invalid diastolic reading"
+    if pulse < 30 or pulse > 220:
+        return "Invalid pulse reading"
+    return None
 
 @router.post("/readings/", response_model=schemas.BloodPressure)
 def create_reading(
@@ -58,15 +82,9 @@ def create_reading(
         raise HTTPException(status_code=404, detail="User not found")
 
     # Validate blood pressure readings
-    if reading.systolic < 70 or reading.systolic > 250:
-        raise HTTPException(status_code=400, detail="Invalid systolic reading")
-    if reading.diastolic < 40 or reading.diastolic > 150:
-        raise HTTPException(status_code=400, detail="Invalid diastolic reading")
-    if reading.pulse < 30 or reading.pulse > 220:
-        raise HTTPException(status_code=400, detail="Invalid pulse reading")
-
-    # Get interpretation of blood pressure
-    interpretation = interpret_blood_pressure(reading.systolic, reading.diastolic)
+    error = validate_reading_values(reading.systolic, reading.diastolic, reading.pulse)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
     db_reading = models.BloodPressure(
         user_id=user_id,
@@ -74,33 +92,217 @@ def create_reading(
         diastolic=reading.diastolic,
         pulse=reading.pulse,
         notes=reading.notes,
-        interpretation=interpretation
+        category=classify(reading.systolic, reading.diastolic).code
     )
     db.add(db_reading)
+    BPStatsService.record_readings(user_id, [db_reading], db)
     db.commit()
     db.refresh(db_reading)
     return db_reading
 
+@router.post("/readings/batch", response_model=schemas.BloodPressureBatchResponse)
+def create_readings_batch(
+    batch: schemas.BloodPressureBatchCreate,
+    user_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Save many readings at once, e.g. when a device or the app syncs its offline queue.
+
+    Each reading is validated with the same ranges as POST /bp/readings/.
+    Valid readings are inserted together in one transaction; invalid ones are
+    reported as rejected without affecting the rest.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    now = datetime.utcnow()
+    results = []
+    rows = []
+    for index, reading in enumerate(batch.readings):
+        error = validate_reading_values(reading.systolic, reading.diastolic, reading.pulse)
+        if error:
+            results.append(schemas.BloodPressureBatchItemResult(index=index, status="rejected", error=error))
+            continue
+
+        rows.append({
+            "user_id": user_id,
+            "systolic": reading.systolic,
+            "diastolic": reading.diastolic,
+            "pulse": reading.pulse,
+            "reading_time": reading.reading_time or now,
+            "notes": reading.notes
+        })
+        results.append(schemas.BloodPressureBatchItemResult(index=index, status="accepted"))
+
+    _insert_accepted_readings(user_id, rows, results, db)
+
+    return schemas.BloodPressureBatchResponse(
+        accepted=len(rows),
+        rejected=len(results) - len(rows),
+        results=results
+    )
+
+def _insert_accepted_readings(user_id: int, rows: List[dict], results: list, db: Session) -> None:
+    """
+    Classify and insert the accepted rows of a batch in one transaction.
+
+    rows line up with the results whose status is "accepted"; those results
+    get the new reading's id and interpretation.
+    """
+    if not rows:
+        return
+
+    # Classify the whole batch in one vectorized pass
+    codes = classify_codes(
+        np.fromiter((row["systolic"] for row in rows), dtype=np.int32, count=len(rows)),
+        np.fromiter((row["diastolic"] for row in rows), dtype=np.int32, count=len(rows))
+    )
+    for row, code in zip(rows, codes.tolist()):
+        row["category"] = code
+
+    # One multi-row INSERT for the whole batch, returning ids in input order
+    inserted_ids = db.execute(
+        insert(models.BloodPressure).returning(models.BloodPressure.id, sort_by_parameter_order=True),
+        rows
+    ).scalars().all()
+    BPStatsService.record_readings(user_id, rows, db)
+    db.commit()
+
+    accepted_results = [result for result in results if result.status == "accepted"]
+    for result, row, reading_id in zip(accepted_results, rows, inserted_ids):
+        result.id = reading_id
+        result.interpretation = CATEGORIES_BY_CODE[row["category"]].label
+
 @router.get("/readings/{user_id}", response_model=List[schemas.BloodPressure])
 def get_readings(
     user_id: int,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    category: Optional[BPCategoryKey] = None,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
     db: Session = Depends(get_db)
 ):
+    """
+    Get a user's readings, newest first.
+
+    Filter by `category` (e.g. `hypertensive_crisis`) and/or a `from`/`to`
+    reading time window. Pass the X-Next-Cursor response header back as
+    `after` to fetch the next page.
+    """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    readings = db.query(models.BloodPressure).filter(
-        models.BloodPressure.user_id == user_id
-    ).order_by(
-        models.BloodPressure.reading_time.desc()
-    ).offset(skip).limit(limit).all()
+    query = _filtered_readings_query(db, user_id, from_date, to_date)
+    if category is not None:
+        query = query.filter(models.BloodPressure.category == CATEGORIES_BY_KEY[category].code)
+    readings, next_cursor = keyset_paginate(
+        query,
+        [models.BloodPressure.reading_time, models.BloodPressure.id],
+        after, limit, descending=True, skip=skip
+    )
+    set_next_cursor(response, next_cursor)
 
     return readings
 
+@router.get("/readings/{user_id}/series", response_model=schemas.BPSeriesResponse)
+def get_reading_series(
+    user_id: int,
+    bucket: Literal["day", "week", "month"] = "day",
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a user's readings downsampled into day, week or month buckets for charting.
+
+    Each point has the count and the mean/min/max of systolic, diastolic and
+    pulse. Served from the daily rollup table, so the payload stays small no
+    matter how many readings the user has.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    points = BPStatsService.get_series(user_id, bucket, from_date, to_date, db)
+    return schemas.BPSeriesResponse(user_id=user_id, bucket=bucket, points=points)
+
+@router.get("/readings/{user_id}/trends")
+def get_reading_trends(
+    user_id: int,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    window: int = Query(7, ge=2, le=365),
+    target_systolic: int = 130,
+    target_diastolic: int = 80,
+    utc_offset_minutes: int = 0,
+    include_series: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Get trend analytics for a user's readings in a date range.
+
+    Includes rolling means over the last `window` readings, linear trend
+    slope per day, standard deviation and coefficient of variation,
+    morning vs evening differences (using `utc_offset_minutes` for the
+    user's local time) and the share of readings in the target range.
+    Set `include_series` to also return the rolling mean for every reading.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    readings = BPAnalyticsService.load_readings(user_id, from_date, to_date, db)
+    trends = BPAnalyticsService.compute_trends(
+        readings,
+        window=window,
+        target_systolic=target_systolic,
+        target_diastolic=target_diastolic,
+        utc_offset_minutes=utc_offset_minutes,
+        include_series=include_series
+    )
+    return {"user_id": user_id, **trends}
+
+def _claim_preview(db: Session, preview_token: str, user_id: Optional[int]) -> dict:
+    """
+    Consume a stored OCR preview, raising if it is unknown, expired or for another user.
+    """
+    preview = preview_store.get(db, preview_token)
+    if preview is None:
+        raise HTTPException(status_code=404, detail="OCR preview not found or expired")
+    if user_id is not None and preview["user_id"] != user_id:
+        raise HTTPException(status_code=403, detail="OCR preview belongs to another user")
+    # A concurrent request may have saved it in the meantime
+    if preview_store.take(db, preview_token) is None:
+        raise HTTPException(status_code=404, detail="OCR preview not found or expired")
+    return preview
+
+def _save_ocr_values(user_id: int, systolic, diastolic, pulse, notes: Optional[str], db: Session) -> models.BloodPressure:
+    """Insert an OCR-derived reading and fold it into the user's aggregates."""
+    db_reading = models.BloodPressure(
+        user_id=user_id,
+        systolic=systolic,
+        diastolic=diastolic,
+        pulse=pulse,
+        notes=notes,
+        # The label is always derived from the values, never taken from the client
+        category=classify(systolic, diastolic).code if systolic is not None and diastolic is not None else None
+    )
+    db.add(db_reading)
+    BPStatsService.record_readings(user_id, [db_reading], db)
+    db.commit()
+    db.refresh(db_reading)
+    return db_reading
+
 @router.post("/ocr-preview/")
 async def preview_bp_image(
     user_id: int = Form(...),
@@ -111,6 +313,10 @@ async def preview_bp_image(
     """
     Process BP image with OCR and return extracted data for user approval.
     Does NOT save to database - only extracts and returns the readings.
+
+    The extraction is kept server-side for a short time; pass the returned
+    preview_token to /bp/save-ocr/ or /bp/upload/ to save it (optionally with
+    corrected values) without re-sending the image or running OCR again.
     """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -122,11 +328,19 @@ async def preview_bp_image(
 
     # Process the image with OCR
     try:
-        systolic, diastolic, pulse = ocr_processor.extract_readings(image_data)
+        systolic, diastolic, pulse = await ocr_processor.extract_readings_async(image_data)
 
         # Get interpretation of blood pressure
         interpretation = interpret_blood_pressure(systolic, diastolic)
 
+        preview_token = preview_store.put(db, {
+            "user_id": user_id,
+            "systolic": systolic,
+            "diastolic": diastolic,
+            "pulse": pulse,
+            "notes": notes
+        })
+
         # Return extracted data without saving to database
         return {
             "systolic": systolic,
@@ -135,7 +349,9 @@ async def preview_bp_image(
             "notes": notes,
             "interpretation": interpretation,
             "user_id": user_id,
-            "preview": True  # Indicates this is preview data, not saved
+            "preview": True,  # Indicates this is preview data, not saved
+            "preview_token": preview_token,
+            "expires_in": preview_store.ttl_seconds
         }
 
     except Exception as e:
@@ -144,53 +360,161 @@ async def preview_bp_image(
             detail=f"Error processing image: {str(e)}"
         )
 
-@router.post("/upload/", response_model=schemas.BloodPressure)
+@router.post(
+    "/upload/",
+    response_model=schemas.BloodPressure,
+    responses={202: {"model": schemas.OCRJob, "description": "OCR job accepted (async_job=true)"}}
+)
 async def upload_bp_image(
     user_id: int = Form(...),
-    image: UploadFile = File(...),
+    image: Optional[UploadFile] = File(None),
     notes: Optional[str] = Form(None),
+    preview_token: Optional[str] = Form(None),
+    systolic: Optional[int] = Form(None),
+    diastolic: Optional[int] = Form(None),
+    pulse: Optional[int] = Form(None),
+    async_job: bool = Form(False),
+    callback_url: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
+    """
+    Extract a reading from a BP monitor image and save it.
+
+    Instead of an image, a preview_token from /bp/ocr-preview/ can be sent to
+    save that extraction without another OCR run. With a token, systolic,
+    diastolic, pulse and notes override the previewed values.
+
+    With async_job=true the image is queued and 202 is returned right away
+    with a job ID; fetch the saved reading from /ocr/jobs/{id} (optionally
+    long-polling with ?wait=) or have it POSTed to callback_url.
+    """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    if preview_token:
+        preview = _claim_preview(db, preview_token, user_id)
+        return _save_ocr_values(
+            user_id,
+            systolic if systolic is not None else preview["systolic"],
+            diastolic if diastolic is not None else preview["diastolic"],
+            pulse if pulse is not None else preview["pulse"],
+            notes if notes is not None else preview["notes"],
+            db
+        )
+
+    if image is None:
+        raise HTTPException(status_code=400, detail="Either an image or a preview_token is required")
+
     # Read the uploaded image file
     image_data = await image.read()
 
+    if async_job:
+        return await enqueue_ocr_job(db, "bp_upload", user_id, image_data, notes, callback_url)
+
     # Process the image with OCR
     try:
-        systolic, diastolic, pulse = ocr_processor.extract_readings(image_data)
+        return await _extract_and_save(user_id, image_data, notes, db)
 
-        # Get interpretation of blood pressure
-        interpretation = interpret_blood_pressure(systolic, diastolic)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing image: {str(e)}"
+        )
+
+async def _extract_and_save(user_id: int, image_data: bytes, notes: Optional[str], db: Session) -> models.BloodPressure:
+    """OCR a BP monitor image and save the reading, as /bp/upload/ does."""
+    systolic, diastolic, pulse = await ocr_processor.extract_readings_async(image_data)
+
+    # If all values are 0, it might be an OCR failure
+    if systolic == 0 and diastolic == 0 and pulse == 0:
+        notes = "Warning: OCR may have failed to extract values"
+
+    # Keep notes as provided by user (can be None)
+    return _save_ocr_values(user_id, systolic, diastolic, pulse, notes, db)
+
+async def _run_bp_upload_job(job: models.OCRJob, db: Session) -> dict:
+    """Background version of /bp/upload/; the job result is the saved reading."""
+    reading = await _extract_and_save(job.user_id, job.image, job.notes, db)
+    return schemas.BloodPressure.model_validate(reading).model_dump(mode="json")
+
+ocr_job_queue.register("bp_upload", _run_bp_upload_job)
+
+@router.post("/upload/batch", response_model=schemas.BPImageBatchResponse)
+async def upload_bp_images_batch(
+    user_id: int = Form(...),
+    images: List[UploadFile] = File(...),
+    notes: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Extract readings from many BP monitor images and save them together.
+
+    The images are processed concurrently (see OCRProcessor.extract_readings_batch)
+    and the readings that pass the same checks as POST /bp/readings/ are
+    inserted in one transaction. Images that could not be read or gave
+    implausible values are reported as rejected with the extracted values, so
+    they can be corrected and sent to /bp/readings/batch.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if len(images) > OCR_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {OCR_BATCH_MAX_IMAGES} images can be uploaded at once")
+
+    image_data = [await image.read() for image in images]
+    readings = await ocr_processor.extract_readings_batch(image_data)
 
-        # Create record with extracted readings
-        db_reading = models.BloodPressure(
-            user_id=user_id,
+    now = datetime.utcnow()
+    results = []
+    rows = []
+    for index, (image, (systolic, diastolic, pulse)) in enumerate(zip(images, readings)):
+        result = schemas.BPImageBatchItemResult(
+            index=index,
+            filename=image.filename,
+            status="accepted",
             systolic=systolic,
             diastolic=diastolic,
-            pulse=pulse,
-            notes=notes,  # Keep notes as provided by user (can be None)
-            interpretation=interpretation
+            pulse=pulse
         )
+        results.append(result)
 
-        # If all values are 0, it might be an OCR failure
         if systolic == 0 and diastolic == 0 and pulse == 0:
-            db_reading.notes = "Warning: OCR may have failed to extract values"
+            result.status = "rejected"
+            result.error = "Could not read the monitor display"
+            continue
+        error = validate_reading_values(systolic, diastolic, pulse)
+        if error:
+            result.status = "rejected"
+            result.error = error
+            continue
+
+        rows.append({
+            "user_id": user_id,
+            "systolic": systolic,
+            "diastolic": diastolic,
+            "pulse": pulse,
+            "reading_time": now,
+            "notes": notes
+        })
 
-        db.add(db_reading)
-        db.commit()
-        db.refresh(db_reading)
+    _insert_accepted_readings(user_id, rows, results, db)
 
-        return db_reading
+    return schemas.BPImageBatchResponse(
+        accepted=len(rows),
+        rejected=len(results) - len(rows),
+        results=results
+    )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error processing image: {str(e)}"
-        )
+@router.get("/ocr-cache/stats")
+def get_ocr_cache_stats():
+    """
+    Hit/miss counters of the OCR result caches (BP monitor and prescription images).
+    """
+    return get_cache_stats()
 
 @router.post("/save-ocr/", response_model=schemas.BloodPressure)
 async def save_ocr_reading(
@@ -199,15 +523,22 @@ async def save_ocr_reading(
 ):
     """
     Save OCR reading data that has been approved by the user.
+
+    Send the preview_token returned by /bp/ocr-preview/ to save the stored
+    extraction; any systolic, diastolic, pulse or notes in the body are
+    treated as user corrections. Without a token the values in the body are
+    saved as they are.
     """
     try:
         # Extract data from the request
         user_id = reading_data.get("user_id")
-        systolic = reading_data.get("systolic")
-        diastolic = reading_data.get("diastolic")
-        pulse = reading_data.get("pulse")
-        notes = reading_data.get("notes")
-        interpretation = reading_data.get("interpretation")
+        values = {key: reading_data.get(key) for key in ("systolic", "diastolic", "pulse", "notes")}
+
+        preview_token = reading_data.get("preview_token")
+        if preview_token:
+            preview = _claim_preview(db, preview_token, user_id)
+            user_id = preview["user_id"]
+            values = {key: reading_data[key] if key in reading_data else preview[key] for key in values}
 
         # Verify the user exists
         user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -215,134 +546,175 @@ async def save_ocr_reading(
             raise HTTPException(status_code=404, detail="User not found")
 
         # Create record with approved readings
-        db_reading = models.BloodPressure(
-            user_id=user_id,
-            systolic=systolic,
-            diastolic=diastolic,
-            pulse=pulse,
-            notes=notes,
-            interpretation=interpretation
-        )
-
-        db.add(db_reading)
-        db.commit()
-        db.refresh(db_reading)
-
-        return db_reading
+        return _save_ocr_values(user_id, values["systolic"], values["diastolic"], values["pulse"], values["notes"], db)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error saving OCR reading: {str(e)}"
         )
 
+def _filtered_readings_query(db: Session, user_id: int, from_date: Optional[datetime], to_date: Optional[datetime]):
+    """Query a user's readings, optionally restricted to a reading_time window."""
+    query = db.query(models.BloodPressure).filter(models.BloodPressure.user_id == user_id)
+    if from_date is not None:
+        query = query.filter(models.BloodPressure.reading_time >= from_date)
+    if to_date is not None:
+        query = query.filter(models.BloodPressure.reading_time <= to_date)
+    return query
+
+def _category_label(category: Optional[int], interpretation_text: Optional[str]) -> str:
+    """Label for a selected (category, legacy interpretation) column pair."""
+    if category is None:
+        return interpretation_text or ""
+    return CATEGORIES_BY_CODE[category].label
+
+def _iter_csv_export(user_id: int, from_date: Optional[datetime], to_date: Optional[datetime], compress: bool):
+    """
+    Yield CSV export chunks, paging through readings with a server-side cursor.
+
+    Uses its own session because the response body is produced after the
+    request's dependencies may already have been torn down.
+    """
+    db = SessionLocal()
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip container
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    try:
+        writer.writerow(["Date/Time", "Systolic", "Diastolic", "Pulse", "Status", "Notes"])
+        yield drain()
+
+        rows = _filtered_readings_query(db, user_id, from_date, to_date).with_entities(
+            models.BloodPressure.reading_time,
+            models.BloodPressure.systolic,
+            models.BloodPressure.diastolic,
+            models.BloodPressure.pulse,
+            models.BloodPressure.category,
+            models.BloodPressure.interpretation_text,
+            models.BloodPressure.notes
+        ).order_by(
+            models.BloodPressure.reading_time.desc()
+        ).yield_per(EXPORT_BATCH_SIZE)
+
+        for row in rows:
+            writer.writerow([
+                row.reading_time, row.systolic, row.diastolic, row.pulse,
+                _category_label(row.category, row.interpretation_text), row.notes or ""
+            ])
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+
+        chunk = drain()
+        if compressor:
+            chunk += compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
 @router.get("/export/csv/{user_id}")
-async def export_csv(user_id: int, db: Session = Depends(get_db)):
-    """Export blood pressure readings as CSV."""
-    # Get user's readings
-    readings = db.query(models.BloodPressure).filter(
-        models.BloodPressure.user_id == user_id
-    ).order_by(models.BloodPressure.reading_time.desc()).all()
-
-    if not readings:
+def export_csv(
+    user_id: int,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    gzip: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Export blood pressure readings as CSV.
+
+    The file is streamed in chunks as rows are read, so exports of any size
+    run in constant memory. Use `from`/`to` to limit the export to a date
+    range and `gzip=true` to download a compressed `.csv.gz` file.
+    """
+    # Check there is something to export before starting the stream
+    has_readings = _filtered_readings_query(db, user_id, from_date, to_date).with_entities(
+        models.BloodPressure.id
+    ).first()
+    if not has_readings:
         raise HTTPException(status_code=404, detail="No readings found")
 
-    # Convert to DataFrame
-    data = []
-    for reading in readings:
-        data.append({
-            'Date/Time': reading.reading_time,
-            'Systolic': reading.systolic,
-            'Diastolic': reading.diastolic,
-            'Pulse': reading.pulse,
-            'Status': reading.interpretation,
-            'Notes': reading.notes or ''
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Create CSV in memory
-    output = BytesIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
-    
-    # Return CSV file
-    content = output.getvalue()
+    filename = f'bp_history_{datetime.now().strftime("%Y%m%d")}.csv'
+    media_type = 'text/csv'
+    if gzip:
+        filename += '.gz'
+        media_type = 'application/gzip'
+
     headers = {
-        'Content-Disposition': f'attachment; filename=bp_history_{datetime.now().strftime("%Y%m%d")}.csv',
-        'Content-Type': 'text/csv',
+        'Content-Disposition': f'attachment; filename={filename}',
         'Access-Control-Expose-Headers': 'Content-Disposition'
     }
-    return Response(
-        content=content,
-        media_type='text/csv',
+    return StreamingResponse(
+        _iter_csv_export(user_id, from_date, to_date, gzip),
+        media_type=media_type,
         headers=headers
     )
 
 
-@router.get("/readings/stats/{user_id}")
-def get_reading_stats(user_id: int, db: Session = Depends(get_db)):
-    """Get statistics about a user's blood pressure readings."""
+ExportTable = Literal[
+    "blood_pressure_readings",
+    "medication_reminders",
+    "bp_check_reminders",
+    "doctor_appointment_reminders",
+    "workout_reminders"
+]
+
+@router.get("/export/parquet/{user_id}")
+def export_parquet(
+    user_id: int,
+    table: ExportTable = "blood_pressure_readings",
+    db: Session = Depends(get_db)
+):
+    """
+    Export one of a user's tables (readings or a reminder table) as a Parquet file.
+
+    Columns keep their types (integers, booleans, timestamps) and are
+    zstd-compressed. The file is streamed one row group at a time.
+    """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Get all readings for the user
-    readings = db.query(models.BloodPressure).filter(
-        models.BloodPressure.user_id == user_id
-    ).all()
+    return StreamingResponse(
+        ParquetExportService.iter_export(table, user_id),
+        media_type='application/vnd.apache.parquet',
+        headers=ParquetExportService.export_headers(table, user_id, datetime.now().strftime("%Y%m%d"))
+    )
 
-    if not readings:
-        return {
-            "total_readings": 0,
-            "message": "No readings found for this user"
-        }
+@router.get("/export/parquet")
+def export_parquet_all_users(table: ExportTable = "blood_pressure_readings"):
+    """
+    Export a table for all users as a Parquet file (admin/analytics bulk export).
 
-    # Calculate statistics
-    total = len(readings)
-    avg_systolic = sum(r.systolic for r in readings) / total if total > 0 else 0
-    avg_diastolic = sum(r.diastolic for r in readings) / total if total > 0 else 0
-    avg_pulse = sum(r.pulse for r in readings) / total if total > 0 else 0
-
-    # Find min and max
-    min_systolic = min((r.systolic for r in readings), default=0)
-    max_systolic = max((r.systolic for r in readings), default=0)
-    min_diastolic = min((r.diastolic for r in readings), default=0)
-    max_diastolic = max((r.diastolic for r in readings), default=0)
-
-    # Add interpretation to any readings that don't have it
-    for reading in readings:
-        if not reading.interpretation:
-            reading.interpretation = interpret_blood_pressure(reading.systolic, reading.diastolic)
-            db.add(reading)
-
-    # Commit any changes
-    db.commit()
+    Rows are ordered by user and time and streamed one row group at a time.
+    """
+    return StreamingResponse(
+        ParquetExportService.iter_export(table),
+        media_type='application/vnd.apache.parquet',
+        headers=ParquetExportService.export_headers(table, None, datetime.now().strftime("%Y%m%d"))
+    )
 
-    # Count readings by category
-    normal_count = sum(1 for r in readings if r.interpretation == "Normal Blood Pressure")
-    elevated_count = sum(1 for r in readings if r.interpretation == "Elevated Blood Pressure")
-    hypertension1_count = sum(1 for r in readings if r.interpretation == "Hypertension Stage 1")
-    hypertension2_count = sum(1 for r in readings if r.interpretation == "Hypertension Stage 2")
-    crisis_count = sum(1 for r in readings if "Crisis" in r.interpretation)
-
-    return {
-        "total_readings": total,
-        "averages": {
-            "systolic": round(avg_systolic, 1),
-            "diastolic": round(avg_diastolic, 1),
-            "pulse": round(avg_pulse, 1)
-        },
-        "ranges": {
-            "systolic": {"min": min_systolic, "max": max_systolic},
-            "diastolic": {"min": min_diastolic, "max": max_diastolic}
-        },
-        "categories": {
-            "normal": normal_count,
-            "elevated": elevated_count,
-            "hypertension_stage1": hypertension1_count,
-            "hypertension_stage2": hypertension2_count,
-            "hypertensive_crisis": crisis_count
-        }
-    }
+
+@router.get("/readings/stats/{user_id}")
+def get_reading_stats(user_id: int, db: Session = Depends(get_db)):
+    """Get statistics about a user's blood pressure readings."""
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Read the incrementally maintained summary row
+    aggregates = BPStatsService.get_user_stats(user_id, db)
+    return BPStatsService.format_stats(aggregates)
@@ -0,0 +1,72 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from .. import models, schemas
+from ..database import get_db
+from ..ocr_jobs import ACTIVE_STATUSES, OCR_JOB_MAX_WAIT_SECONDS, check_callback_url, ocr_job_queue
+
+router = APIRouter(
+    prefix="/ocr",
+    tags=["OCR jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+async def enqueue_ocr_job(
+    db: Session,
+    kind: str,
+    user_id: int,
+    image_data: bytes,
+    notes: Optional[str],
+    callback_url: Optional[str]
+) -> JSONResponse:
+    """
+    Queue a background OCR job and build the 202 response pointing at it.
+    Used by the upload endpoints when the client asks for an async job.
+    """
+    if callback_url:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, check_callback_url, callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if ocr_job_queue.full():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many OCR jobs are waiting, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+    job = await ocr_job_queue.submit(db, kind, user_id, image_data, notes, callback_url)
+    return JSONResponse(
+        status_code=202,
+        content=schemas.OCRJob.model_validate(job).model_dump(mode="json"),
+        headers={"Location": f"/ocr/jobs/{job.id}"}
+    )
+
+@router.get("/jobs/{job_id}", response_model=schemas.OCRJob)
+async def get_ocr_job(
+    job_id: str,
+    response: Response,
+    wait: int = Query(0, ge=0, le=OCR_JOB_MAX_WAIT_SECONDS, description="Seconds to wait for the job to finish (long-poll)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the status and result of a background OCR job.
+
+    With wait > 0 the request is held until the job finishes or wait seconds
+    pass, whichever comes first. Unfinished jobs are returned with a
+    Retry-After header.
+    """
+    job = db.query(models.OCRJob).filter(models.OCRJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+
+    if wait and job.status in ACTIVE_STATUSES:
+        await ocr_job_queue.wait(job_id, wait)
+        db.refresh(job)
+
+    if job.status in ACTIVE_STATUSES:
+        response.headers["Retry-After"] = "1"
+    return job
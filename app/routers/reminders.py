@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import base64
+import json
 from pydantic import BaseModel
 
 from .. import models, schemas
 from ..database import get_db
 from ..medication_ocr import MedicationOCRProcessor
+from ..document_pages import split_pages
+from ..ocr_jobs import ocr_job_queue
+from .ocr_jobs import enqueue_ocr_job
 from ..bp_reminder_service import BPReminderService
+from ..reminder_timeline import ReminderTimelineService
+from ..recurring_reminders import RecurringReminderService
+from ..bulk_reminders import BulkReminderService
+from ..reminder_dispatcher import reminder_dispatcher, sse_sink
+from ..dosing_schedule import expand_schedule
+from ..pagination import keyset_paginate, set_next_cursor
 
 router = APIRouter(
     prefix="/reminders",
@@ -18,6 +31,9 @@ router = APIRouter(
 # Initialize OCR processor
 medication_ocr_processor = MedicationOCRProcessor()
 
+# Comment line sent on idle reminder streams so proxies keep them open
+STREAM_KEEPALIVE_SECONDS = 15
+
 @router.post("/", response_model=schemas.MedicationReminder, tags=["Medication Reminders"])
 def create_reminder(
     reminder: schemas.MedicationReminderCreate,
@@ -41,17 +57,23 @@ def create_reminder(
     db.add(db_reminder)
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("medication", db_reminder.id)
     return db_reminder
 
 @router.get("/{user_id}", response_model=List[schemas.MedicationReminder], tags=["Medication Reminders"])
 def get_user_reminders(
     user_id: int,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
     include_taken: bool = True,
     db: Session = Depends(get_db)
 ):
-    """Get all medication reminders for a user."""
+    """
+    Get all medication reminders for a user, including the occurrences of
+    recurring medication reminders (with series_id set and id null).
+    """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -62,7 +84,11 @@ def get_user_reminders(
     if not include_taken:
         query = query.filter(models.MedicationReminder.is_taken == False)
     
-    reminders = query.order_by(models.MedicationReminder.schedule_datetime).offset(skip).limit(limit).all()
+    reminders, next_cursor = RecurringReminderService.paginate_with_occurrences(
+        db, query, [models.MedicationReminder.schedule_datetime, models.MedicationReminder.id],
+        user_id, "medication", after, limit, skip=skip, include_done=include_taken
+    )
+    set_next_cursor(response, next_cursor)
     return reminders
 
 @router.get("/reminder/{reminder_id}", response_model=schemas.MedicationReminder, tags=["Medication Reminders"])
@@ -91,6 +117,7 @@ def update_reminder(
 
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("medication", db_reminder.id)
     return db_reminder
 
 @router.delete("/reminder/{reminder_id}", tags=["Medication Reminders"])
@@ -102,18 +129,76 @@ def delete_reminder(reminder_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_reminder)
     db.commit()
+    reminder_dispatcher.reminder_changed("medication", reminder_id)
     return {"message": "Reminder deleted successfully"}
 
-@router.post("/upload-prescription", response_model=schemas.MedicationOCRResponse, tags=["Medication Reminders"])
+NO_PRESCRIPTION_FOUND = "Could not extract medication information from the image. Please try a clearer image or add the reminder manually."
+
+def _extraction(prescription_data: dict) -> schemas.MedicationOCRExtraction:
+    """Convert one extracted medication to its response schema."""
+    return schemas.MedicationOCRExtraction(
+        name=prescription_data.get("name", ""),
+        dosage=prescription_data.get("dosage", ""),
+        schedule=[
+            schemas.MedicationScheduleItem(
+                datetime=item.get("datetime", ""),
+                dosage=item.get("dosage", "")
+            ) for item in prescription_data.get("schedule", [])
+        ],
+        interpretation=prescription_data.get("interpretation", ""),
+        rule=prescription_data.get("rule")
+    )
+
+def _prescription_response(medications: List[dict]) -> schemas.MedicationOCRResponse:
+    """Build the approval response for the medications extracted from a prescription."""
+    extracted = [_extraction(prescription_data) for prescription_data in medications]
+
+    return schemas.MedicationOCRResponse(
+        extracted_data=extracted[0],
+        medications=extracted,
+        total_reminders=sum(len(medication.schedule) for medication in extracted),
+        message="Medication information extracted successfully. Please review and approve to save."
+    )
+
+async def _extract_medications(document: bytes) -> List[dict]:
+    """
+    OCR an uploaded prescription image or document.
+    Multi-page PDFs and multi-frame images are split and their pages processed concurrently.
+    """
+    pages = await split_pages(document)
+    if len(pages) == 1:
+        loop = asyncio.get_running_loop()
+        prescription_data = await loop.run_in_executor(None, medication_ocr_processor.extract_prescription, pages[0])
+        if not prescription_data.get("name") and not prescription_data.get("schedule"):
+            return []
+        return [prescription_data]
+    return await medication_ocr_processor.extract_prescriptions(pages)
+
+@router.post(
+    "/upload-prescription",
+    response_model=schemas.MedicationOCRResponse,
+    responses={202: {"model": schemas.OCRJob, "description": "OCR job accepted (async_job=true)"}},
+    tags=["Medication Reminders"]
+)
 async def upload_prescription_image(
     user_id: int = Form(...),
     image: UploadFile = File(...),
     notes: Optional[str] = Form(None),
+    async_job: bool = Form(False),
+    callback_url: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
     """
     Upload an image of a medication prescription for OCR processing.
     Returns extracted medication data for user approval before saving.
+
+    Multi-page PDFs and multi-frame images (e.g. TIFF scans) are accepted;
+    their pages are processed concurrently and the medications found on all
+    pages are returned in medications.
+
+    With async_job=true the image is queued and 202 is returned right away
+    with a job ID; fetch the extraction from /ocr/jobs/{id} (optionally
+    long-polling with ?wait=) or have it POSTed to callback_url.
     """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -121,47 +206,49 @@ async def upload_prescription_image(
         raise HTTPException(status_code=404, detail="User not found")
 
     # Validate file type
-    if not image.content_type or not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+    if not image.content_type or not (image.content_type.startswith("image/") or image.content_type == "application/pdf"):
+        raise HTTPException(status_code=400, detail="File must be an image or a PDF")
+
+    if async_job:
+        image_data = await image.read()
+        return await enqueue_ocr_job(db, "prescription", user_id, image_data, notes, callback_url)
 
     try:
         # Read image data
         image_data = await image.read()
 
-        # Process the image with OCR
-        prescription_data = medication_ocr_processor.extract_prescription(image_data)
+        # Process the image or document pages with OCR
+        try:
+            medications = await _extract_medications(image_data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        if not prescription_data.get("name") and not prescription_data.get("schedule"):
+        if not medications:
             raise HTTPException(
                 status_code=400, 
-                detail="Could not extract medication information from the image. Please try a clearer image or add the reminder manually."
+                detail=NO_PRESCRIPTION_FOUND
             )
 
         # Create the response with extracted data
-        extracted_data = schemas.MedicationOCRExtraction(
-            name=prescription_data.get("name", ""),
-            dosage=prescription_data.get("dosage", ""),
-            schedule=[
-                schemas.MedicationScheduleItem(
-                    datetime=item.get("datetime", ""),
-                    dosage=item.get("dosage", "")
-                ) for item in prescription_data.get("schedule", [])
-            ],
-            interpretation=prescription_data.get("interpretation", "")
-        )
-
-        return schemas.MedicationOCRResponse(
-            extracted_data=extracted_data,
-            total_reminders=len(prescription_data.get("schedule", [])),
-            message="Medication information extracted successfully. Please review and approve to save."
-        )
+        return _prescription_response(medications)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing prescription image: {str(e)}"
         )
 
+async def _run_prescription_job(job: models.OCRJob, db: Session) -> dict:
+    """Background version of /reminders/upload-prescription; the job result is the extraction."""
+    medications = await _extract_medications(job.image)
+    if not medications:
+        raise ValueError(NO_PRESCRIPTION_FOUND)
+    return _prescription_response(medications).model_dump(mode="json")
+
+ocr_job_queue.register("prescription", _run_prescription_job)
+
 class SaveOCRRemindersRequest(BaseModel):
     user_id: int
     extracted_data: schemas.MedicationOCRExtraction
@@ -186,7 +273,7 @@ def save_ocr_reminders(
         raise HTTPException(status_code=404, detail="User not found")
 
     try:
-        saved_reminders = []
+        schedule = []
 
         for schedule_item in extracted_data.schedule:
             # Parse the datetime string
@@ -210,12 +297,37 @@ def save_ocr_reminders(
                     detail=f"Invalid datetime format: '{schedule_item.datetime}'. Error: {str(e)}"
                 )
 
+            schedule.append((schedule_datetime, schedule_item.dosage))
+
+        # An approved schedule that still follows its dosing rule is saved as
+        # one recurring reminder; edited schedules are saved dose by dose
+        rule = extracted_data.rule and RecurringReminderService.fixed_rule(extracted_data.rule)
+        if rule and schedule and list(expand_schedule(rule, schedule[0][0])) == schedule:
+            series = RecurringReminderService.create_series(
+                db, user_id, "medication", rule, schedule[0][0],
+                name=extracted_data.name, dosage=extracted_data.dosage, notes=notes
+            )
+            db.commit()
+            db.refresh(series)
+            reminder_dispatcher.series_changed(series.id)
+
+            return {
+                "message": f"Successfully saved {len(schedule)} medication reminders",
+                "series_id": series.id,
+                "reminders": [
+                    schemas.MedicationReminder.model_validate(RecurringReminderService.occurrence(series, schedule_datetime))
+                    for schedule_datetime, _ in schedule
+                ]
+            }
+
+        saved_reminders = []
+        for schedule_datetime, schedule_dosage in schedule:
             db_reminder = models.MedicationReminder(
                 user_id=user_id,
                 name=extracted_data.name,
                 dosage=extracted_data.dosage,
                 schedule_datetime=schedule_datetime,
-                schedule_dosage=schedule_item.dosage,
+                schedule_dosage=schedule_dosage,
                 notes=notes
             )
             db.add(db_reminder)
@@ -226,12 +338,15 @@ def save_ocr_reminders(
         # Refresh all saved reminders
         for reminder in saved_reminders:
             db.refresh(reminder)
+            reminder_dispatcher.reminder_changed("medication", reminder.id)
 
         return {
             "message": f"Successfully saved {len(saved_reminders)} medication reminders",
             "reminders": [schemas.MedicationReminder.model_validate(reminder) for reminder in saved_reminders]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -252,6 +367,7 @@ def mark_reminder_taken(
     db_reminder.is_taken = True
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("medication", db_reminder.id)
     
     return {"message": "Reminder marked as taken", "reminder": schemas.MedicationReminder.model_validate(db_reminder)}
 
@@ -261,7 +377,10 @@ def get_upcoming_reminders(
     hours: int = 24,
     db: Session = Depends(get_db)
 ):
-    """Get upcoming medication reminders for a user within the specified hours."""
+    """
+    Get upcoming medication reminders for a user within the specified hours,
+    including the pending occurrences of recurring medication reminders.
+    """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -277,9 +396,233 @@ def get_upcoming_reminders(
         models.MedicationReminder.schedule_datetime >= now,
         models.MedicationReminder.schedule_datetime <= future_time
     ).order_by(models.MedicationReminder.schedule_datetime).all()
+    occurrences = RecurringReminderService.get_occurrences(
+        db, user_id, "medication", now, future_time, include_done=False
+    )
+    reminders = sorted(reminders + occurrences, key=lambda reminder: reminder.schedule_datetime)
 
     return {"upcoming_reminders": [schemas.MedicationReminder.model_validate(reminder) for reminder in reminders]}
 
+@router.get("/adherence/{user_id}", tags=["Medication Reminders"])
+def get_medication_adherence(user_id: int, db: Session = Depends(get_db)):
+    """
+    Get the doses scheduled and taken per medication, counting the
+    occurrences of recurring medication reminders as well as reminder rows.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    counts = {}
+    rows = db.query(
+        models.MedicationReminder.name,
+        func.count(models.MedicationReminder.id),
+        func.sum(case((models.MedicationReminder.is_taken == True, 1), else_=0))
+    ).filter(models.MedicationReminder.user_id == user_id).group_by(models.MedicationReminder.name)
+    for name, total, taken in rows:
+        counts[name] = [total, taken or 0]
+    for series, total, taken in RecurringReminderService.count_occurrences(db, user_id, "medication"):
+        entry = counts.setdefault(series.name, [0, 0])
+        entry[0] += total
+        entry[1] += taken
+
+    return {"adherence": [
+        {
+            "name": name,
+            "total_doses": total,
+            "taken_doses": taken,
+            "adherence_percentage": taken / total * 100 if total else 0.0
+        }
+        for name, (total, taken) in sorted(counts.items())
+    ]}
+
+# ===== REMINDER TIMELINE =====
+
+@router.get("/timeline/{user_id}", response_model=List[schemas.ReminderTimelineItem], tags=["Reminder Timeline"])
+def get_reminder_timeline(
+    user_id: int,
+    response: Response,
+    hours: int = Query(24, ge=1, le=24 * 366, description="How far ahead to look"),
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    include_completed: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Get everything due for a user in the next `hours` hours: medication doses,
+    BP checks, doctor appointments and workouts, merged in time order and
+    tagged with their type.
+
+    The four reminder tables are read in one UNION ALL query. Pages are
+    continued with the cursor from the X-Next-Cursor header.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    now = datetime.utcnow()
+    items, next_cursor = ReminderTimelineService.get_timeline(
+        db, user_id, now, now + timedelta(hours=hours), after, limit, include_completed
+    )
+    set_next_cursor(response, next_cursor)
+    return items
+
+@router.get("/stream/{user_id}", tags=["Reminder Timeline"])
+async def stream_due_reminders(user_id: int, db: Session = Depends(get_db)):
+    """
+    Server-sent events stream of a user's reminders as they come due.
+
+    Each event is a "reminder" with a DueReminder as data. Requires the
+    reminder dispatcher to run in this process with the "sse" sink.
+    """
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not reminder_dispatcher.running or sse_sink not in reminder_dispatcher.sinks:
+        raise HTTPException(status_code=503, detail="Reminder streaming is not enabled")
+
+    async def events():
+        queue = sse_sink.subscribe(user_id)
+        try:
+            while True:
+                try:
+                    reminder = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: reminder\ndata: {json.dumps(reminder)}\n\n"
+        finally:
+            sse_sink.unsubscribe(user_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# ===== BULK REMINDER CHANGES =====
+
+def apply_bulk_change(
+    db: Session,
+    selection: schemas.BulkReminderSelection,
+    action: str,
+    shift_minutes: Optional[int] = None
+) -> schemas.BulkReminderResult:
+    """Validate a bulk selection, apply the action and notify the dispatcher of every change."""
+    # Verify the user exists
+    user = db.query(models.User).filter(models.User.id == selection.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if selection.ids is not None and selection.type is None:
+        raise HTTPException(status_code=400, detail="type is required when selecting reminders by ids")
+    if selection.ids is None and selection.start is None and selection.end is None and not selection.all:
+        raise HTTPException(
+            status_code=400,
+            detail="Select reminders by ids, start or end, or set all to change every reminder of the type(s)"
+        )
+
+    try:
+        change = BulkReminderService.apply(db, selection, action, shift_minutes)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error changing reminders: {str(e)}")
+
+    for reminder_type, reminder_ids in change.reminder_ids.items():
+        for reminder_id in reminder_ids:
+            reminder_dispatcher.reminder_changed(reminder_type, reminder_id)
+    for series_id in change.series_ids:
+        reminder_dispatcher.series_changed(series_id)
+
+    return schemas.BulkReminderResult(
+        counts=change.counts,
+        occurrences=change.occurrences,
+        total=sum(change.counts.values()) + sum(change.occurrences.values())
+    )
+
+@router.post("/bulk/complete", response_model=schemas.BulkReminderResult, tags=["Bulk Reminder Changes"])
+def bulk_complete_reminders(selection: schemas.BulkReminderSelection, db: Session = Depends(get_db)):
+    """
+    Mark many reminders taken/completed at once, e.g. all of today's doses.
+
+    Selects a user's reminders by type, ids and/or due window; each reminder
+    table is changed with one UPDATE, all in one transaction. Occurrences of
+    recurring reminders in the window are marked done.
+    """
+    return apply_bulk_change(db, selection, "complete")
+
+@router.post("/bulk/delete", response_model=schemas.BulkReminderResult, tags=["Bulk Reminder Changes"])
+def bulk_delete_reminders(selection: schemas.BulkReminderSelection, db: Session = Depends(get_db)):
+    """
+    Delete many reminders at once, taken/completed ones included.
+
+    Each reminder table is changed with one DELETE, all in one transaction.
+    Occurrences of recurring reminders in the window are skipped; the series
+    themselves are kept.
+    """
+    return apply_bulk_change(db, selection, "delete")
+
+@router.post("/bulk/reschedule", response_model=schemas.BulkReminderResult, tags=["Bulk Reminder Changes"])
+def bulk_reschedule_reminders(request: schemas.BulkReminderReschedule, db: Session = Depends(get_db)):
+    """
+    Move many pending reminders by shift_minutes at once.
+
+    Each reminder table is changed with one UPDATE, all in one transaction.
+    Occurrences of recurring reminders in the window are snoozed to their
+    shifted time.
+    """
+    return apply_bulk_change(db, request, "reschedule", request.shift_minutes)
+
+# ===== RECURRING REMINDERS =====
+
+@router.get("/series/{series_id}", response_model=schemas.ReminderSeries, tags=["Recurring Reminders"])
+def get_reminder_series(series_id: int, db: Session = Depends(get_db)):
+    """Get a recurring reminder (a saved prescription or BP check schedule) and its rule."""
+    series = db.query(models.ReminderSeries).filter(models.ReminderSeries.id == series_id).first()
+    if not series:
+        raise HTTPException(status_code=404, detail="Reminder series not found")
+    return series
+
+@router.post("/series/{series_id}/occurrences", tags=["Recurring Reminders"])
+def update_reminder_occurrence(
+    series_id: int,
+    update: schemas.ReminderOccurrenceUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Mark one occurrence of a recurring reminder as done (taken/completed),
+    snoozed until snoozed_until, skipped, or pending again.
+    """
+    series = db.query(models.ReminderSeries).filter(models.ReminderSeries.id == series_id).first()
+    if not series:
+        raise HTTPException(status_code=404, detail="Reminder series not found")
+    if not RecurringReminderService.is_occurrence(series, update.occurrence_datetime):
+        raise HTTPException(status_code=400, detail="The series has no occurrence at occurrence_datetime")
+    if update.status == "snoozed" and update.snoozed_until is None:
+        raise HTTPException(status_code=400, detail="snoozed_until is required when snoozing")
+
+    occurrence = RecurringReminderService.set_occurrence_status(
+        db, series, update.occurrence_datetime,
+        None if update.status == "pending" else update.status,
+        update.snoozed_until
+    )
+    reminder_dispatcher.series_changed(series.id)
+    reminder_schema = schemas.MedicationReminder if series.kind == "medication" else schemas.BPCheckReminder
+    return {
+        "message": f"Occurrence marked as {update.status}",
+        "reminder": reminder_schema.model_validate(occurrence)
+    }
+
+@router.delete("/series/{series_id}", tags=["Recurring Reminders"])
+def delete_reminder_series(series_id: int, db: Session = Depends(get_db)):
+    """Delete a recurring reminder with all its occurrences."""
+    series = db.query(models.ReminderSeries).filter(models.ReminderSeries.id == series_id).first()
+    if not series:
+        raise HTTPException(status_code=404, detail="Reminder series not found")
+
+    db.delete(series)
+    db.commit()
+    reminder_dispatcher.series_changed(series_id)
+    return {"message": "Reminder series deleted successfully"}
+
 # ===== BLOOD PRESSURE CHECK REMINDERS =====
 
 @router.post("/bp-reminder/", response_model=schemas.BPCheckReminder, tags=["BP Check Reminders"])
@@ -303,6 +646,7 @@ def create_bp_reminder(
     db.add(db_reminder)
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("bp_check", db_reminder.id)
     return schemas.BPCheckReminder.model_validate(db_reminder)
 
 @router.get("/bp-reminder/{reminder_id}", response_model=schemas.BPCheckReminder, tags=["BP Check Reminders"])
@@ -334,6 +678,7 @@ def update_bp_reminder(
 
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("bp_check", db_reminder.id)
     return schemas.BPCheckReminder.model_validate(db_reminder)
 
 @router.delete("/bp-reminder/{reminder_id}", tags=["BP Check Reminders"])
@@ -345,6 +690,7 @@ def delete_bp_reminder(reminder_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_reminder)
     db.commit()
+    reminder_dispatcher.reminder_changed("bp_check", reminder_id)
     return {"message": "BP check reminder deleted successfully"}
 
 @router.post("/bp-schedule", response_model=schemas.BPReminderScheduleResponse, tags=["BP Check Reminders"])
@@ -376,6 +722,8 @@ def generate_bp_reminder_schedule(
             preferred_evening_time=request.preferred_evening_time,
             db=db
         )
+        if result.get("series_id"):
+            reminder_dispatcher.series_changed(result["series_id"])
 
         # Convert to response schema
         return schemas.BPReminderScheduleResponse(
@@ -383,6 +731,7 @@ def generate_bp_reminder_schedule(
             category_description=result["category_description"],
             total_reminders=result["total_reminders"],
             advice=result.get("advice"),
+            series_id=result.get("series_id"),
             reminders=[schemas.BPCheckReminder.model_validate(r) for r in result["reminders"]]
         )
 
@@ -395,12 +744,17 @@ def generate_bp_reminder_schedule(
 @router.get("/bp-reminders/{user_id}", response_model=List[schemas.BPCheckReminder], tags=["BP Check Reminders"])
 def get_user_bp_reminders(
     user_id: int,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
     include_completed: bool = True,
     db: Session = Depends(get_db)
 ):
-    """Get all BP check reminders for a user."""
+    """
+    Get all BP check reminders for a user, including the occurrences of
+    generated BP check schedules (with series_id set and id null).
+    """
     # Verify the user exists
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -411,7 +765,11 @@ def get_user_bp_reminders(
     if not include_completed:
         query = query.filter(models.BPCheckReminder.is_completed == False)
 
-    reminders = query.order_by(models.BPCheckReminder.reminder_datetime).offset(skip).limit(limit).all()
+    reminders, next_cursor = RecurringReminderService.paginate_with_occurrences(
+        db, query, [models.BPCheckReminder.reminder_datetime, models.BPCheckReminder.id],
+        user_id, "bp_check", after, limit, skip=skip, include_done=include_completed
+    )
+    set_next_cursor(response, next_cursor)
     return [schemas.BPCheckReminder.model_validate(reminder) for reminder in reminders]
 
 @router.post("/bp-reminder/{reminder_id}/complete", tags=["BP Check Reminders"])
@@ -423,6 +781,7 @@ def mark_bp_reminder_completed(
     reminder = BPReminderService.mark_bp_reminder_completed(reminder_id, db)
     if not reminder:
         raise HTTPException(status_code=404, detail="BP reminder not found")
+    reminder_dispatcher.reminder_changed("bp_check", reminder.id)
 
     return {
         "message": "BP check reminder marked as completed",
@@ -505,13 +864,16 @@ def create_doctor_appointment_reminder(
     db.add(db_reminder)
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("doctor_appointment", db_reminder.id)
     return schemas.DoctorAppointmentReminder.model_validate(db_reminder)
 
 @router.get("/doctor-appointments/{user_id}", response_model=List[schemas.DoctorAppointmentReminder], tags=["Doctor Appointment Reminders"])
 def get_user_doctor_appointments(
     user_id: int,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
     include_completed: bool = True,
     db: Session = Depends(get_db)
 ):
@@ -526,7 +888,10 @@ def get_user_doctor_appointments(
     if not include_completed:
         query = query.filter(models.DoctorAppointmentReminder.is_completed == False)
 
-    appointments = query.order_by(models.DoctorAppointmentReminder.appointment_datetime).offset(skip).limit(limit).all()
+    appointments, next_cursor = keyset_paginate(
+        query, [models.DoctorAppointmentReminder.appointment_datetime, models.DoctorAppointmentReminder.id], after, limit, skip=skip
+    )
+    set_next_cursor(response, next_cursor)
     return [schemas.DoctorAppointmentReminder.model_validate(appointment) for appointment in appointments]
 
 @router.get("/doctor-appointment/{reminder_id}", response_model=schemas.DoctorAppointmentReminder, tags=["Doctor Appointment Reminders"])
@@ -562,6 +927,7 @@ def update_doctor_appointment_reminder(
 
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("doctor_appointment", db_reminder.id)
     return schemas.DoctorAppointmentReminder.model_validate(db_reminder)
 
 @router.delete("/doctor-appointment/{reminder_id}", tags=["Doctor Appointment Reminders"])
@@ -573,6 +939,7 @@ def delete_doctor_appointment_reminder(reminder_id: int, db: Session = Depends(g
 
     db.delete(db_reminder)
     db.commit()
+    reminder_dispatcher.reminder_changed("doctor_appointment", reminder_id)
     return {"message": "Doctor appointment reminder deleted successfully"}
 
 @router.post("/doctor-appointment/{reminder_id}/complete", tags=["Doctor Appointment Reminders"])
@@ -588,6 +955,7 @@ def mark_doctor_appointment_completed(
     db_reminder.is_completed = True
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("doctor_appointment", db_reminder.id)
 
     return {
         "message": "Doctor appointment marked as completed",
@@ -619,13 +987,16 @@ def create_workout_reminder(
     db.add(db_reminder)
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("workout", db_reminder.id)
     return schemas.WorkoutReminder.model_validate(db_reminder)
 
 @router.get("/workouts/{user_id}", response_model=List[schemas.WorkoutReminder], tags=["Workout Reminders"])
 def get_user_workouts(
     user_id: int,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
     include_completed: bool = True,
     db: Session = Depends(get_db)
 ):
@@ -640,7 +1011,10 @@ def get_user_workouts(
     if not include_completed:
         query = query.filter(models.WorkoutReminder.is_completed == False)
 
-    workouts = query.order_by(models.WorkoutReminder.workout_datetime).offset(skip).limit(limit).all()
+    workouts, next_cursor = keyset_paginate(
+        query, [models.WorkoutReminder.workout_datetime, models.WorkoutReminder.id], after, limit, skip=skip
+    )
+    set_next_cursor(response, next_cursor)
     return [schemas.WorkoutReminder.model_validate(workout) for workout in workouts]
 
 @router.get("/workout/{reminder_id}", response_model=schemas.WorkoutReminder, tags=["Workout Reminders"])
@@ -676,6 +1050,7 @@ def update_workout_reminder(
 
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("workout", db_reminder.id)
     return schemas.WorkoutReminder.model_validate(db_reminder)
 
 @router.delete("/workout/{reminder_id}", tags=["Workout Reminders"])
@@ -687,6 +1062,7 @@ def delete_workout_reminder(reminder_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_reminder)
     db.commit()
+    reminder_dispatcher.reminder_changed("workout", reminder_id)
     return {"message": "Workout reminder deleted successfully"}
 
 @router.post("/workout/{reminder_id}/complete", tags=["Workout Reminders"])
@@ -702,6 +1078,7 @@ def mark_workout_completed(
     db_reminder.is_completed = True
     db.commit()
     db.refresh(db_reminder)
+    reminder_dispatcher.reminder_changed("workout", db_reminder.id)
 
     return {
         "message": "Workout marked as completed",
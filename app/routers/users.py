@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from .. import models, schemas
 from ..database import get_db
+from ..pagination import keyset_paginate, set_next_cursor
 from passlib.context import CryptContext
 
 router = APIRouter(
@@ -46,8 +47,15 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.get("/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = db.query(models.User).order_by(models.User.id).offset(skip).limit(limit).all()
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    users, next_cursor = keyset_paginate(db.query(models.User), [models.User.id], after, limit, skip=skip)
+    set_next_cursor(response, next_cursor)
     return users
 
 @router.get("/{user_id}", response_model=schemas.User)
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime
+
+from .dosing_schedule import DosingRule
 
 # User schemas
 class UserBase(BaseModel):
@@ -47,10 +49,60 @@ class BloodPressure(BloodPressureBase):
     id: int
     user_id: int
     reading_time: datetime
+    category: Optional[int] = None  # BP category code; interpretation is its label
 
     class Config:
         from_attributes = True
 
+# Batch ingestion schemas (offline device/app sync)
+MAX_BATCH_READINGS = 5000
+
+class BloodPressureBatchItem(BloodPressureCreate):
+    reading_time: Optional[datetime] = None  # When the reading was taken; defaults to the time of upload
+
+class BloodPressureBatchCreate(BaseModel):
+    readings: List[BloodPressureBatchItem] = Field(max_length=MAX_BATCH_READINGS)
+
+class BloodPressureBatchItemResult(BaseModel):
+    index: int  # Position of the reading in the request
+    status: str  # "accepted" or "rejected"
+    id: Optional[int] = None
+    interpretation: Optional[str] = None
+    error: Optional[str] = None
+
+class BloodPressureBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[BloodPressureBatchItemResult]
+
+# Multi-image OCR upload schemas
+class BPImageBatchItemResult(BloodPressureBatchItemResult):
+    filename: Optional[str] = None
+    systolic: Optional[int] = None  # Extracted values, also returned for rejected images
+    diastolic: Optional[int] = None
+    pulse: Optional[int] = None
+
+class BPImageBatchResponse(BloodPressureBatchResponse):
+    results: List[BPImageBatchItemResult]
+
+# Downsampled reading series schemas (charts)
+class BPSeriesValue(BaseModel):
+    mean: Optional[float] = None
+    min: Optional[int] = None
+    max: Optional[int] = None
+
+class BPSeriesPoint(BaseModel):
+    bucket_start: date
+    count: int
+    systolic: BPSeriesValue
+    diastolic: BPSeriesValue
+    pulse: BPSeriesValue
+
+class BPSeriesResponse(BaseModel):
+    user_id: int
+    bucket: str
+    points: List[BPSeriesPoint]
+
 # Device Upload schema for future OCR implementation
 class DeviceImageUpload(BaseModel):
     image_data: str  # Base64 encoded image
@@ -108,10 +160,12 @@ class MedicationReminderUpdate(BaseModel):
     notes: Optional[str] = None
 
 class MedicationReminder(MedicationReminderBase):
-    id: int
+    id: Optional[int] = None  # None for occurrences of a reminder series
     user_id: int
     is_taken: bool
     created_at: datetime
+    series_id: Optional[int] = None  # Set for occurrences of a reminder series
+    occurrence_datetime: Optional[datetime] = None  # Scheduled time, identifies the occurrence within its series
 
     class Config:
         from_attributes = True
@@ -125,13 +179,93 @@ class MedicationOCRExtraction(BaseModel):
     dosage: str = Field(description="The composition or strength of the medication")
     schedule: List[MedicationScheduleItem] = Field(description="List of scheduled doses with datetime and dosage")
     interpretation: str = Field(description="Explanation of what was observed in the image and how the prescription information was interpreted")
+    rule: Optional[DosingRule] = Field(None, description="Dosing rule the schedule was expanded from; saved as a recurring reminder")
 
 class MedicationOCRResponse(BaseModel):
     """Response from OCR extraction with extracted data and approval status."""
-    extracted_data: MedicationOCRExtraction
+    extracted_data: MedicationOCRExtraction  # First medication found
+    medications: List[MedicationOCRExtraction] = []  # Every medication found, e.g. across the pages of a PDF
     total_reminders: int
     message: str
 
+# Reminder timeline schemas
+class ReminderTimelineItem(BaseModel):
+    type: str  # "bp_check", "doctor_appointment", "medication" or "workout"
+    id: Optional[int] = None  # ID in the reminder's own table, None for occurrences of a reminder series
+    due_at: datetime
+    title: str  # Medication name, doctor name, workout type, or "Blood pressure check"
+    detail: Optional[str] = None  # Dose, appointment type or BP category
+    location: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    completed: bool
+    notes: Optional[str] = None
+    series_id: Optional[int] = None
+    occurrence_datetime: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Reminder dispatch schemas
+class DueReminder(ReminderTimelineItem):
+    """A reminder that has come due, as sent to the notification sinks."""
+    user_id: int
+
+# Recurring reminder schemas
+class ReminderSeries(BaseModel):
+    id: int
+    user_id: int
+    kind: str  # "medication" or "bp_check"
+    name: Optional[str] = None
+    dosage: Optional[str] = None
+    bp_category: Optional[str] = None
+    rule: DosingRule
+    start_datetime: datetime
+    end_datetime: datetime
+    notes: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ReminderOccurrenceUpdate(BaseModel):
+    occurrence_datetime: datetime  # Scheduled time of the occurrence
+    status: Literal["done", "snoozed", "skipped", "pending"]  # "pending" clears an earlier status
+    snoozed_until: Optional[datetime] = None  # Required when snoozing
+
+# Bulk reminder change schemas
+MAX_BULK_REMINDER_IDS = 1000
+
+class BulkReminderSelection(BaseModel):
+    user_id: int
+    type: Optional[Literal["medication", "bp_check", "doctor_appointment", "workout"]] = None  # None selects every type
+    ids: Optional[List[int]] = Field(None, max_length=MAX_BULK_REMINDER_IDS)  # Rows of type's table; requires type
+    start: Optional[datetime] = None  # Due at or after
+    end: Optional[datetime] = None  # Due at or before
+    all: bool = False  # Required to select every reminder of the type(s) without ids or a window
+
+class BulkReminderReschedule(BulkReminderSelection):
+    shift_minutes: int  # Moves the reminders later, or earlier when negative
+
+class BulkReminderResult(BaseModel):
+    counts: Dict[str, int]  # Reminder rows changed per type
+    occurrences: Dict[str, int]  # Recurring reminder occurrences changed per type
+    total: int
+
+# Background OCR job schemas
+class OCRJob(BaseModel):
+    id: str
+    kind: str  # "bp_upload" or "prescription"
+    user_id: int
+    status: str  # "queued", "running", "succeeded" or "failed"
+    result: Optional[dict] = None  # BloodPressure for bp_upload, MedicationOCRResponse for prescription
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # BP Check Reminder schemas
 class BPCheckReminderBase(BaseModel):
     reminder_datetime: datetime
@@ -146,11 +280,13 @@ class BPCheckReminderUpdate(BaseModel):
     notes: Optional[str] = None
 
 class BPCheckReminder(BPCheckReminderBase):
-    id: int
+    id: Optional[int] = None  # None for occurrences of a reminder series
     user_id: int
     bp_category: str
     is_completed: bool
     created_at: datetime
+    series_id: Optional[int] = None  # Set for occurrences of a reminder series
+    occurrence_datetime: Optional[datetime] = None  # Scheduled time, identifies the occurrence within its series
 
     class Config:
         from_attributes = True
@@ -169,6 +305,7 @@ class BPReminderScheduleResponse(BaseModel):
     category_description: str
     total_reminders: int
     advice: Optional[str] = None
+    series_id: Optional[int] = None  # Recurring reminder the schedule was saved as
     reminders: List[BPCheckReminder]
 
 # Doctor Appointment Reminder schemas
@@ -0,0 +1,405 @@
+from io import BytesIO
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+
+from .lcd_crop import detect_display
+
+# Long side the photo is decoded at for display detection, and height of the
+# display crop the digits are read from
+DECODE_SIDE = 800
+READ_HEIGHT = 300
+
+# Crop to the detected display only above this detection confidence
+MIN_CROP_CONFIDENCE = 0.5
+
+# Segments in a-g order: top, upper right, lower right, bottom, lower left, upper left, middle
+SEGMENT_PATTERNS = {
+    0: (1, 1, 1, 1, 1, 1, 0),
+    1: (0, 1, 1, 0, 0, 0, 0),
+    2: (1, 1, 0, 1, 1, 0, 1),
+    3: (1, 1, 1, 1, 0, 0, 1),
+    4: (0, 1, 1, 0, 0, 1, 1),
+    5: (1, 0, 1, 1, 0, 1, 1),
+    6: (1, 0, 1, 1, 1, 1, 1),
+    7: (1, 1, 1, 0, 0, 0, 0),
+    8: (1, 1, 1, 1, 1, 1, 1),
+    9: (1, 1, 1, 1, 0, 1, 1),
+}
+
+# Where each segment is sampled, as (x0, x1, y0, y1) fractions of the digit box
+SEGMENT_REGIONS = (
+    (0.3, 0.7, 0.0, 0.15),    # a
+    (0.7, 1.0, 0.15, 0.42),   # b
+    (0.7, 1.0, 0.58, 0.85),   # c
+    (0.3, 0.7, 0.85, 1.0),    # d
+    (0.0, 0.3, 0.58, 0.85),   # e
+    (0.0, 0.3, 0.15, 0.42),   # f
+    (0.3, 0.7, 0.42, 0.58),   # g
+)
+
+# Share of a sample region a lit segment is expected to cover
+ON_FILL = 0.4
+
+# Digit boxes narrower than this share of their height are read as "1"
+ONE_WIDTH_RATIO = 0.35
+
+# Digits shorter than this many pixels are too small to sample reliably
+MIN_DIGIT_PIXELS = 16
+
+# Blobs shorter than this share of the tallest blob in their line are labels or icons
+MIN_DIGIT_HEIGHT_RATIO = 0.6
+
+# Digits further apart than this share of the line height are not one number
+# (a "1" sits at the right of its cell, so its gap is about a digit width)
+MAX_DIGIT_GAP_RATIO = 1.0
+
+# Digit lines shorter than this share of the tallest line are ignored
+MIN_LINE_HEIGHT_RATIO = 0.3
+
+# Foreground filling more than this share of its bounding box is a solid
+# panel rather than digits; the panel is then binarized again on its own
+SOLID_FILL = 0.6
+
+# Tilts tried when straightening the display, in degrees
+SKEW_ANGLES = tuple(range(-6, 7))
+
+# Column groups further apart than this many stroke widths are separate
+# things (the digits vs. a panel edge or icon at the side)
+COLUMN_GAP_STROKES = 6
+
+# Row bands closer than this many stroke widths belong to the same line
+# (the gap between the upper and lower segments of a "7" or "1")
+LINE_GAP_STROKES = 1.0
+
+# Plausible ranges for each displayed value
+SYSTOLIC_RANGE = (60, 260)
+DIASTOLIC_RANGE = (30, 160)
+PULSE_RANGE = (30, 220)
+
+
+class SevenSegmentReading(NamedTuple):
+    systolic: int
+    diastolic: int
+    pulse: int
+    confidence: float  # 0-1, lowest digit match score
+
+
+def _otsu_threshold(gray: np.ndarray) -> float:
+    """Gray level that best separates the histogram into two classes."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    total_weight, total_mean = weights[-1], means[-1]
+
+    background = weights[:-1]
+    foreground = total_weight - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(255)
+    between[valid] = (
+        (total_mean * background[valid] - means[:-1][valid] * total_weight) ** 2
+        / (background[valid] * foreground[valid])
+    )
+    return float(np.argmax(between))
+
+
+def _runs(mask: np.ndarray, max_gap: int = 0) -> List[Tuple[int, int]]:
+    """[start, end) runs of True values, joining runs separated by at most max_gap."""
+    runs = []
+    start = None
+    for index, value in enumerate(mask):
+        if value and start is None:
+            start = index
+        elif not value and start is not None:
+            runs.append([start, index])
+            start = None
+    if start is not None:
+        runs.append([start, len(mask)])
+
+    merged = []
+    for run in runs:
+        if merged and run[0] - merged[-1][1] <= max_gap:
+            merged[-1][1] = run[1]
+        else:
+            merged.append(run)
+    return [tuple(run) for run in merged]
+
+
+def _clear_border(binary: np.ndarray) -> np.ndarray:
+    """
+    Clear foreground runs that start at the image border.
+
+    A loose display crop can include bright background or parts of the
+    device case along its edges; those touch the border, digits do not.
+    Runs are scanned along rows and columns from all four sides, so most
+    border-connected shapes are removed without a connected-component pass.
+    """
+    binary = binary.copy()
+    for _ in range(2):
+        for axis in (0, 1):
+            binary &= ~np.logical_and.accumulate(binary, axis=axis)
+            flipped = np.flip(binary, axis=axis)
+            binary &= ~np.flip(np.logical_and.accumulate(flipped, axis=axis), axis=axis)
+    return binary
+
+
+def _deskew(binary: np.ndarray) -> np.ndarray:
+    """
+    Undo a slight tilt of the photo so each line of digits is level.
+
+    Each candidate tilt is scored by how sharply the top edges of the
+    segments concentrate into rows (sum of squared row counts); the best one
+    is undone by shifting each column vertically.
+    """
+    top_edges = np.zeros_like(binary)
+    top_edges[1:] = binary[1:] & ~binary[:-1]
+    top_edges[0] = binary[0]
+    edge_ys, edge_xs = np.nonzero(top_edges)
+    if not len(edge_ys):
+        return binary
+
+    def shifts(angle: float) -> np.ndarray:
+        return np.round(np.arange(binary.shape[1]) * np.tan(np.radians(angle))).astype(int)
+
+    def sharpness(angle: float) -> float:
+        rows = edge_ys - shifts(angle)[edge_xs]
+        counts = np.bincount(rows - rows.min())
+        return float(np.dot(counts, counts))
+
+    best = max(SKEW_ANGLES, key=lambda angle: (sharpness(angle), -abs(angle)))
+    if best == 0:
+        return binary
+
+    ys, xs = np.nonzero(binary)
+    column_shifts = shifts(best)
+    column_shifts -= column_shifts.min()
+    straightened = np.zeros((binary.shape[0] + column_shifts.max(), binary.shape[1]), dtype=bool)
+    straightened[ys - column_shifts[xs] + column_shifts.max(), xs] = True
+    return straightened
+
+
+def _despeckle(binary: np.ndarray) -> np.ndarray:
+    """Morphological opening with a 2x2 square: drops specks and hairlines thinner than the segments."""
+    eroded = binary[:-1, :-1] & binary[1:, :-1] & binary[:-1, 1:] & binary[1:, 1:]
+    opened = np.zeros_like(binary)
+    opened[:-1, :-1] |= eroded
+    opened[1:, :-1] |= eroded
+    opened[:-1, 1:] |= eroded
+    opened[1:, 1:] |= eroded
+    return opened
+
+
+def _vertical_runs(binary: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Column, start row and end row of every vertical run of True pixels."""
+    padded = np.pad(binary.T, ((0, 0), (1, 1))).astype(np.int8)
+    steps = np.diff(padded, axis=1)
+    starts = np.argwhere(steps == 1)
+    ends = np.argwhere(steps == -1)
+    return starts[:, 0], starts[:, 1], ends[:, 1]
+
+
+def _stroke_width(binary: np.ndarray) -> int:
+    """Typical segment thickness: the median length of horizontal runs."""
+    _, starts, ends = _vertical_runs(binary.T)
+    if not len(starts):
+        return 1
+    return max(1, int(np.median(ends - starts)))
+
+
+def _binarize(gray: np.ndarray) -> np.ndarray:
+    """
+    Otsu binarization with lit pixels True. Lit segments are taken to be the
+    minority class, so both dark-on-light LCDs and light-on-dark LEDs work.
+    """
+    binary = gray <= _otsu_threshold(gray)
+    if binary.mean() > 0.5:
+        binary = ~binary
+    return _clear_border(binary)
+
+
+def _solid_panel(binary: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """
+    (top, bottom, left, right) of the largest foreground block if it is solid
+    rather than made of digit strokes, else None.
+    """
+    row_runs = _runs(binary.any(axis=1))
+    if not row_runs:
+        return None
+    top, bottom = max(row_runs, key=lambda run: run[1] - run[0])
+    left, right = max(_runs(binary[top:bottom].any(axis=0)), key=lambda run: run[1] - run[0])
+    if binary[top:bottom, left:right].mean() <= SOLID_FILL:
+        return None
+    return top, bottom, left, right
+
+
+def classify_digit(cell: np.ndarray) -> Tuple[int, float]:
+    """
+    Match a binary digit image against the seven-segment templates.
+
+    Returns the best digit and its score: the mean agreement of the sampled
+    segments with that digit's pattern, lowered when a second digit matches
+    almost as well.
+    """
+    height, width = cell.shape
+    if width < height * ONE_WIDTH_RATIO:
+        # Only the right-hand segments are lit, so the box is just that column
+        halves = [cell[: height // 2].mean(), cell[height // 2:].mean()]
+        return 1, float(min(1.0, min(halves) / ON_FILL))
+
+    lit = []
+    for x0, x1, y0, y1 in SEGMENT_REGIONS:
+        region = cell[int(y0 * height):max(int(y1 * height), int(y0 * height) + 1),
+                      int(x0 * width):max(int(x1 * width), int(x0 * width) + 1)]
+        lit.append(min(1.0, region.mean() / ON_FILL))
+    lit = np.array(lit)
+
+    scores = {
+        digit: float(np.mean(np.where(np.array(pattern) == 1, lit, 1.0 - lit)))
+        for digit, pattern in SEGMENT_PATTERNS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    # A near tie means a segment is ambiguous
+    margin_penalty = max(0.0, 0.1 - (best_score - second_score))
+    return best, max(0.0, best_score - margin_penalty)
+
+
+def _read_line(binary: np.ndarray, stroke: int) -> Optional[Tuple[int, float]]:
+    """Read the number shown in one line of digits. Returns (value, confidence)."""
+    height = binary.shape[0]
+    columns = binary.any(axis=0)
+    blobs = []
+    for left, right in _runs(columns, max_gap=max(1, height // 30)):
+        rows = np.flatnonzero(binary[:, left:right].any(axis=1))
+        blobs.append([left, right, rows[0], rows[-1] + 1])
+    if not blobs:
+        return None
+
+    tallest = max(bottom - top for _, _, top, bottom in blobs)
+    if tallest < MIN_DIGIT_PIXELS:
+        return None
+    is_digit = [bottom - top >= tallest * MIN_DIGIT_HEIGHT_RATIO for _, _, top, bottom in blobs]
+
+    # A short fragment within a stroke width of a digit is part of it (the
+    # top bar of a "7" can come apart from its right-hand column)
+    for index, blob in enumerate(blobs):
+        if is_digit[index]:
+            continue
+        for neighbour in (index - 1, index + 1):
+            if 0 <= neighbour < len(blobs) and is_digit[neighbour]:
+                other = blobs[neighbour]
+                if max(other[0], blob[0]) - min(other[1], blob[1]) <= stroke:
+                    other[0], other[1] = min(other[0], blob[0]), max(other[1], blob[1])
+                    other[2], other[3] = min(other[2], blob[2]), max(other[3], blob[3])
+                    break
+
+    # Split at wide gaps and keep the widest group, so a stray edge or icon
+    # off to the side is not read as a leading "1"
+    groups = []
+    for blob, digit in zip(blobs, is_digit):
+        if not digit:
+            continue
+        if groups and blob[0] - groups[-1][-1][1] <= tallest * MAX_DIGIT_GAP_RATIO:
+            groups[-1].append(blob)
+        else:
+            groups.append([blob])
+    if not groups:
+        return None
+    digits = max(groups, key=lambda group: sum(right - left for left, right, _, _ in group))
+    if not 2 <= len(digits) <= 3:
+        return None
+
+    value = 0
+    confidence = 1.0
+    for left, right, top, bottom in digits:
+        digit, score = classify_digit(binary[top:bottom, left:right])
+        value = value * 10 + digit
+        confidence = min(confidence, score)
+    return value, confidence
+
+
+def read_binary_display(binary: np.ndarray) -> Optional[SevenSegmentReading]:
+    """
+    Read systolic, diastolic and pulse from a binarized display (True = lit).
+
+    Expects the three values as separate lines of digits, top to bottom, and
+    only looks at the densest group of columns. Lines that do not read as a
+    2-3 digit number (icons, labels, buttons) are skipped. Returns None
+    unless exactly three plausible values are read.
+    """
+    stroke = _stroke_width(binary)
+    column_groups = _runs(binary.any(axis=0), max_gap=stroke * COLUMN_GAP_STROKES)
+    if not column_groups:
+        return None
+    left, right = max(column_groups, key=lambda group: binary[:, group[0]:group[1]].sum())
+    binary = binary[:, left:right]
+
+    rows = binary.mean(axis=1) > 0.01
+    lines = _runs(rows, max_gap=round(stroke * LINE_GAP_STROKES))
+    if not lines:
+        return None
+
+    tallest = max(bottom - top for top, bottom in lines)
+    results = []
+    for top, bottom in lines:
+        if bottom - top < tallest * MIN_LINE_HEIGHT_RATIO:
+            continue
+        result = _read_line(binary[top:bottom], stroke)
+        if result is not None:
+            results.append(result)
+    if len(results) != 3:
+        return None
+
+    (systolic, _), (diastolic, _), (pulse, _) = results
+    confidence = min(score for _, score in results)
+    plausible = (
+        SYSTOLIC_RANGE[0] <= systolic <= SYSTOLIC_RANGE[1]
+        and DIASTOLIC_RANGE[0] <= diastolic <= DIASTOLIC_RANGE[1]
+        and PULSE_RANGE[0] <= pulse <= PULSE_RANGE[1]
+        and systolic > diastolic
+    )
+    if not plausible:
+        return None
+    return SevenSegmentReading(systolic, diastolic, pulse, confidence)
+
+
+def _read_scale(img: Image.Image) -> np.ndarray:
+    """Grayscale pixels of img, shrunk to READ_HEIGHT rows if taller."""
+    if img.height > READ_HEIGHT:
+        img = img.resize((max(1, round(img.width * READ_HEIGHT / img.height)), READ_HEIGHT), Image.BILINEAR)
+    return np.asarray(img)
+
+
+def read_display(image_data: bytes) -> Optional[SevenSegmentReading]:
+    """
+    Read a BP monitor's seven-segment display locally, without a network call.
+
+    The photo is decoded at reduced resolution, cropped to the detected
+    display, binarized with Otsu's threshold and cleared of anything touching
+    the crop border. If the threshold picks out the whole panel (a dark LED
+    panel in a light case), the panel is binarized again on its own. Specks
+    are removed, a slight tilt is straightened and the digits are read line
+    by line. Returns None when the display cannot be read.
+    """
+    img = Image.open(BytesIO(image_data))
+    scale = min(1.0, DECODE_SIDE / max(img.size))
+    img.draft("L", (round(img.width * scale), round(img.height * scale)))
+    img = ImageOps.exif_transpose(img).convert("L")
+    if max(img.size) > DECODE_SIDE:
+        img.thumbnail((DECODE_SIDE, DECODE_SIDE))
+
+    detection = detect_display(img)
+    if detection is not None and detection.confidence >= MIN_CROP_CONFIDENCE:
+        img = img.crop(detection.box)
+
+    gray = _read_scale(img)
+    binary = _binarize(gray)
+    panel = _solid_panel(binary)
+    if panel is not None:
+        # The threshold split the panel from the case, not the digits from the
+        # panel: crop to the panel at full resolution and threshold it alone
+        top, bottom, left, right = panel
+        scale = img.height / gray.shape[0]
+        img = img.crop((round(left * scale), round(top * scale), round(right * scale), round(bottom * scale)))
+        binary = _binarize(_read_scale(img))
+    return read_binary_display(_deskew(_despeckle(binary)))
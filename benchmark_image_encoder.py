@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+CardioMed AI - OCR Image Encoder Benchmark
+
+Compares the original image preparation (full decode, 1024px thumbnail,
+default-quality JPEG) with app/image_encoder.py for the BP monitor settings,
+with and without display auto-crop, and the prescription settings. For each image it reports the time to prepare it,
+the JPEG payload size and the estimated vision prompt tokens.
+
+Usage:
+    python benchmark_image_encoder.py photo1.jpg photo2.jpg
+    python benchmark_image_encoder.py              # Uses a synthetic 12MP camera photo
+    python benchmark_image_encoder.py --runs 20 photo.jpg
+"""
+
+import argparse
+import base64
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from app.image_encoder import encode_image, estimate_tokens
+from app.medication_ocr import OCR_PRESCRIPTION_IMAGE_SETTINGS
+from app.ocr import OCR_IMAGE_SETTINGS
+
+
+def legacy_prepare(image_data):
+    """The image preparation used before the shared encoder."""
+    img = Image.open(BytesIO(image_data))
+    if max(img.size) > 1024:
+        img.thumbnail((1024, 1024))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG")
+    data = buffer.getvalue()
+    base64.b64encode(data)
+    # The original requests did not set detail, which the API treats as auto (high for large images)
+    return len(data), estimate_tokens(img.width, img.height, "high"), img.size
+
+
+def synthetic_photo():
+    """A 4032x3024 camera-style JPEG rotated by EXIF, as phones produce."""
+    background = Image.linear_gradient("L").resize((4032, 3024)).convert("RGB")
+    noise = Image.effect_noise((4032, 3024), 20).convert("RGB")
+    img = Image.blend(background, noise, 0.15)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([1500, 1000, 2500, 1700], fill=(150, 170, 150))  # LCD panel
+    for x in range(1580, 2400, 280):
+        draw.rectangle([x, 1080, x + 180, 1620], outline=(20, 20, 20), width=35)  # Digit segments
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 degrees clockwise when displayed
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def timed(function, runs):
+    """Run function `runs` times and return (last result, mean milliseconds)."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = function()
+    return result, (time.perf_counter() - start) / runs * 1000
+
+
+def benchmark(name, image_data, runs):
+    """Print a comparison table for one image."""
+    print(f"\n{name} ({len(image_data)} bytes)")
+    print(f"  {'method':<28}{'size':>12}{'time ms':>10}{'bytes':>10}{'tokens':>8}")
+
+    (size_bytes, tokens, size), elapsed = timed(lambda: legacy_prepare(image_data), runs)
+    print(f"  {'legacy':<28}{f'{size[0]}x{size[1]}':>12}{elapsed:>10.1f}{size_bytes:>10}{tokens:>8}")
+
+    variants = [
+        ("encoder (bp, full frame)", OCR_IMAGE_SETTINGS._replace(auto_crop=False)),
+        ("encoder (bp, auto-crop)", OCR_IMAGE_SETTINGS._replace(auto_crop=True)),
+        ("encoder (prescription)", OCR_PRESCRIPTION_IMAGE_SETTINGS),
+    ]
+    for label, settings in variants:
+        encoded, elapsed = timed(lambda: encode_image(image_data, settings), runs)
+        print(f"  {label:<28}{f'{encoded.width}x{encoded.height}':>12}{elapsed:>10.1f}{encoded.size_bytes:>10}{encoded.tokens:>8}")
+        if encoded.crop_box:
+            print(f"  {'':<28}cropped to {encoded.crop_box}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OCR image preparation.")
+    parser.add_argument("images", nargs="*", help="image files (default: a synthetic camera photo)")
+    parser.add_argument("--runs", type=int, default=5, help="repetitions per measurement (default: 5)")
+    args = parser.parse_args()
+
+    if args.images:
+        for path in args.images:
+            with open(path, "rb") as f:
+                benchmark(path, f.read(), args.runs)
+    else:
+        benchmark("synthetic 4032x3024 photo", synthetic_photo(), args.runs)
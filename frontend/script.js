@@ -722,13 +722,13 @@ async function saveOCRReading() {
         saveBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Saving...';
         saveBtn.disabled = true;
 
-        // Save the approved OCR data to database
+        // Save the approved OCR data to database (the server kept it under the preview token)
         const response = await fetch(`${API_BASE_URL}/bp/save-ocr/`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(data)
+            body: JSON.stringify({ user_id: data.user_id, preview_token: data.preview_token })
         });
 
         if (response.ok) {
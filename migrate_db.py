@@ -1,9 +1,12 @@
 import sqlite3
 import os
+from sqlalchemy import column
+
+from app.bp_classification import sql_category
 
 def migrate_database():
     """
-    Add the interpretation column to the blood_pressure_readings table
+    Add the interpretation and category columns to the blood_pressure_readings table
     and create the medication_reminders table if it doesn't exist
     """
     # Path to the SQLite database
@@ -31,6 +34,27 @@ def migrate_database():
         else:
             print("Column 'interpretation' already exists.")
 
+        if "category" not in columns:
+            print("Adding 'category' column to blood_pressure_readings table...")
+            cursor.execute("ALTER TABLE blood_pressure_readings ADD COLUMN category SMALLINT")
+            conn.commit()
+            print("Column added successfully.")
+        else:
+            print("Column 'category' already exists.")
+
+        # Backfill category codes from the shared threshold table; the label is
+        # derived from the code, so the legacy interpretation text is cleared
+        category_case = sql_category(column("systolic"), column("diastolic"), "code").compile(
+            compile_kwargs={"literal_binds": True}
+        )
+        cursor.execute(f"""
+            UPDATE blood_pressure_readings
+            SET category = {category_case}, interpretation = NULL
+            WHERE category IS NULL AND systolic IS NOT NULL AND diastolic IS NOT NULL
+        """)
+        conn.commit()
+        print(f"Backfilled category for {cursor.rowcount} readings.")
+
         # Check if medication_reminders table exists
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='medication_reminders'")
         table_exists = cursor.fetchone()
@@ -129,6 +153,58 @@ def migrate_database():
         else:
             print("Table 'workout_reminders' already exists.")
 
+        # Composite indexes used for keyset pagination of history lists
+        history_indexes = [
+            ("blood_pressure_readings", "reading_time"),
+            ("medication_reminders", "schedule_datetime"),
+            ("bp_check_reminders", "reminder_datetime"),
+            ("doctor_appointment_reminders", "appointment_datetime"),
+            ("workout_reminders", "workout_datetime"),
+        ]
+        for table_name, datetime_column in history_indexes:
+            index_name = f"ix_{table_name}_user_{datetime_column}_id"
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} "
+                f"ON {table_name} (user_id, {datetime_column}, id)"
+            )
+        conn.commit()
+        print("Pagination indexes are in place.")
+
+        # Indexes for the due-reminder sweep across all users
+        due_indexes = history_indexes[1:]  # The reminder tables
+        for table_name, datetime_column in due_indexes:
+            index_name = f"ix_{table_name}_{datetime_column}_id"
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} "
+                f"ON {table_name} ({datetime_column}, id)"
+            )
+        conn.commit()
+        print("Due-reminder indexes are in place.")
+
+        # Lease columns of background OCR jobs, so jobs of a stopped process are retried
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ocr_jobs'")
+        if cursor.fetchone():
+            cursor.execute("PRAGMA table_info(ocr_jobs)")
+            job_columns = [column[1] for column in cursor.fetchall()]
+            for column_name, column_type in [("claimed_by", "VARCHAR(100)"), ("lease_expires_at", "DATETIME")]:
+                if column_name not in job_columns:
+                    print(f"Adding '{column_name}' column to ocr_jobs table...")
+                    cursor.execute(f"ALTER TABLE ocr_jobs ADD COLUMN {column_name} {column_type}")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS ix_ocr_jobs_status_lease_expires_at "
+                "ON ocr_jobs (status, lease_expires_at)"
+            )
+            conn.commit()
+            print("OCR job lease columns are in place.")
+
+        # Index for category counts and category-filtered history
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_blood_pressure_readings_user_category_reading_time_id "
+            "ON blood_pressure_readings (user_id, category, reading_time, id)"
+        )
+        conn.commit()
+        print("Category index is in place.")
+
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
     finally:
@@ -19,12 +19,17 @@ Prerequisites:
 
 The script will:
 1. Test connection to Azure SQL Database
-2. Create all tables using SQLAlchemy models
+2. Create all tables using SQLAlchemy models, and add columns and indexes
+   introduced since existing tables were created
 3. Transfer all data from SQLite to Azure SQL Database
 4. Handle IDENTITY_INSERT for ID columns
 5. Convert datetime strings to proper datetime objects
 6. Verify the data transfer
 
+Run with --upgrade-only to bring an existing Azure SQL Database up to date
+(new tables, the readings' category column and new indexes) without copying
+any SQLite data.
+
 Author: CardioMed AI Team
 """
 
@@ -114,6 +119,47 @@ def create_tables_in_azure_sql(engine):
         print(f"✗ Failed to create tables: {e}")
         return False
 
+def upgrade_existing_tables(engine):
+    """
+    Bring tables created by an earlier version up to date; create_all only
+    creates missing tables. Adds and backfills blood_pressure_readings.category,
+    adds the lease columns of ocr_jobs and creates the indexes added to
+    existing tables. Safe to run repeatedly.
+    """
+    try:
+        from app.bp_stats_service import BPStatsService
+        from app.database import Base
+
+        with engine.connect() as conn:
+            conn.execute(text(
+                "IF COL_LENGTH('blood_pressure_readings', 'category') IS NULL "
+                "ALTER TABLE blood_pressure_readings ADD category SMALLINT NULL"
+            ))
+            for column_name, column_type in [("claimed_by", "VARCHAR(100)"), ("lease_expires_at", "DATETIME")]:
+                conn.execute(text(
+                    f"IF OBJECT_ID('ocr_jobs') IS NOT NULL AND COL_LENGTH('ocr_jobs', '{column_name}') IS NULL "
+                    f"ALTER TABLE ocr_jobs ADD {column_name} {column_type} NULL"
+                ))
+            conn.commit()
+        print("✓ Columns 'category' and the OCR job leases are in place")
+
+        # Batched UPDATEs from the shared threshold table; clears the legacy interpretation text
+        session = sessionmaker(bind=engine)()
+        try:
+            updated = BPStatsService.reclassify_readings(session, only_missing=True)
+        finally:
+            session.close()
+        print(f"✓ Backfilled category for {updated} readings")
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        print("✓ Indexes are in place")
+        return True
+    except Exception as e:
+        print(f"✗ Failed to upgrade existing tables: {e}")
+        return False
+
 def get_table_data(sqlite_conn, table_name):
     """Get all data from a SQLite table."""
     try:
@@ -239,6 +285,10 @@ def migrate_data():
     if not create_tables_in_azure_sql(azure_engine):
         sqlite_conn.close()
         return False
+
+    if not upgrade_existing_tables(azure_engine):
+        sqlite_conn.close()
+        return False
     
     # List of tables to migrate (in order to respect foreign key constraints)
     tables_to_migrate = [
@@ -266,6 +316,10 @@ def migrate_data():
             success_count += 1
     
     sqlite_conn.close()
+
+    # Classify the copied readings that had no category in SQLite
+    print("\nBackfilling reading categories...")
+    upgrade_existing_tables(azure_engine)
     
     print("\n" + "=" * 60)
     print(f"Migration completed! Successfully migrated {success_count} tables.")
@@ -280,7 +334,16 @@ def migrate_data():
     
     return success_count > 0
 
+def upgrade_schema():
+    """Upgrade an existing Azure SQL Database in place, without copying SQLite data."""
+    azure_engine = get_azure_sql_engine()
+    if not azure_engine:
+        return False
+    return create_tables_in_azure_sql(azure_engine) and upgrade_existing_tables(azure_engine)
+
 if __name__ == "__main__":
+    if "--upgrade-only" in sys.argv[1:]:
+        sys.exit(0 if upgrade_schema() else 1)
     if migrate_data():
         sys.exit(0)
     else:
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+CardioMed AI - Blood Pressure Aggregate Tables Rebuild/Verify Script
+
+The bp_user_stats table holds running aggregates (count, sums, sums of
+squares, min/max and category counters) of each user's readings so the
+/bp/readings/stats endpoint is a primary-key lookup. The bp_daily_rollup
+table holds the same kind of aggregates per user per day and backs the
+/bp/readings/{user_id}/series chart endpoint. Both are kept up to date on
+every write; this script backfills them for existing data and checks them.
+
+Usage:
+    python rebuild_bp_stats.py            # Recompute every aggregate row
+    python rebuild_bp_stats.py --verify   # Compare aggregate rows with the readings
+
+Works against whatever DATABASE_URL points to (hypertension.db or Azure SQL).
+--verify exits with status 1 if any aggregate row is out of date, so it can be
+run as a CI consistency check.
+"""
+
+import argparse
+import sys
+
+from app import models
+from app.bp_stats_service import BPStatsService
+from app.database import SessionLocal, engine
+
+
+def rebuild():
+    """Recompute the aggregate tables from the readings table."""
+    models.Base.metadata.create_all(
+        bind=engine,
+        tables=[models.BPUserStats.__table__, models.BPDailyRollup.__table__]
+    )
+
+    db = SessionLocal()
+    try:
+        users = BPStatsService.rebuild_all(db)
+        days = BPStatsService.rebuild_daily_rollups(db)
+        db.commit()
+        print(f"✓ Rebuilt bp_user_stats for {users} users")
+        print(f"✓ Rebuilt bp_daily_rollup with {days} user-days")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Failed to rebuild aggregate tables: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def verify():
+    """Check every aggregate row against a fresh aggregate of the readings."""
+    db = SessionLocal()
+    try:
+        stats_mismatches = BPStatsService.verify_all(db)
+        rollup_mismatches = BPStatsService.verify_daily_rollups(db)
+    finally:
+        db.close()
+
+    if not stats_mismatches and not rollup_mismatches:
+        print("✓ bp_user_stats and bp_daily_rollup are consistent with blood_pressure_readings")
+        return True
+
+    if stats_mismatches:
+        print(f"✗ Found {len(stats_mismatches)} inconsistencies in bp_user_stats:")
+        for user_id, field, stored, actual in stats_mismatches:
+            print(f"  user {user_id}: {field} stored={stored} actual={actual}")
+    if rollup_mismatches:
+        print(f"✗ Found {len(rollup_mismatches)} inconsistencies in bp_daily_rollup:")
+        for (user_id, day), field, stored, actual in rollup_mismatches:
+            print(f"  user {user_id} on {day}: {field} stored={stored} actual={actual}")
+    print("\nRun 'python rebuild_bp_stats.py' to rebuild the tables.")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify the bp_user_stats and bp_daily_rollup tables.")
+    parser.add_argument("--verify", action="store_true", help="only check consistency, do not modify data")
+    args = parser.parse_args()
+
+    ok = verify() if args.verify else rebuild()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+CardioMed AI - Blood Pressure Reading Reclassification Script
+
+Rewrites the stored category code of every blood pressure reading using the
+threshold table in app/bp_classification.py. Run it after changing that table
+(e.g. when adopting a new guideline) so stored readings match the new rules.
+It also backfills the category of readings saved before the column existed
+and drops their legacy free-text interpretation.
+
+The update is done in set-based batches of UPDATE statements over id ranges,
+one commit per batch, instead of loading and saving readings one at a time.
+Afterwards the bp_user_stats category counters are rebuilt, since they count
+readings by category.
+
+Usage:
+    python reclassify_bp_readings.py                   # Reclassify every reading
+    python reclassify_bp_readings.py --only-missing    # Only readings without a category
+    python reclassify_bp_readings.py --batch-size 20000
+
+Works against whatever DATABASE_URL points to (hypertension.db or Azure SQL).
+"""
+
+import argparse
+import sys
+
+from app.bp_stats_service import BPStatsService
+from app.database import SessionLocal
+
+
+def reclassify(batch_size, only_missing):
+    """Reclassify stored readings and rebuild the per-user statistics."""
+    db = SessionLocal()
+    try:
+        updated = BPStatsService.reclassify_readings(db, batch_size=batch_size, only_missing=only_missing)
+        print(f"✓ Updated category of {updated} readings")
+
+        users = BPStatsService.rebuild_all(db)
+        db.commit()
+        print(f"✓ Rebuilt bp_user_stats for {users} users")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Failed to reclassify readings: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reclassify stored blood pressure readings with the current thresholds.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="readings per UPDATE batch (default: 5000)")
+    parser.add_argument("--only-missing", action="store_true", help="only classify readings without a category")
+    args = parser.parse_args()
+
+    ok = reclassify(args.batch_size, args.only_missing)
+    sys.exit(0 if ok else 1)
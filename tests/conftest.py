@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database before app.database is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import SessionLocal, engine
+from app.routers import blood_pressure, reminders, users
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables."""
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(users.router)
+    app.include_router(blood_pressure.router)
+    app.include_router(reminders.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def user(db):
+    user = models.User(
+        username="patient", email="patient@example.com", hashed_password="x",
+        full_name="Test Patient", age=54, gender="female", height=165, weight=70
+    )
+    db.add(user)
+    db.commit()
+    return user
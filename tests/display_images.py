@@ -0,0 +1,136 @@
+"""Synthetic photos of blood pressure monitors, and of things that are not monitors, for the OCR tests."""
+import io
+import random
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+# Lit segments of each digit
+DIGIT_SEGMENTS = {
+    0: "abcdef", 1: "bc", 2: "abdeg", 3: "abcdg", 4: "bcfg",
+    5: "acdfg", 6: "acdefg", 7: "abc", 8: "abcdefg", 9: "abcdfg",
+}
+
+LCD_COLORS = ((170, 185, 165), (25, 30, 25))  # Panel, segments
+LED_COLORS = ((20, 20, 20), (255, 60, 60))
+
+
+def segment_boxes(x: float, y: float, w: float, h: float, t: float) -> dict:
+    """Rectangle of each segment of a digit cell at (x, y) of size w x h and stroke t."""
+    return {
+        "a": [(x + t, y), (x + w - t, y + t)],
+        "b": [(x + w - t, y + t), (x + w, y + h / 2 - t / 2)],
+        "c": [(x + w - t, y + h / 2 + t / 2), (x + w, y + h - t)],
+        "d": [(x + t, y + h - t), (x + w - t, y + h)],
+        "e": [(x, y + h / 2 + t / 2), (x + t, y + h - t)],
+        "f": [(x, y + t), (x + t, y + h / 2 - t / 2)],
+        "g": [(x + t, y + h / 2 - t / 2), (x + w - t, y + h / 2 + t / 2)],
+    }
+
+
+def draw_number(draw: ImageDraw.ImageDraw, value: int, x: int, y: int, w: int, h: int, color, digits: int = 3) -> None:
+    """Draw a right-aligned number in seven-segment digits."""
+    stroke = max(2, int(w * 0.18))
+    for i, char in enumerate(str(value).rjust(digits)):
+        if char == " ":
+            continue
+        boxes = segment_boxes(x + i * w * 1.35, y, w, h, stroke)
+        for segment in DIGIT_SEGMENTS[int(char)]:
+            draw.rectangle(boxes[segment], fill=color)
+
+
+def render_panel(systolic: int, diastolic: int, pulse: int, led: bool = False) -> Image.Image:
+    """The display panel alone: systolic and diastolic rows above a smaller pulse row."""
+    background, foreground = LED_COLORS if led else LCD_COLORS
+    panel = Image.new("RGB", (600, 760), background)
+    draw = ImageDraw.Draw(panel)
+    draw_number(draw, systolic, 60, 40, 120, 220, foreground)
+    draw.text((20, 40), "SYS", fill=foreground)
+    draw_number(draw, diastolic, 60, 300, 120, 220, foreground)
+    draw.text((20, 300), "DIA", fill=foreground)
+    draw_number(draw, pulse, 250, 570, 70, 130, foreground)
+    draw.text((20, 600), "PUL/min", fill=foreground)
+    return panel
+
+
+def add_noise(image: Image.Image, seed: int) -> Image.Image:
+    """Blend in a little seeded sensor noise, so renders are reproducible."""
+    noise = np.random.default_rng(seed).normal(128, 30, (image.height, image.width))
+    noise = Image.fromarray(noise.clip(0, 255).astype(np.uint8)).convert("RGB")
+    return Image.blend(image, noise, 0.08)
+
+
+def to_jpeg(image: Image.Image) -> bytes:
+    """Encode an image the way a phone camera upload arrives."""
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=88)
+    return buffer.getvalue()
+
+
+def render_photo(
+    systolic: int,
+    diastolic: int,
+    pulse: int,
+    led: bool = False,
+    angle: float = 0,
+    blur: float = 0,
+    noise: bool = True,
+    size: Tuple[int, int] = (3000, 2200),
+    panel: Optional[Image.Image] = None,
+    seed: int = 0
+) -> bytes:
+    """
+    JPEG photo of a monitor: the panel in a light plastic body with a button,
+    on a gradient background, optionally tilted, blurred and noisy.
+    """
+    panel = panel or render_panel(systolic, diastolic, pulse, led)
+    body = Image.new("RGB", (panel.width + 300, panel.height + 600), (225, 225, 230))
+    body.paste(panel, (150, 150))
+    ImageDraw.Draw(body).ellipse(
+        [350, panel.height + 250, 550, panel.height + 450], fill=(60, 60, 200)
+    )
+
+    photo = Image.linear_gradient("L").resize(size).convert("RGB")
+    mask = Image.new("L", body.size, 255)
+    if angle:
+        body = body.rotate(angle, expand=True)
+        mask = mask.rotate(angle, expand=True)
+    photo.paste(body, (size[0] // 2 - body.width // 2, size[1] // 2 - body.height // 2), mask)
+
+    if blur:
+        photo = photo.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        photo = add_noise(photo, seed)
+    return to_jpeg(photo)
+
+
+def render_noise(seed: int = 0, size: Tuple[int, int] = (1200, 900)) -> Image.Image:
+    """Pure sensor noise, as from a photo taken with the lens covered."""
+    noise = np.random.default_rng(seed).normal(128, 60, (size[1], size[0]))
+    return Image.fromarray(noise.clip(0, 255).astype(np.uint8))
+
+
+def render_document(seed: int = 0) -> bytes:
+    """JPEG scan of a page of printed text, like a prescription or lab report."""
+    rng = random.Random(seed)
+    page = Image.new("RGB", (1240, 1754), (250, 250, 247))
+    draw = ImageDraw.Draw(page)
+    for y in range(80, 1700, 28):
+        words = ("".join(rng.choice("abcdefghijklmnop") for _ in range(rng.randrange(2, 9))) for _ in range(10))
+        draw.text((80, y), " ".join(words), fill=(30, 30, 30))
+    return to_jpeg(page.resize((2480, 3508)))
+
+
+def render_scene(seed: int = 0, size: Tuple[int, int] = (2400, 1800)) -> bytes:
+    """JPEG photo of a cluttered scene of coloured shapes with no display in it."""
+    rng = random.Random(seed)
+    scene = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(scene)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        w, h = rng.randrange(50, 500), rng.randrange(50, 500)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+        shape([x, y, x + w, y + h], fill=color)
+    return to_jpeg(add_noise(scene, seed))
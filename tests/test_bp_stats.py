@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app import models
+from app.bp_classification import classify
+from app.bp_stats_service import BPStatsService
+
+START = datetime(2026, 3, 1, 8, 0)
+
+
+def make_reading(user_id, systolic, diastolic, pulse, hours=0):
+    return models.BloodPressure(
+        user_id=user_id, systolic=systolic, diastolic=diastolic, pulse=pulse,
+        reading_time=START + timedelta(hours=hours), category=classify(systolic, diastolic).code
+    )
+
+
+def add_readings(db, user_id, values, hours=0):
+    """Add and record readings the way POST /bp/readings/ does, one transaction for all."""
+    readings = [make_reading(user_id, *value, hours=hours + i) for i, value in enumerate(values)]
+    db.add_all(readings)
+    BPStatsService.record_readings(user_id, readings, db)
+    db.commit()
+    return readings
+
+
+@pytest.fixture
+def other_user(db):
+    user = models.User(username="other", email="other@example.com", hashed_password="x", full_name="Other")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_first_readings_create_summary_row(db, user):
+    add_readings(db, user.id, [(118, 76, 70), (142, 91, 80)])
+
+    stats = BPStatsService.get_user_stats(user.id, db)
+
+    assert stats == BPStatsService.compute_user_stats(user.id, db)
+    assert stats["reading_count"] == 2
+    assert (stats["min_systolic"], stats["max_systolic"]) == (118, 142)
+    assert stats["sumsq_pulse"] == 70 * 70 + 80 * 80
+    assert (stats["normal_count"], stats["stage2_count"]) == (1, 1)
+    assert BPStatsService.verify_all(db) == []
+
+
+def test_later_readings_are_added_to_summary_row(db, user):
+    add_readings(db, user.id, [(128, 82, 70)])
+    add_readings(db, user.id, [(110, 70, 60), (185, 125, 95)], hours=5)
+    add_readings(db, user.id, [(132, 84, 72)], hours=10)
+
+    stats = BPStatsService.get_user_stats(user.id, db)
+
+    assert stats["reading_count"] == 4
+    assert (stats["min_systolic"], stats["max_systolic"]) == (110, 185)
+    assert (stats["min_pulse"], stats["max_pulse"]) == (60, 95)
+    assert stats["sum_diastolic"] == 82 + 70 + 125 + 84
+    assert BPStatsService.verify_all(db) == []
+
+
+def test_summary_row_picks_up_history(db, user):
+    # Readings saved before the summary table existed
+    db.add_all([make_reading(user.id, 150, 95, 88, hours=i) for i in range(3)])
+    db.commit()
+
+    add_readings(db, user.id, [(120, 78, 66)], hours=10)
+
+    assert BPStatsService.get_user_stats(user.id, db)["reading_count"] == 4
+    assert BPStatsService.verify_all(db) == []
+
+
+def test_bulk_insert_rows_are_recorded(db, user):
+    rows = [
+        {"user_id": user.id, "systolic": s, "diastolic": d, "pulse": p,
+         "reading_time": START + timedelta(minutes=i), "notes": None, "category": classify(s, d).code}
+        for i, (s, d, p) in enumerate([(121, 79, 64), (139, 88, 71), (165, 102, 90)])
+    ]
+    db.execute(insert(models.BloodPressure), rows)
+    BPStatsService.record_readings(user.id, rows, db)
+    db.commit()
+
+    assert BPStatsService.get_user_stats(user.id, db)["reading_count"] == 3
+    assert BPStatsService.verify_all(db) == []
+
+
+def test_users_are_kept_apart(db, user, other_user):
+    add_readings(db, user.id, [(120, 80, 70)])
+    add_readings(db, other_user.id, [(160, 100, 90), (170, 105, 95)])
+
+    assert BPStatsService.get_user_stats(user.id, db)["reading_count"] == 1
+    assert BPStatsService.get_user_stats(other_user.id, db)["max_systolic"] == 170
+    assert BPStatsService.verify_all(db) == []
+
+
+def test_stats_without_summary_row(db, user):
+    assert BPStatsService.get_user_stats(user.id, db) is None
+
+    db.add(make_reading(user.id, 125, 81, 69))
+    db.commit()
+
+    assert BPStatsService.get_user_stats(user.id, db)["reading_count"] == 1
+    assert db.get(models.BPUserStats, user.id) is None
+
+
+def test_verify_and_rebuild(db, user, other_user):
+    add_readings(db, user.id, [(120, 80, 70), (135, 85, 75)])
+    db.add(make_reading(other_user.id, 140, 90, 80))
+    db.get(models.BPUserStats, user.id).max_systolic = 999
+    db.commit()
+
+    mismatches = BPStatsService.verify_all(db)
+    assert (user.id, "max_systolic", 999, 135) in mismatches
+    assert (other_user.id, "row", None, "missing") in mismatches
+
+    assert BPStatsService.rebuild_all(db) == 2
+    db.commit()
+    assert BPStatsService.verify_all(db) == []
+
+
+def test_stats_endpoint(client, user):
+    for systolic, diastolic, pulse in [(118, 76, 70), (142, 91, 80), (185, 125, 95)]:
+        response = client.post(
+            "/bp/readings/", params={"user_id": user.id},
+            json={"systolic": systolic, "diastolic": diastolic, "pulse": pulse}
+        )
+        assert response.status_code == 200
+    response = client.post("/bp/readings/batch", params={"user_id": user.id}, json={"readings": [
+        {"systolic": 130, "diastolic": 85, "pulse": 72}, {"systolic": 500, "diastolic": 85, "pulse": 72}
+    ]})
+    assert response.json()["accepted"] == 1
+
+    stats = client.get(f"/bp/readings/stats/{user.id}").json()
+
+    assert stats["total_readings"] == 4
+    assert stats["ranges"]["systolic"] == {"min": 118, "max": 185}
+    assert stats["averages"]["pulse"] == round((70 + 80 + 95 + 72) / 4, 1)
+    assert sum(stats["categories"].values()) == 4
+
+
+def test_readings_are_rolled_up_per_day(db, user):
+    # 8:00, 20:00 and 8:00 the next day
+    add_readings(db, user.id, [(120, 80, 70)])
+    add_readings(db, user.id, [(140, 90, 80)], hours=12)
+    add_readings(db, user.id, [(160, 100, 90), (110, 70, 60)], hours=24)
+
+    rollups = {row.day: row for row in db.query(models.BPDailyRollup).filter_by(user_id=user.id)}
+
+    first, second = START.date(), START.date() + timedelta(days=1)
+    assert sorted(rollups) == [first, second]
+    assert (rollups[first].reading_count, rollups[first].sum_systolic) == (2, 260)
+    assert (rollups[second].min_systolic, rollups[second].max_systolic) == (110, 160)
+    assert BPStatsService.verify_daily_rollups(db) == []
+
+
+def test_rollup_picks_up_the_days_history(db, user):
+    db.add_all([make_reading(user.id, 150, 95, 88, hours=i) for i in range(3)])
+    db.commit()
+
+    add_readings(db, user.id, [(120, 78, 66)], hours=4)
+
+    assert db.get(models.BPDailyRollup, (user.id, START.date())).reading_count == 4
+    assert BPStatsService.verify_daily_rollups(db) == []
+
+
+def test_verify_and_rebuild_daily_rollups(db, user):
+    add_readings(db, user.id, [(120, 80, 70), (135, 85, 75)])
+    db.add(make_reading(user.id, 140, 90, 80, hours=48))
+    db.get(models.BPDailyRollup, (user.id, START.date())).sum_pulse = 0
+    db.commit()
+
+    mismatches = BPStatsService.verify_daily_rollups(db)
+    assert ((user.id, START.date()), "sum_pulse", 0, 145) in mismatches
+    assert ((user.id, START.date() + timedelta(days=2)), "row", None, "missing") in mismatches
+
+    assert BPStatsService.rebuild_daily_rollups(db) == 2
+    db.commit()
+    assert BPStatsService.verify_daily_rollups(db) == []
+
+
+@pytest.mark.parametrize("bucket, expected", [
+    ("day", [("2026-03-01", 2), ("2026-03-02", 1), ("2026-03-09", 1), ("2026-04-02", 1)]),
+    ("week", [("2026-02-23", 2), ("2026-03-02", 1), ("2026-03-09", 1), ("2026-03-30", 1)]),
+    ("month", [("2026-03-01", 4), ("2026-04-01", 1)]),
+])
+def test_series_buckets(client, db, user, bucket, expected):
+    for hours in (0, 2, 24, 8 * 24, 32 * 24):
+        add_readings(db, user.id, [(120 + hours % 50, 80, 70)], hours=hours)
+
+    response = client.get(f"/bp/readings/{user.id}/series", params={"bucket": bucket})
+
+    assert response.status_code == 200
+    points = response.json()["points"]
+    assert [(point["bucket_start"], point["count"]) for point in points] == expected
+
+
+def test_series_point_values_and_range(db, user):
+    add_readings(db, user.id, [(120, 80, 70), (140, 90, 60)])
+    add_readings(db, user.id, [(150, 95, 90)], hours=24)
+
+    (point,) = BPStatsService.get_series(user.id, "month", START.date(), START.date() + timedelta(days=1), db)
+
+    assert point["count"] == 3
+    assert point["systolic"] == {"mean": round(410 / 3, 1), "min": 120, "max": 150}
+    assert point["pulse"] == {"mean": round(220 / 3, 1), "min": 60, "max": 90}
+    assert BPStatsService.get_series(user.id, "day", START.date() + timedelta(days=1), None, db)[0]["count"] == 1
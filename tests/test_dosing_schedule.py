@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import dosing_schedule
+from app.dosing_schedule import DosingRule, build_schedule, dose_count, expand_schedule
+
+START = datetime(2026, 3, 1, 10, 17, 45)
+
+
+def times(rule, start=START, **window):
+    return [dose_time for dose_time, _ in expand_schedule(rule, start, **window)]
+
+
+def test_times_per_day():
+    doses = times(DosingRule(dose="1 tablet", times_per_day=2, duration_days=3))
+
+    assert len(doses) == 6
+    assert doses[0] == datetime(2026, 3, 1, 10, 17)
+    assert all(later - earlier == timedelta(hours=12) for earlier, later in zip(doses, doses[1:]))
+
+
+def test_interval_with_total_doses():
+    doses = times(DosingRule(dose="5 ml", interval_hours=8, total_doses=5))
+
+    assert doses == [datetime(2026, 3, 1, 10, 17) + timedelta(hours=8 * i) for i in range(5)]
+
+
+def test_interval_over_duration():
+    assert len(times(DosingRule(dose="1 tablet", interval_hours=6, duration_days=2))) == 8
+
+
+def test_times_of_day_start_with_the_next_clock_time():
+    doses = times(DosingRule(dose="1 tablet", times_of_day=["20:00", "08:00"], duration_days=2))
+
+    assert doses == [
+        datetime(2026, 3, 1, 20, 0),
+        datetime(2026, 3, 2, 8, 0),
+        datetime(2026, 3, 2, 20, 0),
+        datetime(2026, 3, 3, 8, 0),
+    ]
+
+
+def test_first_dose_time_already_past_is_tomorrow():
+    doses = times(DosingRule(dose="1 tablet", first_dose_time="09:00", total_doses=2))
+    assert doses == [datetime(2026, 3, 2, 9, 0), datetime(2026, 3, 3, 9, 0)]
+
+
+def test_first_dose_offset():
+    doses = times(DosingRule(dose="1 tablet", first_dose_offset_hours=1.5, total_doses=1))
+    assert doses == [datetime(2026, 3, 1, 11, 47)]
+
+
+def test_irregular_offsets():
+    rule = DosingRule(dose="2 tablets", dose_offsets_hours=[0, 4, 12, 36], total_doses=None)
+
+    assert times(rule) == [datetime(2026, 3, 1, 10, 17) + timedelta(hours=h) for h in (0, 4, 12, 36)]
+
+
+def test_open_ended_course_uses_default_length(monkeypatch):
+    monkeypatch.setattr(dosing_schedule, "PRESCRIPTION_DEFAULT_COURSE_DAYS", 7)
+    assert dose_count(DosingRule(dose="1 tablet", times_per_day=3)) == 21
+
+
+def test_course_length_is_capped():
+    rule = DosingRule(dose="1 tablet", interval_hours=0.5, duration_days=365)
+    assert dose_count(rule) == dosing_schedule.MAX_SCHEDULE_DOSES
+    assert len(times(rule)) == dosing_schedule.MAX_SCHEDULE_DOSES
+
+
+@pytest.mark.parametrize("rule", [
+    DosingRule(dose="1 tablet", times_per_day=3, duration_days=10),
+    DosingRule(dose="1 tablet", times_of_day=["07:30", "13:00", "21:45"], duration_days=10),
+    DosingRule(dose="1 tablet", interval_hours=7, total_doses=40),
+])
+def test_window_matches_full_course(rule):
+    full = times(rule)
+    window_start, window_end = datetime(2026, 3, 4, 7, 30), datetime(2026, 3, 6, 13, 0)
+
+    windowed = times(rule, window_start=window_start, window_end=window_end)
+
+    assert windowed == [dose for dose in full if window_start <= dose < window_end]
+    assert windowed
+
+
+def test_build_schedule():
+    schedule = build_schedule(DosingRule(dose="1 tablet", total_doses=2), START)
+    assert schedule == [
+        {"datetime": "2026-03-01T10:17:00", "dosage": "1 tablet"},
+        {"datetime": "2026-03-02T10:17:00", "dosage": "1 tablet"},
+    ]
+
+
+def test_invalid_clock_time():
+    with pytest.raises(ValueError):
+        times(DosingRule(dose="1 tablet", times_of_day=["25:00"], total_doses=1))
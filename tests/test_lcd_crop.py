@@ -0,0 +1,68 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.lcd_crop import detect_display, find_display_region
+from app.seven_segment import MIN_CROP_CONFIDENCE
+from display_images import render_noise, render_photo, render_scene
+
+# Where render_photo puts the panel in its default 3000x2200 frame
+PANEL_BOX = (1200, 570, 1800, 1330)
+
+
+def open_image(data: bytes) -> Image.Image:
+    return Image.open(BytesIO(data))
+
+
+def contains(outer, inner) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+@pytest.mark.parametrize("options", [{}, {"led": True}, {"angle": 4}, {"blur": 2}])
+def test_detects_display_in_photo(options):
+    img = open_image(render_photo(120, 80, 72, **options))
+
+    result = detect_display(img)
+
+    assert result is not None
+    assert result.confidence >= MIN_CROP_CONFIDENCE
+    assert contains(result.box, PANEL_BOX)
+    left, top, right, bottom = result.box
+    assert (right - left) * (bottom - top) < 0.5 * img.width * img.height
+
+
+def test_box_is_in_original_pixels():
+    img = open_image(render_photo(120, 80, 72))
+    half = img.resize((img.width // 2, img.height // 2))
+
+    full_box = detect_display(img).box
+    half_box = detect_display(half).box
+
+    for full, scaled in zip(full_box, half_box):
+        assert abs(full - 2 * scaled) <= 16
+
+
+def test_uniform_image_has_no_display():
+    assert detect_display(Image.new("L", (1200, 900), 128)) is None
+
+
+def test_noise_is_not_a_confident_display():
+    result = detect_display(render_noise())
+    assert result is None or result.confidence < MIN_CROP_CONFIDENCE
+
+
+def test_cluttered_scene_is_not_a_confident_display():
+    result = detect_display(open_image(render_scene()))
+    assert result is None or result.confidence < MIN_CROP_CONFIDENCE
+
+
+def test_tiny_image():
+    assert find_display_region(np.zeros((5, 5), dtype=np.uint8)) is None
+
+
+def test_region_filling_the_frame_is_rejected():
+    # Edges everywhere: the region would be the whole frame
+    checkerboard = (np.indices((200, 200)).sum(axis=0) % 2 * 255).astype(np.uint8)
+    assert find_display_region(checkerboard) is None
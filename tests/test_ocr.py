@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from PIL import ImageDraw
+
+from app.ocr import OCRProcessor, _read_display_confidently
+from display_images import render_panel, render_photo, render_scene
+
+MODEL_READINGS = (131, 87, 75)
+
+
+def glare_photo() -> bytes:
+    """A monitor photo whose systolic line the local reader is unsure of."""
+    panel = render_panel(128, 82, 67)
+    ImageDraw.Draw(panel).rectangle([222, 100, 330, 200], fill=(235, 240, 232))
+    return render_photo(128, 82, 67, panel=panel)
+
+
+@pytest.fixture
+def model_calls():
+    return []
+
+
+@pytest.fixture
+def processor(monkeypatch, model_calls):
+    """An OCRProcessor whose vision model calls are recorded and answered with MODEL_READINGS."""
+    processor = OCRProcessor()
+    processor.cache.clear()
+    processor.client = object()
+    processor.local_engine = True
+    processor.local_min_confidence = 0.9
+
+    def extract_legacy(base64_image, messages):
+        model_calls.append(base64_image)
+        return MODEL_READINGS
+
+    async def request_async(base64_image):
+        model_calls.append(base64_image)
+        return MODEL_READINGS
+
+    monkeypatch.setattr(processor, "_supports_structured_output", lambda: False)
+    monkeypatch.setattr(processor, "_extract_readings_legacy", extract_legacy)
+    monkeypatch.setattr(processor, "_request_readings_async", request_async)
+    return processor
+
+
+def test_read_display_confidently_applies_threshold():
+    image = glare_photo()
+
+    assert _read_display_confidently(image, 0.9) is None
+    assert _read_display_confidently(image, 0.5) == (128, 82, 67)
+
+
+def test_read_display_confidently_survives_undecodable_image():
+    assert _read_display_confidently(b"not an image", 0.9) is None
+
+
+def test_confident_local_read_skips_model(processor, model_calls):
+    assert processor.extract_readings(render_photo(120, 80, 72)) == (120, 80, 72)
+    assert model_calls == []
+
+
+@pytest.mark.parametrize("image", [glare_photo, render_scene], ids=["low-confidence", "no-display"])
+def test_falls_back_to_model(processor, model_calls, image):
+    assert processor.extract_readings(image()) == MODEL_READINGS
+    assert len(model_calls) == 1
+
+
+def test_disabled_local_engine_uses_model(processor, model_calls):
+    processor.local_engine = False
+
+    assert processor.extract_readings(render_photo(120, 80, 72)) == MODEL_READINGS
+    assert len(model_calls) == 1
+
+
+def test_no_client_and_unreadable_display(processor):
+    processor.client = None
+
+    assert processor.extract_readings(glare_photo()) == (0, 0, 0)
+
+
+def test_async_falls_back_to_model(processor, model_calls):
+    assert asyncio.run(processor.extract_readings_async(render_photo(120, 80, 72))) == (120, 80, 72)
+    assert model_calls == []
+
+    assert asyncio.run(processor.extract_readings_async(glare_photo())) == MODEL_READINGS
+    assert len(model_calls) == 1
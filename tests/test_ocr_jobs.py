@@ -0,0 +1,168 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models, ocr_jobs
+from app.ocr_jobs import OCR_JOB_MAX_ATTEMPTS, OCRJobQueue, check_callback_url
+
+
+@pytest.fixture(autouse=True)
+def short_lease(monkeypatch):
+    monkeypatch.setattr(ocr_jobs, "OCR_JOB_LEASE_SECONDS", 0.3)
+
+
+def add_job(db, user, status="running", lease_seconds=None, attempts=1, job_id="job"):
+    now = datetime.utcnow()
+    db.add(models.OCRJob(
+        id=job_id, kind="bp_upload", user_id=user.id, status=status, image=b"image", attempts=attempts,
+        started_at=now if status == "running" else None, claimed_by="dead-process" if status == "running" else None,
+        lease_expires_at=now + timedelta(seconds=lease_seconds) if lease_seconds is not None else None
+    ))
+    db.commit()
+
+
+def job_state(db, job_id="job"):
+    db.expire_all()
+    job = db.get(models.OCRJob, job_id)
+    return job.status, job.attempts
+
+
+@pytest.mark.parametrize("lease_seconds", [-1, None])
+def test_running_job_without_live_lease_is_requeued(db, user, lease_seconds):
+    add_job(db, user, lease_seconds=lease_seconds)
+
+    assert OCRJobQueue._requeue_expired(db) == ["job"]
+    assert job_state(db) == ("queued", 1)
+
+
+def test_running_job_with_live_lease_is_left_alone(db, user):
+    add_job(db, user, lease_seconds=60)
+
+    assert OCRJobQueue._requeue_expired(db) == []
+    assert job_state(db) == ("running", 1)
+
+
+def test_job_fails_after_max_attempts(db, user):
+    add_job(db, user, lease_seconds=-1, attempts=OCR_JOB_MAX_ATTEMPTS)
+
+    assert OCRJobQueue._requeue_expired(db) == []
+    db.expire_all()
+    job = db.get(models.OCRJob, "job")
+    assert (job.status, job.image) == ("failed", None)
+
+
+def test_queued_jobs_are_not_taken_over(db, user):
+    add_job(db, user, status="queued", attempts=0)
+    assert OCRJobQueue._requeue_expired(db) == []
+
+
+def test_job_interrupted_by_shutdown_runs_on_another_process(db, user):
+    started = asyncio.Event()
+    runs = []
+
+    async def slow_handler(job, session):
+        runs.append("stopping")
+        started.set()
+        await asyncio.sleep(60)
+
+    async def handler(job, session):
+        runs.append("other")
+        return {"systolic": 120}
+
+    async def scenario():
+        stopping, other = OCRJobQueue(workers=1), OCRJobQueue(workers=1)
+        stopping.register("bp_upload", slow_handler)
+        other.register("bp_upload", handler)
+        await other.start()
+        await stopping.start()
+
+        job = await stopping.submit(db, "bp_upload", user.id, b"image")
+        await asyncio.wait_for(started.wait(), 5)
+        await stopping.stop()
+        assert job_state(db, job.id) == ("queued", 0)
+
+        # The other process's next lease check picks it up
+        await other.wait(job.id, 5)
+        await other.stop()
+        return job.id
+
+    job_id = asyncio.run(scenario())
+
+    assert runs == ["stopping", "other"]
+    assert job_state(db, job_id) == ("succeeded", 1)
+    assert db.get(models.OCRJob, job_id).result == {"systolic": 120}
+
+
+def test_lease_is_renewed_while_the_job_runs(db, user):
+    async def handler(job, session):
+        await asyncio.sleep(1.2)
+        return {"systolic": 120}
+
+    async def scenario():
+        running, watcher = OCRJobQueue(workers=1), OCRJobQueue(workers=1)
+        running.register("bp_upload", handler)
+        watcher.register("bp_upload", handler)
+        await running.start()
+        await watcher.start()
+
+        job = await running.submit(db, "bp_upload", user.id, b"image")
+        await running.wait(job.id, 5)
+        await running.stop()
+        await watcher.stop()
+        return job.id
+
+    job_id = asyncio.run(scenario())
+
+    # The watcher checked leases several times during the run but never took the job over
+    assert job_state(db, job_id) == ("succeeded", 1)
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://2130706433/hook",  # 127.0.0.1 as a number
+    "http://10.0.0.5/hook",
+    "http://192.168.1.20/hook",
+    "http://100.64.0.1/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://0.0.0.0/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://[fd00::1]/hook",
+    "ftp://93.184.216.34/hook",
+    "https:///hook",
+])
+def test_callback_url_to_internal_address_is_rejected(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+
+def test_callback_url_to_public_address_is_accepted():
+    check_callback_url("https://93.184.216.34/hooks/ocr?token=abc")
+
+
+def test_callback_url_allowlist(monkeypatch):
+    monkeypatch.setattr(ocr_jobs, "OCR_JOB_CALLBACK_HOSTS", {"hooks.internal"})
+
+    check_callback_url("http://hooks.internal:9000/ocr")
+    with pytest.raises(ValueError):
+        check_callback_url("https://93.184.216.34/hook")
+
+
+def test_upload_rejects_internal_callback_url(client, user):
+    response = client.post("/bp/upload/", data={
+        "user_id": user.id, "async_job": "true", "callback_url": "http://169.254.169.254/latest/meta-data"
+    }, files={"image": ("bp.jpg", b"image", "image/jpeg")})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "callback_url must point to a public address"
+
+
+def test_webhook_is_not_sent_to_internal_address(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("webhook sent")
+
+    monkeypatch.setattr(ocr_jobs.httpx, "AsyncClient", fail)
+
+    asyncio.run(OCRJobQueue()._notify("http://127.0.0.1/hook", {"id": "job"}))
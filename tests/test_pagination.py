@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+COLUMNS = [models.BloodPressure.reading_time, models.BloodPressure.id]
+
+
+@pytest.fixture
+def readings(db, user):
+    """Twelve readings, in pairs sharing a reading time."""
+    start = datetime(2026, 3, 1, 8, 0)
+    rows = [
+        models.BloodPressure(user_id=user.id, systolic=120 + i, diastolic=80, pulse=70,
+                             reading_time=start + timedelta(hours=i // 2))
+        for i in range(12)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def all_pages(db, limit, descending=False):
+    """Walk every page of the readings query, returning the pages' ids."""
+    pages, after = [], None
+    while True:
+        rows, after = keyset_paginate(db.query(models.BloodPressure), COLUMNS, after, limit, descending)
+        pages.append([row.id for row in rows])
+        if after is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    values = [datetime(2026, 3, 1, 8, 30, 15, 250000), 42]
+    assert decode_cursor(encode_cursor(values), COLUMNS) == values
+
+
+def test_cursor_with_null_value():
+    assert decode_cursor(encode_cursor([None, 7]), COLUMNS) == [None, 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json!",
+    encode_cursor([42]),
+    encode_cursor(["yesterday", 42]),
+    "eyJhIjogMX0",  # {"a": 1}
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, COLUMNS)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [1, 3, 5, 12, 20])
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_the_full_order(db, readings, limit, descending):
+    ordered = sorted(readings, key=lambda row: (row.reading_time, row.id), reverse=descending)
+
+    pages = all_pages(db, limit, descending)
+
+    assert [row_id for page in pages for row_id in page] == [row.id for row in ordered]
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_last_page_has_no_cursor(db, readings):
+    rows, after = keyset_paginate(db.query(models.BloodPressure), COLUMNS, None, len(readings))
+    assert len(rows) == len(readings)
+    assert after is None
+
+
+def test_skip_only_applies_without_cursor(db, readings):
+    query = db.query(models.BloodPressure)
+    first, after = keyset_paginate(query, COLUMNS, None, 4)
+
+    skipped, _ = keyset_paginate(query, COLUMNS, None, 4, skip=2)
+    next_page, _ = keyset_paginate(query, COLUMNS, after, 4, skip=2)
+
+    assert [row.id for row in skipped] == [row.id for row in readings[2:6]]
+    assert [row.id for row in next_page] == [row.id for row in readings[4:8]]
+
+
+def test_zero_limit_returns_empty_page(db, readings):
+    assert keyset_paginate(db.query(models.BloodPressure), COLUMNS, None, 0) == ([], None)
+
+
+def test_readings_endpoint_pages(client, readings, user):
+    ids, after = [], None
+    while True:
+        params = {"limit": 5, **({"after": after} if after else {})}
+        response = client.get(f"/bp/readings/{user.id}", params=params)
+        assert response.status_code == 200
+        ids += [reading["id"] for reading in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+
+    assert ids == [row.id for row in sorted(readings, key=lambda row: (row.reading_time, row.id), reverse=True)]
+
+
+@pytest.mark.parametrize("limit", [0, -1, 1001])
+def test_endpoint_rejects_out_of_range_limit(client, readings, user, limit):
+    assert client.get("/users/", params={"limit": limit}).status_code == 422
+    assert client.get(f"/bp/readings/{user.id}", params={"limit": limit}).status_code == 422
+
+
+def test_endpoint_rejects_invalid_cursor(client, readings, user):
+    response = client.get(f"/bp/readings/{user.id}", params={"after": "garbage"})
+    assert response.status_code == 400
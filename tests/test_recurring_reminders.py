@@ -0,0 +1,207 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.dosing_schedule import DosingRule, build_schedule
+from app.recurring_reminders import RecurringReminderService
+
+START = datetime(2026, 3, 1, 8, 0)
+TWICE_DAILY = DosingRule(dose="1 tablet", times_per_day=2, duration_days=5)
+
+
+def add_series(db, user_id, rule=TWICE_DAILY, start=START, kind="medication"):
+    series = RecurringReminderService.create_series(
+        db, user_id, kind, rule, start, name="Amlodipine", dosage="5 mg", bp_category="stage1"
+    )
+    db.commit()
+    return series
+
+
+def due_times(occurrences):
+    return [occurrence.due_at for occurrence in occurrences]
+
+
+def test_series_spans_its_occurrences(db, user):
+    series = add_series(db, user.id, DosingRule(dose="1 tablet", first_dose_time="21:00", total_doses=3))
+
+    assert series.start_datetime == datetime(2026, 3, 1, 21, 0)
+    assert series.end_datetime == datetime(2026, 3, 3, 21, 0)
+    assert RecurringReminderService.is_occurrence(series, datetime(2026, 3, 2, 21, 0))
+    assert not RecurringReminderService.is_occurrence(series, datetime(2026, 3, 2, 21, 1))
+
+
+def test_occurrences_in_window(db, user):
+    add_series(db, user.id)
+
+    occurrences = RecurringReminderService.get_occurrences(
+        db, user.id, "medication", datetime(2026, 3, 2, 8, 0), datetime(2026, 3, 3, 8, 0)
+    )
+
+    # The window end is inclusive
+    assert due_times(occurrences) == [START + timedelta(hours=h) for h in (24, 36, 48)]
+    assert occurrences[0].schedule_dosage == "1 tablet"
+    assert occurrences[0].id is None and not occurrences[0].is_taken
+
+
+def test_occurrences_of_several_series_are_merged(db, user):
+    first = add_series(db, user.id)
+    second = add_series(db, user.id, DosingRule(dose="1 tablet", interval_hours=8, total_doses=6))
+
+    occurrences = RecurringReminderService.get_occurrences(db, user.id, "medication")
+
+    assert len(occurrences) == 10 + 6
+    assert [o.sort_key for o in occurrences] == sorted(o.sort_key for o in occurrences)
+    # At the shared first time, the newer series comes first
+    assert [o.series_id for o in occurrences[:2]] == [second.id, first.id]
+
+
+def test_kinds_and_users_are_kept_apart(db, user):
+    other = models.User(username="other", email="other@example.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+    add_series(db, user.id, kind="bp_check")
+    add_series(db, other.id)
+
+    assert RecurringReminderService.get_occurrences(db, user.id, "medication") == []
+    checks = RecurringReminderService.get_occurrences(db, user.id, "bp_check")
+    assert len(checks) == 10
+    assert checks[0].bp_category == "stage1" and not checks[0].is_completed
+
+
+def test_done_skipped_and_snoozed_occurrences(db, user):
+    series = add_series(db, user.id)
+    done, skipped, snoozed = START, START + timedelta(hours=12), START + timedelta(hours=24)
+    snoozed_until = START + timedelta(days=10)  # After the last occurrence of the series
+
+    RecurringReminderService.set_occurrence_status(db, series, done, "done")
+    RecurringReminderService.set_occurrence_status(db, series, skipped, "skipped")
+    RecurringReminderService.set_occurrence_status(db, series, snoozed, "snoozed", snoozed_until)
+
+    occurrences = RecurringReminderService.get_occurrences(db, user.id, "medication")
+    assert len(occurrences) == 9
+    assert occurrences[0].due_at == done and occurrences[0].is_taken
+    assert skipped not in due_times(occurrences) and snoozed not in due_times(occurrences)
+    assert (occurrences[-1].occurrence_datetime, occurrences[-1].due_at) == (snoozed, snoozed_until)
+
+    pending = RecurringReminderService.get_occurrences(db, user.id, "medication", include_done=False)
+    assert done not in due_times(pending)
+
+    RecurringReminderService.set_occurrence_status(db, series, skipped, None)
+    assert skipped in due_times(RecurringReminderService.get_occurrences(db, user.id, "medication"))
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7])
+def test_paging_by_sort_key(db, user, limit):
+    add_series(db, user.id)
+    add_series(db, user.id, DosingRule(dose="1 tablet", interval_hours=5, total_doses=12))
+    full = RecurringReminderService.get_occurrences(db, user.id, "medication")
+
+    pages, after_key = [], None
+    while True:
+        page = RecurringReminderService.get_occurrences(db, user.id, "medication", after_key=after_key, limit=limit)
+        if not page:
+            break
+        pages += page
+        after_key = page[-1].sort_key
+
+    assert [o.sort_key for o in pages] == [o.sort_key for o in full]
+
+
+def test_bulk_status_change(db, user):
+    series = add_series(db, user.id)
+    occurrences = RecurringReminderService.get_occurrences(db, user.id, "medication", limit=3)
+    RecurringReminderService.set_occurrence_status(db, series, occurrences[0].occurrence_datetime, "done")
+
+    changed = RecurringReminderService.set_occurrences_status(db, occurrences, "snoozed", timedelta(hours=1))
+    db.commit()
+
+    assert changed == 3
+    stored = db.query(models.ReminderOccurrence).order_by(models.ReminderOccurrence.occurrence_datetime).all()
+    assert [(row.status, row.snoozed_until) for row in stored] == [
+        ("snoozed", occurrence.due_at + timedelta(hours=1)) for occurrence in occurrences
+    ]
+
+
+def test_reminder_list_merges_rows_and_occurrences(client, db, user):
+    add_series(db, user.id, DosingRule(dose="1 tablet", times_per_day=1, duration_days=4))
+    for day in (0, 2):
+        db.add(models.MedicationReminder(
+            user_id=user.id, name="Aspirin", dosage="75 mg", schedule_dosage="1 tablet",
+            schedule_datetime=START + timedelta(days=day, hours=1)
+        ))
+    db.commit()
+
+    items, after = [], None
+    while True:
+        response = client.get(f"/reminders/{user.id}", params={"limit": 2, **({"after": after} if after else {})})
+        assert response.status_code == 200
+        items += response.json()
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+
+    assert len(items) == 6
+    assert [item["schedule_datetime"] for item in items] == sorted(item["schedule_datetime"] for item in items)
+    assert sum(item["series_id"] is not None for item in items) == 4
+
+
+def test_adherence_counts_rows_and_occurrences(client, db, user):
+    series = add_series(db, user.id)
+    RecurringReminderService.set_occurrence_status(db, series, START, "done")
+    RecurringReminderService.set_occurrence_status(db, series, START + timedelta(hours=12), "skipped")
+    db.add_all([
+        models.MedicationReminder(
+            user_id=user.id, name="Amlodipine", dosage="5 mg", schedule_dosage="1 tablet",
+            schedule_datetime=START + timedelta(days=10), is_taken=True
+        ),
+        models.MedicationReminder(
+            user_id=user.id, name="Aspirin", dosage="75 mg", schedule_dosage="1 tablet", schedule_datetime=START
+        ),
+    ])
+    db.commit()
+
+    response = client.get(f"/reminders/adherence/{user.id}")
+
+    assert response.status_code == 200
+    assert response.json()["adherence"] == [
+        {"name": "Amlodipine", "total_doses": 11, "taken_doses": 2, "adherence_percentage": 2 / 11 * 100},
+        {"name": "Aspirin", "total_doses": 1, "taken_doses": 0, "adherence_percentage": 0.0},
+    ]
+
+
+def test_occurrence_endpoint(client, db, user):
+    series = add_series(db, user.id)
+
+    response = client.post(f"/reminders/series/{series.id}/occurrences", json={
+        "occurrence_datetime": START.isoformat(), "status": "done"
+    })
+    assert response.status_code == 200
+    assert response.json()["reminder"]["is_taken"]
+
+    off_schedule = client.post(f"/reminders/series/{series.id}/occurrences", json={
+        "occurrence_datetime": (START + timedelta(hours=1)).isoformat(), "status": "done"
+    })
+    assert off_schedule.status_code == 400
+
+    no_time = client.post(f"/reminders/series/{series.id}/occurrences", json={
+        "occurrence_datetime": START.isoformat(), "status": "snoozed"
+    })
+    assert no_time.status_code == 400
+
+
+def test_approved_rule_schedule_is_saved_as_series(client, db, user):
+    def save(schedule):
+        return client.post("/reminders/save-ocr-reminders", json={"user_id": user.id, "extracted_data": {
+            "name": "Amlodipine", "dosage": "5 mg", "interpretation": "",
+            "rule": TWICE_DAILY.model_dump(), "schedule": schedule
+        }}).json()
+
+    schedule = build_schedule(TWICE_DAILY, START)
+    assert save(schedule)["series_id"] is not None
+    assert db.query(models.MedicationReminder).count() == 0
+
+    # An edited schedule no longer follows the rule, so it is saved dose by dose
+    edited = schedule[:-1]
+    assert save(edited).get("series_id") is None
+    assert db.query(models.MedicationReminder).count() == len(edited)
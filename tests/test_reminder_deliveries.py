@@ -0,0 +1,271 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app import models, schemas
+from app.reminder_deliveries import REMINDER_DELIVERY_MAX_ATTEMPTS, REMINDER_LEASE_SECONDS, ReminderDeliveryService
+from app.reminder_dispatcher import LogSink, ReminderDispatcher, ReminderSink, SSESink, sse_sink
+
+NOW = datetime(2026, 3, 1, 8, 0)
+LEASE = 60
+
+
+def due(reminder_id, minutes=0, user_id=1, **fields):
+    return schemas.DueReminder(
+        type="medication", id=reminder_id, due_at=NOW + timedelta(minutes=minutes),
+        title="Aspirin", completed=False, user_id=user_id, **fields
+    )
+
+
+def statuses(db):
+    """(status, claimed_by, attempts) of each delivery by reminder id."""
+    return {
+        source_id: (status, claimed_by, attempts)
+        for source_id, status, claimed_by, attempts in db.query(
+            models.ReminderDelivery.source_id, models.ReminderDelivery.status,
+            models.ReminderDelivery.claimed_by, models.ReminderDelivery.attempts
+        )
+    }
+
+
+def claim(db, worker_id, now=NOW, limit=100):
+    return ReminderDeliveryService.claim(db, worker_id, now, limit, LEASE)
+
+
+def claimed_ids(claimed):
+    return [payload["id"] for _, payload in claimed]
+
+
+class RecordingSink(ReminderSink):
+    """Records the reminders it is sent and fails for the reminder ids in fail_ids."""
+
+    name = "recording"
+    external = True
+
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.sent = []
+
+    async def send(self, reminder: dict) -> None:
+        if reminder["id"] in self.fail_ids:
+            raise ConnectionError("sink unavailable")
+        self.sent.append(reminder["id"])
+
+
+def test_enqueue_is_idempotent(db):
+    assert ReminderDeliveryService.enqueue(db, [due(1), due(2)]) == 2
+    assert ReminderDeliveryService.enqueue(db, [due(1), due(2), due(3)]) == 1
+    assert db.query(models.ReminderDelivery).count() == 3
+
+
+def test_rescheduled_reminder_is_queued_again(db):
+    ReminderDeliveryService.enqueue(db, [due(1)])
+    assert ReminderDeliveryService.enqueue(db, [due(1, minutes=30)]) == 1
+
+
+def test_series_occurrences_get_their_own_deliveries(db):
+    occurrences = [
+        due(None, minutes=minutes, series_id=7, occurrence_datetime=NOW + timedelta(minutes=minutes))
+        for minutes in (0, 60)
+    ]
+    assert ReminderDeliveryService.enqueue(db, occurrences) == 2
+    assert {row.source_type for row in db.query(models.ReminderDelivery)} == {"series"}
+
+
+def test_replace_source_drops_pending_deliveries(db):
+    ReminderDeliveryService.enqueue(db, [due(1), due(2)])
+
+    ReminderDeliveryService.enqueue(db, [due(1, minutes=15)], replace_source=("medication", 1))
+
+    due_times = {(row.source_id, row.due_at) for row in db.query(models.ReminderDelivery)}
+    assert due_times == {(1, NOW + timedelta(minutes=15)), (2, NOW)}
+
+
+def test_claim_leases_due_deliveries_earliest_first(db):
+    ReminderDeliveryService.enqueue(db, [due(1, minutes=-5), due(2, minutes=-10), due(3, minutes=5)])
+
+    claimed = claim(db, "worker-a", limit=1)
+
+    assert claimed_ids(claimed) == [2]
+    assert claimed[0][1]["title"] == "Aspirin"
+    assert statuses(db)[2] == ("claimed", "worker-a", 1)
+    assert claimed_ids(claim(db, "worker-a")) == [1]
+    assert statuses(db)[3] == ("pending", None, 0)
+
+
+def test_claims_are_disjoint(db):
+    ReminderDeliveryService.enqueue(db, [due(i, minutes=-i) for i in range(1, 6)])
+
+    first = claim(db, "worker-a", limit=3)
+    second = claim(db, "worker-b", limit=3)
+
+    assert len(first) == 3 and len(second) == 2
+    assert not set(claimed_ids(first)) & set(claimed_ids(second))
+    assert claim(db, "worker-c") == []
+
+
+def test_only_the_lease_owner_acks(db):
+    ReminderDeliveryService.enqueue(db, [due(1), due(2)])
+    claimed = claim(db, "worker-a")
+    delivery_ids = [delivery_id for delivery_id, _ in claimed]
+
+    assert ReminderDeliveryService.ack(db, "worker-b", delivery_ids, NOW) == 0
+    assert ReminderDeliveryService.ack(db, "worker-a", delivery_ids[:1], NOW) == 1
+    assert ReminderDeliveryService.ack(db, "worker-a", delivery_ids[:1], NOW) == 0
+    assert [status for status, _, _ in statuses(db).values()] == ["sent", "claimed"]
+    assert ReminderDeliveryService.ack(db, "worker-a", [], NOW) == 0
+
+
+def test_expired_lease_is_claimed_again(db):
+    ReminderDeliveryService.enqueue(db, [due(1)])
+    ((delivery_id, _),) = claim(db, "worker-a")
+
+    assert claim(db, "worker-b", NOW + timedelta(seconds=LEASE - 1)) == []
+    assert claimed_ids(claim(db, "worker-b", NOW + timedelta(seconds=LEASE + 1))) == [1]
+
+    # The first worker lost its lease and can no longer ack
+    assert ReminderDeliveryService.ack(db, "worker-a", [delivery_id], NOW) == 0
+    assert statuses(db)[1] == ("claimed", "worker-b", 2)
+
+
+def test_delivery_is_given_up_after_max_attempts(db):
+    ReminderDeliveryService.enqueue(db, [due(1)])
+
+    now = NOW
+    for _ in range(REMINDER_DELIVERY_MAX_ATTEMPTS):
+        assert claimed_ids(claim(db, "worker-a", now)) == [1]
+        now += timedelta(seconds=LEASE + 1)
+
+    assert claim(db, "worker-a", now) == []
+
+
+def test_sent_since(db):
+    ReminderDeliveryService.enqueue(db, [due(1, user_id=1), due(2, user_id=1), due(3, user_id=2), due(4, user_id=1)])
+    ids = {payload["id"]: delivery_id for delivery_id, payload in claim(db, "worker-a")}
+    ReminderDeliveryService.ack(db, "worker-a", [ids[2]], NOW + timedelta(seconds=2))
+    ReminderDeliveryService.ack(db, "worker-a", [ids[1], ids[3]], NOW + timedelta(seconds=3))
+
+    sent = ReminderDeliveryService.sent_since(db, [1], NOW + timedelta(seconds=1))
+
+    assert [(delivery_id, payload["id"]) for delivery_id, _, payload in sent] == [(ids[2], 2), (ids[1], 1)]
+    assert ReminderDeliveryService.sent_since(db, [1], NOW + timedelta(seconds=2))[0][2]["id"] == 1
+    assert ReminderDeliveryService.sent_since(db, [], NOW) == []
+
+
+def test_prune_keeps_recent_deliveries(db):
+    ReminderDeliveryService.enqueue(db, [due(1, minutes=-3 * 24 * 60), due(2)])
+
+    assert ReminderDeliveryService.prune(db, NOW) == 1
+    assert list(statuses(db)) == [2]
+
+
+def test_deliver_acks_only_sent_reminders(db):
+    ReminderDeliveryService.enqueue(db, [due(1), due(2), due(3)])
+    sink = RecordingSink(fail_ids={2})
+    dispatcher = ReminderDispatcher([sink])
+
+    asyncio.run(dispatcher._deliver(NOW))
+
+    assert sorted(sink.sent) == [1, 3]
+    assert statuses(db) == {
+        1: ("sent", dispatcher.worker_id, 1),
+        2: ("claimed", dispatcher.worker_id, 1),
+        3: ("sent", dispatcher.worker_id, 1),
+    }
+
+
+def test_deliver_waits_for_every_external_sink(db):
+    ReminderDeliveryService.enqueue(db, [due(1)])
+    dispatcher = ReminderDispatcher([LogSink(), SSESink(), RecordingSink(fail_ids={1}), RecordingSink()])
+
+    asyncio.run(dispatcher._deliver(NOW))
+
+    assert statuses(db)[1][0] == "claimed"
+
+
+def test_deliver_acks_without_external_sinks(db):
+    ReminderDeliveryService.enqueue(db, [due(1)])
+    dispatcher = ReminderDispatcher([LogSink(), SSESink()])
+
+    asyncio.run(dispatcher._deliver(NOW))
+
+    assert statuses(db)[1][0] == "sent"
+
+
+def test_failed_delivery_is_retried_after_the_lease(db):
+    ReminderDeliveryService.enqueue(db, [due(1)])
+    sink = RecordingSink(fail_ids={1})
+    dispatcher = ReminderDispatcher([sink])
+
+    asyncio.run(dispatcher._deliver(NOW))
+    sink.fail_ids.clear()
+    asyncio.run(dispatcher._deliver(NOW + timedelta(seconds=REMINDER_LEASE_SECONDS + 1)))
+
+    assert sink.sent == [1]
+    assert statuses(db)[1] == ("sent", dispatcher.worker_id, 2)
+
+
+def test_sse_publish_reaches_the_users_connections():
+    sink = SSESink(queue_size=2)
+    first, second, other = sink.subscribe(1), sink.subscribe(1), sink.subscribe(2)
+
+    for reminder_id in (1, 2, 3):
+        sink.publish({"user_id": 1, "id": reminder_id})
+
+    # A full queue drops its oldest reminder
+    assert [first.get_nowait()["id"] for _ in range(first.qsize())] == [2, 3]
+    assert second.qsize() == 2 and other.empty()
+
+    sink.unsubscribe(1, first)
+    sink.unsubscribe(1, second)
+    assert sink.subscribed_users() == [2]
+
+
+def test_reminders_sent_by_another_replica_are_relayed_once(db):
+    ReminderDeliveryService.enqueue(db, [due(1, user_id=5)])
+    dispatcher = ReminderDispatcher([sse_sink])
+
+    async def relay():
+        queue = sse_sink.subscribe(5)
+        dispatcher._relay_wakeup = asyncio.Event()
+        task = asyncio.create_task(dispatcher._relay())
+        try:
+            await asyncio.sleep(0.1)
+            # Claimed and sent by the dispatcher of another replica
+            delivery_ids = [delivery_id for delivery_id, _ in claim(db, "other-replica")]
+            ReminderDeliveryService.ack(db, "other-replica", delivery_ids, datetime.utcnow())
+            dispatcher._relay_wakeup.set()
+
+            reminder = await asyncio.wait_for(queue.get(), 5)
+            dispatcher._relay_wakeup.set()
+            await asyncio.sleep(0.2)
+            return reminder, queue.qsize()
+        finally:
+            task.cancel()
+            sse_sink.unsubscribe(5, queue)
+
+    reminder, remaining = asyncio.run(relay())
+
+    assert (reminder["id"], reminder["user_id"]) == (1, 5)
+    assert remaining == 0
+
+
+def test_first_sweep_queues_reminders_missed_within_the_grace_period(db, user):
+    reminders = {
+        minutes: models.MedicationReminder(
+            user_id=user.id, name="Aspirin", dosage="100 mg", schedule_dosage="1 tablet",
+            schedule_datetime=NOW + timedelta(minutes=minutes)
+        )
+        for minutes in (-90, -30, 10)
+    }
+    db.add_all(reminders.values())
+    db.commit()
+
+    asyncio.run(ReminderDispatcher(grace_seconds=3600)._sweep(NOW))
+    assert set(statuses(db)) == {reminders[-30].id, reminders[10].id}
+
+    claimed = claim(db, "replica-a")
+    ReminderDeliveryService.ack(db, "replica-a", [delivery_id for delivery_id, _ in claimed], NOW)
+    # A restarted dispatcher does not send the missed reminder again
+    asyncio.run(ReminderDispatcher(grace_seconds=3600)._sweep(NOW + timedelta(minutes=5)))
+    assert statuses(db)[reminders[-30].id] == ("sent", "replica-a", 1)
+    assert db.query(models.ReminderDelivery).count() == 2
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app.ocr import OCR_LOCAL_MIN_CONFIDENCE
+from app.seven_segment import classify_digit, read_binary_display, read_display
+from display_images import draw_number, render_document, render_noise, render_panel, render_photo, render_scene, to_jpeg
+
+
+def digit_cell(digit: int) -> np.ndarray:
+    """Binary image of one digit, cropped to its lit pixels."""
+    img = Image.new("L", (100, 140), 0)
+    draw_number(ImageDraw.Draw(img), digit, 10, 10, 60, 110, 255, digits=1)
+    lit = np.asarray(img) > 127
+    rows, columns = np.nonzero(lit)
+    return lit[rows.min():rows.max() + 1, columns.min():columns.max() + 1]
+
+
+def binary_panel(systolic: int, diastolic: int, pulse: int) -> np.ndarray:
+    return np.asarray(render_panel(systolic, diastolic, pulse).convert("L")) < 100
+
+
+@pytest.mark.parametrize("digit", range(10))
+def test_classify_digit(digit):
+    assert classify_digit(digit_cell(digit)) == (digit, 1.0)
+
+
+def test_classify_digit_ambiguous_segment_lowers_score():
+    # An 8 with most of its middle segment dark is between 0 and 8
+    cell = digit_cell(8).copy()
+    height, width = cell.shape
+    cell[height // 2 - 10:height // 2 + 10, int(width * 0.3):int(width * 0.6)] = False
+
+    _, score = classify_digit(cell)
+
+    assert score < OCR_LOCAL_MIN_CONFIDENCE
+
+
+def test_read_binary_display():
+    assert read_binary_display(binary_panel(128, 82, 67)) == (128, 82, 67, 1.0)
+
+
+@pytest.mark.parametrize("values", [(80, 120, 67), (128, 82, 15), (300, 82, 67)])
+def test_read_binary_display_rejects_implausible_values(values):
+    assert read_binary_display(binary_panel(*values)) is None
+
+
+@pytest.mark.parametrize("values, options", [
+    ((120, 80, 72), {}),
+    ((118, 76, 103), {}),
+    ((141, 95, 66), {}),
+    ((199, 111, 58), {}),
+    ((101, 61, 110), {}),
+    ((113, 71, 69), {"noise": False}),
+    ((135, 88, 71), {"led": True}),
+    ((162, 104, 90), {"led": True}),
+    ((127, 83, 64), {"angle": 4}),
+    ((127, 83, 64), {"angle": -4}),
+    ((153, 97, 81), {"blur": 2}),
+    ((128, 82, 67), {"led": True, "angle": 3, "blur": 1}),
+])
+def test_reads_monitor_photo(values, options):
+    reading = read_display(render_photo(*values, **options))
+
+    assert reading is not None
+    assert (reading.systolic, reading.diastolic, reading.pulse) == values
+    assert reading.confidence >= OCR_LOCAL_MIN_CONFIDENCE
+
+
+def test_glare_over_a_digit_lowers_confidence():
+    panel = render_panel(128, 82, 67)
+    ImageDraw.Draw(panel).rectangle([222, 100, 330, 200], fill=(235, 240, 232))
+
+    reading = read_display(render_photo(128, 82, 67, panel=panel))
+
+    assert reading is None or reading.confidence < OCR_LOCAL_MIN_CONFIDENCE
+
+
+def test_glare_over_a_line_is_not_read():
+    panel = render_panel(128, 82, 67)
+    ImageDraw.Draw(panel).rectangle([60, 300, 400, 420], fill=(235, 240, 232))
+
+    assert read_display(render_photo(128, 82, 67, panel=panel)) is None
+
+
+@pytest.mark.parametrize("image", [
+    pytest.param(lambda: to_jpeg(Image.new("RGB", (1200, 900), (128, 128, 128))), id="uniform"),
+    pytest.param(lambda: to_jpeg(render_noise().convert("RGB")), id="noise"),
+    pytest.param(lambda: render_scene(0), id="scene"),
+    pytest.param(lambda: render_scene(1), id="scene-2"),
+    pytest.param(lambda: render_document(0), id="document"),
+    pytest.param(lambda: render_document(1), id="document-2"),
+])
+def test_photo_without_display_is_not_read(image):
+    assert read_display(image()) is None